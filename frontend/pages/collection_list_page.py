@@ -22,16 +22,18 @@ def collection_list_view(page: ft.Page, server_url: str) -> ft.View:
     )
 
     status = ft.Text("", size=12, color=ft.colors.GREY_600)
+    page_size = 50
+    loaded: list[dict] = []
+    next_after: int | None = None
+    total: int | None = None
 
     def _safe_update(ctrl: ft.Control) -> None:
         if getattr(ctrl, "page", None) is not None:
             ctrl.update()
 
     def _set_rows(items: list[dict]) -> None:
-        try:
-            items = sorted(items, key=lambda x: int(x.get("run_id") or 0), reverse=True)
-        except Exception:
-            pass
+        # EN: Server already returns rows newest-first, page by page.
+        # 中文：服务端已按 run_id 倒序分页返回，无需本地排序。
         rows = []
         for it in items:
             run_id = it.get("run_id")
@@ -87,17 +89,42 @@ def collection_list_view(page: ft.Page, server_url: str) -> ft.View:
         table.rows = rows
         _safe_update(table)
 
-    def on_refresh(_: ft.ControlEvent) -> None:
+    def _load(after: int | None) -> None:
+        nonlocal next_after, total
+        params: dict = {"limit": page_size}
+        if after is None:
+            params["with_total"] = 1
+        else:
+            params["after"] = after
         try:
-            resp = requests.get(f"{server_url}/api/collections", timeout=60)
+            resp = requests.get(f"{server_url}/api/collections", params=params, timeout=60)
             data = resp.json()
             items = data.get("items") or []
-            _set_rows(items if isinstance(items, list) else [])
-            status.value = f"共 {len(items) if isinstance(items, list) else 0} 条"
+            if not isinstance(items, list):
+                items = []
+            if after is None:
+                loaded.clear()
+            loaded.extend(items)
+            next_after = data.get("next_after")
+            if after is None:
+                total = data.get("total")
+            _set_rows(loaded)
+            load_more.disabled = next_after is None
+            _safe_update(load_more)
+            status.value = f"已加载 {len(loaded)} / 共 {total if total is not None else len(loaded)} 条"
         except Exception as e:  # noqa: BLE001
             status.value = f"加载失败: {e}"
         _safe_update(status)
 
+    def on_refresh(_: ft.ControlEvent) -> None:
+        _load(None)
+
+    def on_load_more(_: ft.ControlEvent) -> None:
+        if next_after is not None:
+            _load(next_after)
+
+    load_more = ft.OutlinedButton("加载更多", on_click=on_load_more, disabled=True)
+
     table_row = ft.Row([table], scroll=ft.ScrollMode.AUTO, expand=True)
 
     def _on_pan_update(e: ft.DragUpdateEvent) -> None:
@@ -118,6 +145,7 @@ def collection_list_view(page: ft.Page, server_url: str) -> ft.View:
             ft.Row(
                 controls=[
                     ft.ElevatedButton("刷新", on_click=on_refresh),
+                    load_more,
                     status,
                 ]
             ),
@@ -108,19 +108,41 @@ def generate_view(page: ft.Page, server_url: str) -> ft.View:
             _set_output("请先采集并清洗，确保获得 run_id")
             return
         _set_loading(True)
+        # EN: Stream progress (SSE) and show each portrait field as soon as it is generated.
+        # 中文：以 SSE 流式接收进度，每个画像字段生成后立即显示。
+        data: object = None
+        partial: dict = {}
         try:
-            resp = requests.post(
-                f"{server_url}/api/portrait",
+            with requests.post(
+                f"{server_url}/api/portrait/stream",
                 json={"run_id": last_run_id, "overwrite": True},
                 timeout=600,
-            )
-            data = resp.json()
+                stream=True,
+            ) as resp:
+                if resp.status_code != 200:
+                    data = resp.json()
+                else:
+                    event = ""
+                    for line in resp.iter_lines(decode_unicode=True):
+                        if line.startswith("event:"):
+                            event = line[len("event:") :].strip()
+                            continue
+                        if not line.startswith("data:"):
+                            continue
+                        body = json.loads(line[len("data:") :])
+                        if event == "field":
+                            partial[body["name"]] = body["value"]
+                            _set_output({"生成中": partial})
+                        elif event == "chunk":
+                            _set_output({"分块进度": f"{body['done']}/{body['total']}", "生成中": partial})
+                        elif event in ("result", "error"):
+                            data = body
         except Exception as e:  # noqa: BLE001
             _set_loading(False)
             _set_output(f"请求失败: {e}")
             return
         _set_loading(False)
-        _set_output(data)
+        _set_output(data if data is not None else "连接中断，未收到结果")
         if isinstance(data, dict) and data.get("ok") is True:
             page.data["selected_run_id"] = last_run_id
             page.data["prev_route"] = "/generate"
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import json
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 
 
 load_dotenv()
@@ -99,12 +100,19 @@ def portrait_dispatch():
     """Portrait endpoint: (optional) collect+clean -> build portrait -> store+return.
 
     Request JSON supports either:
-    - {run_id, overwrite?}
-    - {url, order, max_comments, overwrite?}
+    - {run_id, overwrite?, provider?, incremental?, base_run_id?, sectioned?}
+    - {url, order, max_comments, overwrite?, provider?, incremental?, base_run_id?, sectioned?}
+
+    `provider: "local"` builds a statistics-only portrait without calling the LLM.
+    `incremental: true` updates an earlier portrait of the same video with only the new comments.
+    `sectioned` (true/false) overrides settings ai.sections.enabled for this request.
     """
 
     payload: Dict[str, Any] = request.get_json(silent=True) or {}
-    overwrite = bool(payload.get("overwrite") is True)
+    try:
+        portrait_args = _portrait_request_args(payload)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
 
     run_id_raw = payload.get("run_id")
     url = str(payload.get("url") or "").strip()
@@ -152,38 +160,217 @@ def portrait_dispatch():
         portrait_result = generate_portrait_for_run(
             run_id=int(run_id),
             settings=settings,
-            overwrite=overwrite,
+            **portrait_args,
         )
 
-        # Avoid returning huge raw payload by default.
-        raw = portrait_result.get("portrait_raw")
-        if isinstance(raw, str) and len(raw) > 6000:
-            portrait_result["portrait_raw"] = raw[:6000] + "\n...(truncated)"
-
-        # If video_id was derived during generation, surface it.
-        if not video_id:
-            video_id = str(portrait_result.get("video_id") or "")
-
-        return jsonify(
-            {
-                "ok": True,
-                "run_id": int(run_id),
-                "video_id": video_id,
-                "portrait": portrait_result.get("portrait"),
-                "parse_ok": bool(portrait_result.get("parse_ok")),
-                "error": portrait_result.get("error"),
-                "prompt_name": portrait_result.get("prompt_name"),
-                "prompt_version": portrait_result.get("prompt_version"),
-                "provider": portrait_result.get("provider"),
-                "model": portrait_result.get("model"),
-                "cached": bool(portrait_result.get("cached")),
-                "portrait_raw": portrait_result.get("portrait_raw"),
-            }
-        )
+        return jsonify(_portrait_body(portrait_result, int(run_id), video_id))
     except Exception as e:  # noqa: BLE001
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+def _optional_run_id(value: Any) -> Optional[int]:
+    """Optional positive run id from a request payload (raises ValueError)."""
+
+    if value in (None, ""):
+        return None
+    try:
+        run_id = int(value)
+    except Exception as e:
+        raise ValueError("base_run_id must be int") from e
+    if run_id <= 0:
+        raise ValueError("base_run_id must be positive int")
+    return run_id
+
+
+def _portrait_request_args(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """`generate_portrait_for_run` options shared by /api/portrait and /api/portrait/stream.
+
+    Returns {overwrite, provider, incremental, base_run_id, sectioned}; raises ValueError.
+    """
+
+    return {
+        "overwrite": bool(payload.get("overwrite") is True),
+        "provider": str(payload.get("provider") or "").strip().lower() or None,
+        "incremental": bool(payload.get("incremental") is True),
+        "base_run_id": _optional_run_id(payload.get("base_run_id")),
+        "sectioned": payload.get("sectioned") if isinstance(payload.get("sectioned"), bool) else None,
+    }
+
+
+def _portrait_body(portrait_result: Dict[str, Any], run_id: int, video_id: str = "") -> Dict[str, Any]:
+    """Response body shared by /api/portrait and the `result` event of /api/portrait/stream."""
+
+    # Avoid returning huge raw payload by default.
+    raw = portrait_result.get("portrait_raw")
+    if isinstance(raw, str) and len(raw) > 6000:
+        portrait_result["portrait_raw"] = raw[:6000] + "\n...(truncated)"
+
+    # If video_id was derived during generation, surface it.
+    if not video_id:
+        video_id = str(portrait_result.get("video_id") or "")
+
+    return {
+        "ok": True,
+        "run_id": int(run_id),
+        "video_id": video_id,
+        "portrait": portrait_result.get("portrait"),
+        "parse_ok": bool(portrait_result.get("parse_ok")),
+        "error": portrait_result.get("error"),
+        "prompt_name": portrait_result.get("prompt_name"),
+        "prompt_version": portrait_result.get("prompt_version"),
+        "provider": portrait_result.get("provider"),
+        "model": portrait_result.get("model"),
+        "cached": bool(portrait_result.get("cached")),
+        "generation": portrait_result.get("generation"),
+        "base_run_id": portrait_result.get("base_run_id"),
+        "route": portrait_result.get("route"),
+        "portrait_raw": portrait_result.get("portrait_raw"),
+    }
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/portrait/stream")
+def portrait_stream():
+    """Generate a portrait for {run_id, overwrite?, provider?, incremental?, base_run_id?, sectioned?} and stream progress as Server-Sent Events.
+
+    Events: start, chunk (map-reduce only), field (one per completed top-level portrait
+    field), then result (same body as /api/portrait) or error.
+    """
+
+    payload: Dict[str, Any] = request.get_json(silent=True) or {}
+    try:
+        portrait_args = _portrait_request_args(payload)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    run_id_raw = payload.get("run_id")
+    if run_id_raw in (None, ""):
+        return jsonify({"ok": False, "error": "Missing run_id"}), 400
+    try:
+        run_id = int(run_id_raw)
+    except Exception:
+        return jsonify({"ok": False, "error": "run_id must be int"}), 400
+    if run_id <= 0:
+        return jsonify({"ok": False, "error": "run_id must be positive int"}), 400
+
+    import queue
+    import threading
+
+    from src.config import load_settings  # noqa: WPS433
+    from src.data_analyse.portrait import generate_portrait_for_run  # noqa: WPS433
+
+    settings = load_settings()
+    events: "queue.Queue[tuple[str, Any]]" = queue.Queue()
+
+    def _work() -> None:
+        try:
+            result = generate_portrait_for_run(
+                run_id=run_id,
+                settings=settings,
+                **portrait_args,
+                on_event=lambda e: events.put((str(e.get("event")), e)),
+            )
+            events.put(("result", _portrait_body(result, run_id)))
+        except Exception as e:  # noqa: BLE001
+            events.put(("error", {"ok": False, "error": str(e)}))
+
+    # EN: Generation runs on its own thread; the response generator only relays events,
+    #     with a keep-alive comment while the model is silent (e.g. during map calls).
+    # 中文：生成在独立线程中进行，响应生成器只负责转发事件；模型无输出时（如分块阶段）定期发送心跳注释。
+    threading.Thread(target=_work, name=f"portrait-stream-{run_id}", daemon=True).start()
+
+    def _relay():
+        while True:
+            try:
+                name, data = events.get(timeout=15)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(name, data)
+            if name in ("result", "error"):
+                return
+
+    return Response(
+        _relay(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/portrait/batch")
+def portrait_batch():
+    """Generate portraits for many runs; streams one JSON line per finished run (NDJSON).
+
+    Request JSON: {run_ids: [...]} or {missing: true}, plus overwrite?, concurrency?, incremental?
+    The last line is a summary object ({"summary": true, ...}).
+    """
+
+    payload: Dict[str, Any] = request.get_json(silent=True) or {}
+    overwrite = bool(payload.get("overwrite") is True)
+    missing = bool(payload.get("missing") is True)
+    incremental = bool(payload.get("incremental") is True)
+    run_ids_raw = payload.get("run_ids")
+
+    if not missing:
+        if not isinstance(run_ids_raw, list) or not run_ids_raw:
+            return jsonify({"ok": False, "error": "Missing run_ids (list) or missing=true"}), 400
+        try:
+            run_ids = [int(x) for x in run_ids_raw]
+        except Exception:
+            return jsonify({"ok": False, "error": "run_ids must be ints"}), 400
+        if any(x <= 0 for x in run_ids):
+            return jsonify({"ok": False, "error": "run_ids must be positive ints"}), 400
+        # EN: Keep order, drop duplicates (two workers on one run would race on the upsert).
+        # 中文：保持顺序并去重（同一 run 被两个线程同时生成会重复调用模型）。
+        run_ids = list(dict.fromkeys(run_ids))
+
+    concurrency_raw = payload.get("concurrency")
+    try:
+        concurrency = int(concurrency_raw) if concurrency_raw not in (None, "") else None
+    except Exception:
+        return jsonify({"ok": False, "error": "concurrency must be int"}), 400
+    if concurrency is not None:
+        concurrency = max(1, min(32, concurrency))
+
+    import time
+
+    from src.config import db_path, load_settings  # noqa: WPS433
+    from src.data_analyse.batch_portrait import iter_batch_portraits, summarize  # noqa: WPS433
+
+    settings = load_settings()
+    if missing:
+        from src.database.sqlite import list_run_ids_without_portrait  # noqa: WPS433
+        from src.database.writer import read_connection  # noqa: WPS433
+
+        conn = read_connection(db_path(settings))
+        try:
+            run_ids = list_run_ids_without_portrait(conn)
+        finally:
+            conn.close()
+
+    def _lines():
+        t0 = time.perf_counter()
+        results = []
+        for result in iter_batch_portraits(
+            run_ids,
+            settings=settings,
+            overwrite=overwrite,
+            concurrency=concurrency,
+            incremental=incremental,
+        ):
+            results.append(result)
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        yield json.dumps(summarize(results, time.perf_counter() - t0), ensure_ascii=False) + "\n"
+
+    return Response(
+        _lines(),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/api/portrait/query")
 def portrait_query():
     payload: Dict[str, Any] = request.get_json(silent=True) or {}
@@ -199,12 +386,12 @@ def portrait_query():
         return jsonify({"ok": False, "error": "run_id must be positive int"}), 400
 
     from src.config import db_path, load_settings  # noqa: WPS433
-    from src.database.sqlite import connect, get_ai_portrait, init_schema  # noqa: WPS433
+    from src.database.sqlite import get_ai_portrait, get_portrait_lineage  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
 
     settings = load_settings()
-    conn = connect(db_path(settings))
+    conn = read_connection(db_path(settings))
     try:
-        init_schema(conn)
         row = get_ai_portrait(conn, run_id)
         if row is None:
             return jsonify({"ok": False, "error": "portrait not found"}), 404
@@ -220,8 +407,6 @@ def portrait_query():
         portrait = None
         if row["parse_ok"] and row["portrait_json"]:
             try:
-                import json
-
                 portrait = json.loads(row["portrait_json"])
             except Exception:
                 portrait = None
@@ -238,6 +423,11 @@ def portrait_query():
                 "prompt_version": row["prompt_version"],
                 "provider": row["provider"],
                 "model": row["model"],
+                "input_hash": row["input_hash"],
+                "generation": json.loads(row["generation_json"]) if row["generation_json"] else None,
+                "base_run_id": row["base_run_id"],
+                "route": json.loads(row["route_json"]) if row["route_json"] else None,
+                "lineage": get_portrait_lineage(conn, run_id),
                 "created_at": row["created_at"],
                 "video_url": meta["video_url"] if meta else None,
                 "video_title": meta["video_title"] if meta else None,
@@ -249,6 +439,88 @@ def portrait_query():
         conn.close()
 
 
+@app.post("/api/portrait/input")
+def portrait_input():
+    payload: Dict[str, Any] = request.get_json(silent=True) or {}
+    run_id_raw = payload.get("run_id")
+    if run_id_raw in (None, ""):
+        return jsonify({"ok": False, "error": "Missing run_id"}), 400
+
+    try:
+        run_id = int(run_id_raw)
+    except Exception:
+        return jsonify({"ok": False, "error": "run_id must be int"}), 400
+    if run_id <= 0:
+        return jsonify({"ok": False, "error": "run_id must be positive int"}), 400
+
+    from src.config import db_path, load_settings  # noqa: WPS433
+    from src.database.sqlite import get_ai_portrait, get_portrait_input  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
+
+    settings = load_settings()
+    conn = read_connection(db_path(settings))
+    try:
+        row = get_ai_portrait(conn, run_id)
+        if row is None:
+            return jsonify({"ok": False, "error": "portrait not found"}), 404
+        input_json = get_portrait_input(conn, run_id)
+    finally:
+        conn.close()
+
+    if input_json is None:
+        return jsonify({"ok": False, "error": "portrait input not found"}), 404
+    return jsonify(
+        {
+            "ok": True,
+            "run_id": run_id,
+            "input_hash": row["input_hash"],
+            "input": json.loads(input_json),
+        }
+    )
+
+
+@app.post("/api/portrait/topics")
+def portrait_topics():
+    """Local TF-IDF + k-means topics of a run ({run_id, k?}), with representative comments."""
+
+    payload: Dict[str, Any] = request.get_json(silent=True) or {}
+    run_id_raw = payload.get("run_id")
+    if run_id_raw in (None, ""):
+        return jsonify({"ok": False, "error": "Missing run_id"}), 400
+
+    try:
+        run_id = int(run_id_raw)
+        k = int(payload.get("k") or 0)
+    except Exception:
+        return jsonify({"ok": False, "error": "run_id and k must be int"}), 400
+    if run_id <= 0:
+        return jsonify({"ok": False, "error": "run_id must be positive int"}), 400
+
+    from src.config import ai_topics, db_path, load_settings  # noqa: WPS433
+    from src.data_analyse.topics import topics_from_settings  # noqa: WPS433
+    from src.database.sqlite import iter_clean_comments  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
+
+    settings = load_settings()
+    topics_cfg = ai_topics(settings)
+    if k > 0:
+        topics_cfg["k"] = min(k, 50)
+
+    conn = read_connection(db_path(settings))
+    try:
+        comments = [dict(r) for r in iter_clean_comments(conn, run_id)]
+    finally:
+        conn.close()
+    if not comments:
+        return jsonify({"ok": False, "error": "No clean_comments found for this run_id"}), 404
+
+    try:
+        extracted = topics_from_settings(comments, topics_cfg)
+    except RuntimeError as e:
+        return jsonify({"ok": False, "error": str(e)}), 501
+    return jsonify({"ok": True, "run_id": run_id, **extracted})
+
+
 @app.post("/api/portrait/delete")
 def portrait_delete():
     payload: Dict[str, Any] = request.get_json(silent=True) or {}
@@ -264,29 +536,210 @@ def portrait_delete():
         return jsonify({"ok": False, "error": "run_id must be positive int"}), 400
 
     from src.config import db_path, load_settings  # noqa: WPS433
-    from src.database.sqlite import connect, delete_ai_portrait, init_schema  # noqa: WPS433
+    from src.database.sqlite import delete_ai_portrait  # noqa: WPS433
+    from src.database.writer import run_write  # noqa: WPS433
 
     settings = load_settings()
-    conn = connect(db_path(settings))
+    deleted = run_write(db_path(settings), lambda conn: delete_ai_portrait(conn, run_id))
+    return jsonify({"ok": True, "run_id": run_id, "deleted": deleted})
+
+
+def _parse_date_arg(name: str) -> str | None:
+    """Read an ISO date/datetime query param as a UTC bound; a date-only `date_to` includes that day.
+
+    EN: Offsets are converted to UTC and a datetime without one is taken as UTC, so
+        `2024-05-01T08:00+08:00` and `2024-05-01 00:00` give the same bound (see `utc_bound`).
+    中文：带时区偏移的时间换算为 UTC，不带偏移的视为 UTC，因此 `2024-05-01T08:00+08:00` 与
+          `2024-05-01 00:00` 得到相同的边界（见 `utc_bound`）。
+    """
+
+    from datetime import date, timedelta  # noqa: WPS433
+
+    from src.database.sqlite import utc_bound  # noqa: WPS433
+
+    raw = (request.args.get(name) or "").strip()
+    if not raw:
+        return None
     try:
-        init_schema(conn)
-        deleted = delete_ai_portrait(conn, run_id)
-        conn.commit()
-        return jsonify({"ok": True, "run_id": run_id, "deleted": deleted})
+        if len(raw) == 10 and name == "date_to":
+            return (date.fromisoformat(raw) + timedelta(days=1)).isoformat()
+        return utc_bound(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be ISO date or datetime") from None
+
+
+def _parse_list_args(*, with_parse_ok: bool = False) -> Dict[str, Any]:
+    """Parse keyset pagination + filter query params shared by the list endpoints.
+
+    EN: `after` is the `next_after` of the previous page. A date-only `date_to`
+        (YYYY-MM-DD) includes that whole day. Raises ValueError on bad input.
+    中文：`after` 取上一页返回的 `next_after`；仅日期形式的 `date_to` 包含当天。参数非法时抛 ValueError。
+    """
+
+    args = request.args
+
+    raw_limit = args.get("limit", "50")
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        raise ValueError("limit must be int") from None
+    limit = max(1, min(500, limit))
+
+    after = None
+    if args.get("after") not in (None, ""):
+        try:
+            after = int(args["after"])
+        except ValueError:
+            raise ValueError("after must be int") from None
+
+    parsed: Dict[str, Any] = {
+        "limit": limit,
+        "after": after,
+        "channel_id": (args.get("channel_id") or "").strip() or None,
+        "date_from": _parse_date_arg("date_from"),
+        "date_to": _parse_date_arg("date_to"),
+    }
+
+    if with_parse_ok:
+        raw_ok = (args.get("parse_ok") or "").strip().lower()
+        if raw_ok in {"1", "true"}:
+            parsed["parse_ok"] = True
+        elif raw_ok in {"0", "false"}:
+            parsed["parse_ok"] = False
+        elif raw_ok:
+            raise ValueError("parse_ok must be 0|1|true|false")
+        else:
+            parsed["parse_ok"] = None
+
+    return parsed
+
+
+def _with_total() -> bool:
+    return (request.args.get("with_total") or "").strip().lower() in {"1", "true"}
+
+
+@app.get("/api/prompts")
+def prompts_list():
+    """Prompt JSON files known to the prompt registry, plus the one currently in effect.
+
+    Query: reload=1 re-scans AI_PROMPT/ immediately instead of waiting for the next check.
+    """
+
+    from src.ai.prompts import get_prompt_registry  # noqa: WPS433
+    from src.config import load_settings  # noqa: WPS433
+
+    registry = get_prompt_registry()
+    if str(request.args.get("reload") or "").strip() in {"1", "true"}:
+        registry.reload()
+
+    active: Dict[str, Any] = {}
+    try:
+        path, prompt = registry.resolve(load_settings())
+        active = {
+            "file": path.name if path.parent == registry.directory else str(path),
+            "name": prompt.get("name"),
+            "version": int(prompt.get("version") or 1),
+        }
+    except Exception as e:  # noqa: BLE001
+        active = {"error": str(e)}
+
+    items = registry.list_prompts()
+    return jsonify({"ok": True, "active": active, "count": len(items), "items": items})
+
+
+@app.get("/api/ai/providers")
+def ai_providers_health():
+    """Configured AI providers with their health (latency percentiles, failures, cooldown)."""
+
+    from src.ai.providers import get_provider_pool  # noqa: WPS433
+    from src.config import ensure_env_loaded, load_settings  # noqa: WPS433
+
+    ensure_env_loaded()
+    try:
+        pool = get_provider_pool(load_settings())
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 500
+    if pool is None:
+        return jsonify({"ok": True, "mode": "env", "providers": []})
+    return jsonify({"ok": True, "mode": "pool", "failover": pool.failover, "providers": pool.snapshot()})
+
+
+@app.get("/api/ai/calls/summary")
+def ai_calls_summary():
+    """Token, cost and latency summary of logged AI calls (table ai_calls).
+
+    Query params: date_from, date_to (on the call time, UTC), hours (last N hours, instead of
+    date_from), run_id, group_by (comma-separated: model, prompt, purpose, provider)
+    """
+
+    from src.ai.accounting import GROUP_FIELDS, summarize_calls  # noqa: WPS433
+
+    try:
+        date_from = _parse_date_arg("date_from")
+        date_to = _parse_date_arg("date_to")
+        hours_raw = (request.args.get("hours") or "").strip()
+        if hours_raw:
+            from datetime import datetime, timedelta, timezone  # noqa: WPS433
+
+            try:
+                hours = float(hours_raw)
+            except ValueError:
+                raise ValueError("hours must be a number") from None
+            if hours <= 0:
+                raise ValueError("hours must be positive")
+            date_from = (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+        run_id_raw = (request.args.get("run_id") or "").strip()
+        run_id = int(run_id_raw) if run_id_raw else None
+        group_by = [g.strip() for g in (request.args.get("group_by") or "model").split(",") if g.strip()]
+        unknown = [g for g in group_by if g not in GROUP_FIELDS]
+        if unknown:
+            raise ValueError(f"group_by must be among {', '.join(GROUP_FIELDS)}: {', '.join(unknown)}")
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    from src.config import ai_accounting, db_path, load_settings  # noqa: WPS433
+    from src.database.sqlite import list_ai_calls  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
+
+    settings = load_settings()
+    conn = read_connection(db_path(settings))
+    try:
+        rows = list_ai_calls(conn, date_from=date_from, date_to=date_to, run_id=run_id)
     finally:
         conn.close()
+    return jsonify(
+        {
+            "ok": True,
+            "date_from": date_from,
+            "date_to": date_to,
+            "run_id": run_id,
+            "group_by": group_by,
+            "currency": ai_accounting(settings)["currency"],
+            **summarize_calls(rows, group_by),
+        }
+    )
 
 
 @app.get("/api/portraits")
 def portraits_list():
+    """Paginated portrait list.
+
+    Query params: limit, after, channel_id, date_from, date_to, parse_ok, with_total
+    """
+
+    try:
+        query = _parse_list_args(with_parse_ok=True)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
     from src.config import db_path, load_settings  # noqa: WPS433
-    from src.database.sqlite import connect, init_schema, list_ai_portraits  # noqa: WPS433
+    from src.database.sqlite import count_ai_portraits, list_ai_portraits  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
 
     settings = load_settings()
-    conn = connect(db_path(settings))
+    conn = read_connection(db_path(settings))
     try:
-        init_schema(conn)
-        rows = list(list_ai_portraits(conn))
+        rows = list(list_ai_portraits(conn, **query))
         items = [
             {
                 "run_id": r["run_id"],
@@ -305,21 +758,76 @@ def portraits_list():
             }
             for r in rows
         ]
-        return jsonify({"ok": True, "count": len(items), "items": items})
+        body: Dict[str, Any] = {
+            "ok": True,
+            "count": len(items),
+            "items": items,
+            "next_after": items[-1]["run_id"] if len(items) == query["limit"] else None,
+        }
+        if _with_total():
+            filters = {k: v for k, v in query.items() if k not in {"limit", "after"}}
+            body["total"] = count_ai_portraits(conn, **filters)
+        return jsonify(body)
+    finally:
+        conn.close()
+
+
+@app.get("/api/channels/<channel_id>/portrait")
+def channel_portrait(channel_id: str):
+    """Channel-level portrait merged from the stored portraits of its videos (no AI call).
+
+    Query params: date_from, date_to (on the run's collected_at), refresh
+    """
+
+    try:
+        date_from = _parse_date_arg("date_from")
+        date_to = _parse_date_arg("date_to")
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    refresh = (request.args.get("refresh") or "").strip().lower() in {"1", "true"}
+
+    from src.config import ai_language, db_path, load_settings  # noqa: WPS433
+    from src.data_analyse.channel_portrait import get_channel_portrait_cache  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
+
+    settings = load_settings()
+    conn = read_connection(db_path(settings))
+    try:
+        result = get_channel_portrait_cache().get(
+            conn,
+            channel_id,
+            date_from=date_from,
+            date_to=date_to,
+            language=ai_language(settings),
+            refresh=refresh,
+        )
     finally:
         conn.close()
+    if result is None:
+        return jsonify({"ok": False, "error": "no parsed portraits for this channel"}), 404
+    return jsonify({"ok": True, **result})
 
 
 @app.get("/api/collections")
 def collections_list():
+    """Paginated collection run list.
+
+    Query params: limit, after, channel_id, date_from, date_to, with_total
+    """
+
+    try:
+        query = _parse_list_args()
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
     from src.config import db_path, load_settings  # noqa: WPS433
-    from src.database.sqlite import connect, init_schema, list_collection_runs  # noqa: WPS433
+    from src.database.sqlite import count_collection_runs, list_collection_runs  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
 
     settings = load_settings()
-    conn = connect(db_path(settings))
+    conn = read_connection(db_path(settings))
     try:
-        init_schema(conn)
-        rows = list(list_collection_runs(conn))
+        rows = list(list_collection_runs(conn, **query))
         items = [
             {
                 "run_id": r["run_id"],
@@ -333,40 +841,170 @@ def collections_list():
                 "max_comments": r["max_comments"],
                 "raw_count": r["raw_count"],
                 "clean_count": r["clean_count"],
+                "archived_at": r["archived_at"],
             }
             for r in rows
         ]
-        return jsonify({"ok": True, "count": len(items), "items": items})
+        body: Dict[str, Any] = {
+            "ok": True,
+            "count": len(items),
+            "items": items,
+            "next_after": items[-1]["run_id"] if len(items) == query["limit"] else None,
+        }
+        if _with_total():
+            filters = {k: v for k, v in query.items() if k not in {"limit", "after"}}
+            body["total"] = count_collection_runs(conn, **filters)
+        return jsonify(body)
+    finally:
+        conn.close()
+
+
+@app.get("/api/comments/search")
+def comments_search():
+    """Full-text search over cleaned comments (FTS5), ranked by bm25.
+
+    Query params: q (required), run_id, channel_id, date_from, date_to, limit, offset
+    """
+
+    args = request.args
+    q = (args.get("q") or "").strip()
+    if not q:
+        return jsonify({"ok": False, "error": "Missing q"}), 400
+
+    try:
+        run_id = int(args["run_id"]) if args.get("run_id") not in (None, "") else None
+        limit = max(1, min(200, int(args.get("limit", "20"))))
+        offset = max(0, int(args.get("offset", "0")))
+        date_from = _parse_date_arg("date_from")
+        date_to = _parse_date_arg("date_to")
+    except ValueError as e:
+        msg = str(e) if "date" in str(e) else "run_id/limit/offset must be int"
+        return jsonify({"ok": False, "error": msg}), 400
+
+    from src.config import db_path, load_settings  # noqa: WPS433
+    from src.database.sqlite import search_clean_comments  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
+
+    settings = load_settings()
+    conn = read_connection(db_path(settings))
+    try:
+        items = search_clean_comments(
+            conn,
+            query=q,
+            run_id=run_id,
+            channel_id=(args.get("channel_id") or "").strip() or None,
+            date_from=date_from,
+            date_to=date_to,
+            limit=limit,
+            offset=offset,
+        )
+        return jsonify({"ok": True, "q": q, "count": len(items), "items": items})
+    finally:
+        conn.close()
+
+
+@app.get("/api/export")
+def export_runs():
+    """Stream runs as a Parquet / Arrow IPC download, one record batch at a time.
+
+    Query params: run_id (repeatable), channel_id, format=parquet|arrow, chunk_size
+    """
+
+    args = request.args
+    fmt = (args.get("format") or "parquet").strip().lower()
+    try:
+        run_ids = [int(x) for x in args.getlist("run_id") if x not in (None, "")]
+        chunk_size = max(100, min(50000, int(args.get("chunk_size", "5000"))))
+    except ValueError:
+        return jsonify({"ok": False, "error": "run_id/chunk_size must be int"}), 400
+    channel_id = (args.get("channel_id") or "").strip() or None
+    if not run_ids and not channel_id:
+        return jsonify({"ok": False, "error": "Missing run_id or channel_id"}), 400
+
+    from src.config import db_path, load_settings  # noqa: WPS433
+    from src.data_analyse.export import (  # noqa: WPS433
+        FORMATS,
+        MIME_TYPES,
+        export_schema,
+        resolve_run_ids,
+        stream_export,
+    )
+    from src.database.writer import read_connection  # noqa: WPS433
+
+    if fmt not in FORMATS:
+        return jsonify({"ok": False, "error": f"format must be one of {list(FORMATS)}"}), 400
+    try:
+        export_schema()
+    except RuntimeError as e:
+        return jsonify({"ok": False, "error": str(e)}), 501
+
+    db_file = db_path(load_settings())
+    conn = read_connection(db_file)
+    try:
+        resolved = resolve_run_ids(conn, run_ids=run_ids, channel_id=channel_id)
     finally:
         conn.close()
+    if not resolved:
+        return jsonify({"ok": False, "error": "no matching runs"}), 404
+
+    ext = "parquet" if fmt == "parquet" else "arrow"
+    name = f"runs_{resolved[0]}.{ext}" if len(resolved) == 1 else f"runs_{resolved[0]}-{resolved[-1]}.{ext}"
+    return Response(
+        stream_with_context(stream_export(db_file, resolved, fmt=fmt, chunk_size=chunk_size)),
+        mimetype=MIME_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
+    )
 
 
 @app.post("/api/collections/delete")
 def collections_delete():
+    """Delete one run ({run_id}) or many runs ({run_ids: [...]}) in one transaction."""
+
     payload: Dict[str, Any] = request.get_json(silent=True) or {}
+    run_ids_raw = payload.get("run_ids")
     run_id_raw = payload.get("run_id")
-    if run_id_raw in (None, ""):
-        return jsonify({"ok": False, "error": "Missing run_id"}), 400
 
-    try:
-        run_id = int(run_id_raw)
-    except Exception:
-        return jsonify({"ok": False, "error": "run_id must be int"}), 400
-    if run_id <= 0:
+    if run_ids_raw not in (None, ""):
+        if not isinstance(run_ids_raw, list) or not run_ids_raw:
+            return jsonify({"ok": False, "error": "run_ids must be a non-empty list"}), 400
+        if len(run_ids_raw) > 10000:
+            return jsonify({"ok": False, "error": "run_ids accepts at most 10000 ids"}), 400
+        try:
+            run_ids = [int(r) for r in run_ids_raw]
+        except Exception:
+            return jsonify({"ok": False, "error": "run_ids must be ints"}), 400
+    else:
+        if run_id_raw in (None, ""):
+            return jsonify({"ok": False, "error": "Missing run_id or run_ids"}), 400
+        try:
+            run_ids = [int(run_id_raw)]
+        except Exception:
+            return jsonify({"ok": False, "error": "run_id must be int"}), 400
+
+    if any(r <= 0 for r in run_ids):
         return jsonify({"ok": False, "error": "run_id must be positive int"}), 400
 
     from src.config import db_path, load_settings  # noqa: WPS433
-    from src.database.sqlite import connect, delete_collection_run, init_schema  # noqa: WPS433
+    from src.database.sqlite import delete_collection_runs, get_run_archive_path  # noqa: WPS433
+    from src.database.writer import run_write  # noqa: WPS433
+
+    def _delete(conn: Any) -> tuple[int, list[str]]:
+        archive_paths = [p for p in (get_run_archive_path(conn, r) for r in run_ids) if p]
+        return delete_collection_runs(conn, run_ids), archive_paths
 
     settings = load_settings()
-    conn = connect(db_path(settings))
-    try:
-        init_schema(conn)
-        deleted = delete_collection_run(conn, run_id)
-        conn.commit()
-        return jsonify({"ok": True, "run_id": run_id, "deleted": deleted})
-    finally:
-        conn.close()
+    deleted, archive_paths = run_write(db_path(settings), _delete)
+    # EN: Remove the cold copies only once the rows are gone for good.
+    # 中文：数据库删除提交后再删除归档文件。
+    if archive_paths:
+        from pathlib import Path  # noqa: WPS433
+
+        for archive_path in archive_paths:
+            Path(archive_path).unlink(missing_ok=True)
+
+    if run_ids_raw not in (None, ""):
+        return jsonify({"ok": True, "run_ids": run_ids, "deleted": deleted})
+    return jsonify({"ok": True, "run_id": run_ids[0], "deleted": deleted})
 
 
 @app.post("/api/collections/detail")
@@ -384,12 +1022,12 @@ def collections_detail():
         return jsonify({"ok": False, "error": "run_id must be positive int"}), 400
 
     from src.config import db_path, load_settings  # noqa: WPS433
-    from src.database.sqlite import connect, get_collection_run_detail, init_schema  # noqa: WPS433
+    from src.database.sqlite import get_collection_run_detail  # noqa: WPS433
+    from src.database.writer import read_connection  # noqa: WPS433
 
     settings = load_settings()
-    conn = connect(db_path(settings))
+    conn = read_connection(db_path(settings))
     try:
-        init_schema(conn)
         row = get_collection_run_detail(conn, run_id)
         if row is None:
             return jsonify({"ok": False, "error": "collection not found"}), 404
@@ -407,15 +1045,36 @@ def collections_detail():
                 "max_comments": row["max_comments"],
                 "raw_count": row["raw_count"],
                 "clean_count": row["clean_count"],
+                "archived_at": row["archived_at"],
             }
         )
     finally:
         conn.close()
 
 
+def _start_background_jobs() -> None:
+    """Start periodic maintenance (run archival + incremental vacuum).
+
+    EN: With the debug reloader only the child process (WERKZEUG_RUN_MAIN) serves requests;
+        without debug there is a single process and the jobs always start.
+    中文：debug 模式下只在实际处理请求的子进程中启动，避免重复运行；非 debug 模式只有一个进程，总是启动。
+    """
+
+    if app.debug and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+        return
+
+    from src.database.archive import start_retention_worker  # noqa: WPS433
+
+    start_retention_worker()
+
+
 if __name__ == "__main__":
+    # EN: Set before starting the jobs, which check it to skip the reloader's parent process.
+    # 中文：需在启动后台任务前设置，后台任务据此跳过 reloader 的父进程。
+    app.debug = True
+    _start_background_jobs()
     app.run(
         host=os.getenv("HOST", "127.0.0.1"),
         port=int(os.getenv("PORT", "5076")),
-        debug=True,
+        debug=app.debug,
     )
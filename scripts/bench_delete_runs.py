@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+
+def _ensure_project_root_on_syspath() -> None:
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+
+
+_ensure_project_root_on_syspath()
+
+from src.config import project_root  # noqa: E402
+from src.database.sqlite import (  # noqa: E402
+    connect,
+    delete_collection_runs,
+    init_schema,
+    insert_collection_run,
+)
+
+
+def _build_db(db_file: Path, runs: int, comments: int) -> List[int]:
+    """Bulk-load `runs` runs with `comments` raw + clean rows each (plain SQL for speed)."""
+
+    conn = connect(db_file)
+    try:
+        init_schema(conn)
+        run_ids: List[int] = []
+        for run_no in range(runs):
+            run_id = insert_collection_run(
+                conn,
+                video_id=f"video{run_no}",
+                video_url=f"https://www.youtube.com/watch?v=video{run_no}",
+                order_mode="relevance",
+                max_comments=comments,
+            )
+            run_ids.append(run_id)
+            conn.executemany(
+                """
+                INSERT INTO raw_comment_threads (run_id, video_id, thread_id, fetched_at, item_json)
+                VALUES (?, ?, ?, '2026-01-01T00:00:00+00:00', '{}')
+                """,
+                ((run_id, f"video{run_no}", f"t{i}") for i in range(comments)),
+            )
+            conn.execute(
+                """
+                INSERT INTO clean_comments (
+                    run_id, raw_thread_id, video_id, comment_id, cleaned_at, text
+                )
+                SELECT run_id, id, video_id, 'c' || thread_id, fetched_at,
+                       'benchmark comment text 压测评论 ' || thread_id
+                FROM raw_comment_threads WHERE run_id = ?
+                """,
+                (run_id,),
+            )
+            conn.commit()
+        return run_ids
+    finally:
+        conn.close()
+
+
+def _delete_legacy(db_file: Path, run_ids: List[int]) -> float:
+    """Old behaviour: one DELETE per run relying on ON DELETE CASCADE, no raw_thread_id index."""
+
+    conn = connect(db_file)
+    try:
+        conn.execute("DROP INDEX IF EXISTS idx_clean_comments_raw_thread")
+        conn.commit()
+        t0 = time.perf_counter()
+        for run_id in run_ids:
+            conn.execute("DELETE FROM collection_runs WHERE id = ?", (run_id,))
+            conn.commit()
+        return time.perf_counter() - t0
+    finally:
+        conn.close()
+
+
+def _delete_bulk(db_file: Path, run_ids: List[int]) -> float:
+    conn = connect(db_file)
+    try:
+        init_schema(conn)
+        t0 = time.perf_counter()
+        delete_collection_runs(conn, run_ids)
+        conn.commit()
+        return time.perf_counter() - t0
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmark deleting large runs: legacy per-run cascade without the "
+            "clean_comments(raw_thread_id) index vs. indexed bulk delete_collection_runs."
+        )
+    )
+    parser.add_argument("--runs", type=int, default=20, help="Runs in the DB")
+    parser.add_argument("--comments", type=int, default=2000, help="Comments per run")
+    parser.add_argument("--delete", type=int, default=5, help="How many of the oldest runs to delete")
+    parser.add_argument(
+        "--dir",
+        default=str(project_root() / "data"),
+        help="Directory for the temporary DBs (default: data/)",
+    )
+    args = parser.parse_args()
+
+    base_dir = Path(args.dir)
+    base_dir.mkdir(parents=True, exist_ok=True)
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_delete_", dir=base_dir))
+
+    print(f"runs={args.runs} comments/run={args.comments} delete={args.delete} dir={work_dir}")
+    try:
+        results = {}
+        for name, fn in (("legacy_cascade", _delete_legacy), ("bulk_indexed", _delete_bulk)):
+            db_file = work_dir / f"{name}.sqlite3"
+            run_ids = _build_db(db_file, args.runs, args.comments)
+            results[name] = fn(db_file, run_ids[: args.delete])
+            rows = args.delete * args.comments * 2
+            print(f"{name:<16}{results[name]:>10.3f}s{rows / results[name]:>14.0f} rows/s")
+        if results.get("bulk_indexed"):
+            print(f"speedup: {results['legacy_cascade'] / results['bulk_indexed']:.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+def _ensure_project_root_on_syspath() -> None:
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+
+
+_ensure_project_root_on_syspath()
+
+from src.config import db_pragmas, load_settings, project_root  # noqa: E402
+from src.database.sqlite import (  # noqa: E402
+    connect,
+    init_schema,
+    insert_clean_comment,
+    insert_collection_run,
+    insert_raw_thread,
+    iter_clean_comments,
+    list_collection_runs,
+)
+
+# EN: Built-in profiles to compare against the one configured in settings.json.
+# 中文：内置的对照配置，与 settings.json 中的配置一起比较。
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "sqlite_default": {},
+    "durable": {
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+        "wal_autocheckpoint": 1000,
+    },
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -20000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "wal_autocheckpoint": 1000,
+    },
+    "fast": {
+        "synchronous": "OFF",
+        "cache_size": -200000,
+        "mmap_size": 1073741824,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "wal_autocheckpoint": 10000,
+    },
+}
+
+
+def _fake_item(run_no: int, i: int) -> Dict[str, Any]:
+    text = f"bench comment {run_no}-{i} 这是一条用于压测的评论 " + ("lorem ipsum " * (i % 20))
+    return {
+        "id": f"thread-{run_no}-{i}",
+        "snippet": {
+            "totalReplyCount": i % 7,
+            "topLevelComment": {
+                "id": f"comment-{run_no}-{i}",
+                "snippet": {
+                    "publishedAt": "2026-01-01T00:00:00Z",
+                    "authorDisplayName": f"user{i % 500}",
+                    "likeCount": i % 97,
+                    "textDisplay": text,
+                },
+            },
+        },
+    }
+
+
+def _bench_profile(db_file: Path, pragmas: Dict[str, Any], runs: int, comments: int) -> Dict[str, float]:
+    conn = connect(db_file, pragmas=pragmas)
+    try:
+        init_schema(conn)
+
+        # 1) Insert: one commit per run, like collect_raw_to_db + clean_run_to_db.
+        t0 = time.perf_counter()
+        for run_no in range(runs):
+            run_id = insert_collection_run(
+                conn,
+                video_id=f"video{run_no}",
+                video_url=f"https://www.youtube.com/watch?v=video{run_no}",
+                order_mode="relevance",
+                max_comments=comments,
+                channel_id=f"channel{run_no % 10}",
+            )
+            for i in range(comments):
+                insert_raw_thread(conn, run_id=run_id, video_id=f"video{run_no}", item=_fake_item(run_no, i))
+            conn.commit()
+            raw_ids = [
+                int(r[0])
+                for r in conn.execute(
+                    "SELECT id FROM raw_comment_threads WHERE run_id = ? ORDER BY id", (run_id,)
+                )
+            ]
+            for i, raw_id in enumerate(raw_ids):
+                item = _fake_item(run_no, i)
+                top = item["snippet"]["topLevelComment"]["snippet"]
+                insert_clean_comment(
+                    conn,
+                    run_id=run_id,
+                    raw_thread_id=raw_id,
+                    video_id=f"video{run_no}",
+                    comment_id=item["snippet"]["topLevelComment"]["id"],
+                    published_at=top["publishedAt"],
+                    author=top["authorDisplayName"],
+                    like_count=top["likeCount"],
+                    reply_count=item["snippet"]["totalReplyCount"],
+                    text=top["textDisplay"],
+                    text_original=top["textDisplay"],
+                )
+            conn.commit()
+        insert_s = time.perf_counter() - t0
+    finally:
+        conn.close()
+
+    # 2) List: fresh connection, paginate runs and read every run's comments.
+    conn = connect(db_file, pragmas=pragmas)
+    try:
+        t0 = time.perf_counter()
+        after = None
+        run_ids: List[int] = []
+        while True:
+            page = list(list_collection_runs(conn, limit=50, after=after))
+            if not page:
+                break
+            run_ids.extend(int(r["run_id"]) for r in page)
+            after = int(page[-1]["run_id"])
+        rows_read = 0
+        for run_id in run_ids:
+            rows_read += len(list(iter_clean_comments(conn, run_id)))
+        list_s = time.perf_counter() - t0
+    finally:
+        conn.close()
+
+    total_rows = runs * comments * 2
+    return {
+        "insert_s": insert_s,
+        "insert_rows_per_s": total_rows / insert_s if insert_s else 0.0,
+        "list_s": list_s,
+        "list_rows_per_s": rows_read / list_s if list_s else 0.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmark insert and list throughput of the SQLite layer under several pragma "
+            "profiles, including the one configured in settings.json (database.pragmas)."
+        )
+    )
+    parser.add_argument("--runs", type=int, default=50, help="Collection runs to insert per profile")
+    parser.add_argument("--comments", type=int, default=200, help="Comments per run")
+    parser.add_argument(
+        "--dir",
+        default=str(project_root() / "data"),
+        help="Directory for the temporary DBs (default: data/, i.e. the disk you deploy on)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="append",
+        default=None,
+        help="Only run these profiles (repeatable). Available: settings, " + ", ".join(PROFILES),
+    )
+    args = parser.parse_args()
+
+    profiles = {"settings": db_pragmas(load_settings()), **PROFILES}
+    if args.profile:
+        missing = [p for p in args.profile if p not in profiles]
+        if missing:
+            raise SystemExit(f"Unknown profile(s): {missing}")
+        profiles = {k: v for k, v in profiles.items() if k in args.profile}
+
+    base_dir = Path(args.dir)
+    base_dir.mkdir(parents=True, exist_ok=True)
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_pragmas_", dir=base_dir))
+
+    print(f"runs={args.runs} comments/run={args.comments} dir={work_dir}")
+    print(f"{'profile':<16}{'insert s':>10}{'insert rows/s':>16}{'list s':>10}{'list rows/s':>16}")
+    try:
+        for name, pragmas in profiles.items():
+            result = _bench_profile(work_dir / f"{name}.sqlite3", pragmas, args.runs, args.comments)
+            print(
+                f"{name:<16}{result['insert_s']:>10.2f}{result['insert_rows_per_s']:>16.0f}"
+                f"{result['list_s']:>10.2f}{result['list_rows_per_s']:>16.0f}"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+
+
+def _ensure_project_root_on_syspath() -> None:
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+
+
+_ensure_project_root_on_syspath()
+
+from src.ai.json_repair import try_parse_json  # noqa: E402
+from src.data_analyse.portrait import _parse_or_fix  # noqa: E402
+
+SCHEMA_KEYS = ["summary", "tags", "language_distribution", "sentiment", "topics", "audience_insights", "confidence"]
+FULL = {
+    "summary": "s",
+    "tags": ["a"],
+    "language_distribution": {"zh": 1},
+    "sentiment": {"positive": 1},
+    "topics": [{"name": "t", "weight": 1}],
+    "audience_insights": {"interests": []},
+    "confidence": 0.5,
+}
+
+# EN: (raw reply, finish_reason, expect a parsed portrait). None of these may reach the fix call:
+#     `ai_cfg` is empty, so a fix call would raise instead of returning.
+# 中文：（原始回复，finish_reason，是否应解析成功）。这些用例都不应发起修正调用：`ai_cfg` 为空，
+#       一旦发起修正调用就会抛出异常。
+PORTRAIT_CASES = [
+    (json.dumps(FULL), "stop", True),
+    ("```json\n" + json.dumps(FULL) + ",\n```", "stop", True),
+    # EN: Cut off by max_tokens: the closed prefix is missing most of the schema.
+    # 中文：被 max_tokens 截断：补全后的前缀缺少大部分字段。
+    ('{"summary": "s", "tags": ["a"], "language_distribution": {', "length", False),
+    ('{"summary": "s", "tags": ["a"], "language_distribution": {', None, False),
+    # EN: A cut-off string value must not be accepted as finished.
+    # 中文：写了一半的字符串值不能被当作已完成。
+    ('{"summary": "The audience is mostly young fa', None, False),
+    (json.dumps(FULL)[:-1], None, False),
+    (json.dumps(FULL), "length", False),
+    (json.dumps({k: v for k, v in FULL.items() if k != "confidence"}), "stop", False),
+    ("[1, 2]", "stop", False),
+]
+
+
+def _check_portrait_replies() -> int:
+    failures = 0
+    for raw, finish_reason, ok in PORTRAIT_CASES:
+        try:
+            parsed, error, _repair = _parse_or_fix({}, raw, fix_call=True, keys=SCHEMA_KEYS, finish_reason=finish_reason)
+        except Exception as e:  # noqa: BLE001
+            parsed, error = None, f"<fix call attempted: {e!r}>"
+        if (error is None) != ok or (ok and parsed != FULL):
+            failures += 1
+            print(f"FAIL {raw[:60]!r} ({finish_reason}): parsed={parsed!r} error={error!r}", file=sys.stderr)
+    return failures
+
+
+def _check_truncated_flag() -> int:
+    """Local repair still closes a truncated reply, and says so in its fixes."""
+
+    value, fixes, error = try_parse_json('{"summary": "The audience is mostly young fa')
+    if error is not None or "truncated" not in fixes or value != {"summary": "The audience is mostly young fa"}:
+        print(f"FAIL truncated flag: {value!r} {fixes!r} {error!r}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main() -> int:
+    """Offline checks for portrait reply parsing (no server or API key needed).
+
+    EN: Run `python scripts/test_json_repair.py`; exits non-zero if any case fails.
+    中文：运行 `python scripts/test_json_repair.py`；有用例失败时以非零状态退出。
+    """
+
+    failures = _check_portrait_replies() + _check_truncated_flag()
+    print(f"json_repair: {len(PORTRAIT_CASES) + 1 - failures}/{len(PORTRAIT_CASES) + 1} ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+from pathlib import Path
+
+
+def _ensure_project_root_on_syspath() -> None:
+    root = Path(__file__).resolve().parents[1]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+
+
+_ensure_project_root_on_syspath()
+
+from src.ai.partial_json import ProgressiveJsonParser, complete_json_prefix  # noqa: E402
+
+# EN: (prefix, expected value after completion). A complete value is never dropped; only a
+#     scalar that may still grow at the very end of the text is.
+# 中文：（前缀，补全后的期望值）。已完整的值不会被丢弃；只丢弃位于原文末尾、可能还没写完的标量。
+PREFIX_CASES = [
+    ('{"a": 1, "b"', {"a": 1}),
+    ('{"a": 1, "b":', {"a": 1}),
+    ('{"a": 1, "b": ', {"a": 1}),
+    ('{"a": 1, "b', {"a": 1}),
+    ('{"a": 1,', {"a": 1}),
+    ('{"a": 1 ', {"a": 1}),
+    ('{"a": 1', {}),
+    ('{"a": 0.7e', {}),
+    ('{"a": -', {}),
+    ('{"a": tr', {}),
+    ('{"a": true', {"a": True}),
+    ('{"a": null, "b": 1.5, "c"', {"a": None, "b": 1.5}),
+    ('{"a": [1, 2', {"a": [1]}),
+    ('{"a": [1, 2,', {"a": [1, 2]}),
+    ('{"a": {"b": 2}, "c": [3,', {"a": {"b": 2}, "c": [3]}),
+    ('{"a": "x', {"a": "x"}),
+    ('{"a": "x\\u00', {"a": "x"}),
+    ('{"a": "x\\', {"a": "x"}),
+    ('{"a": "x", "b', {"a": "x"}),
+]
+
+
+def _check_prefixes() -> int:
+    failures = 0
+    for prefix, expected in PREFIX_CASES:
+        candidate, closed = complete_json_prefix(prefix)
+        try:
+            got = json.loads(candidate)
+        except ValueError as e:
+            got = f"<invalid: {e}>"
+        if got != expected or closed:
+            failures += 1
+            print(f"FAIL {prefix!r}: {candidate!r} (closed={closed}), expected {expected!r}", file=sys.stderr)
+    return failures
+
+
+PROGRESSIVE_VALUE = {"a": 12, "b": [1, 2.5], "c": "x,y}\\\"", "d": {"e": None, "f": "{"}, "g": True}
+
+
+def _check_progressive() -> int:
+    """Every field `feed` reports must equal its value in the finished object, for any delta size."""
+
+    text = "Here you go:\n```json\n" + json.dumps(PROGRESSIVE_VALUE) + "\n```"
+    failures = 0
+    for size in (1, 2, 3, 7, len(text)):
+        parser = ProgressiveJsonParser()
+        seen = {}
+        for i in range(0, len(text), size):
+            for key, value in parser.feed(text[i : i + size]):
+                seen[key] = value
+        if seen != PROGRESSIVE_VALUE:
+            failures += 1
+            print(f"FAIL progressive (delta {size}): {seen!r}", file=sys.stderr)
+    return failures
+
+
+def _check_progressive_linear() -> int:
+    """Streaming a large reply in 4-character deltas stays linear (well under a second)."""
+
+    text = json.dumps({f"k{i}": {"text": "x" * 40, "n": i} for i in range(4000)})
+    parser = ProgressiveJsonParser()
+    t0 = time.perf_counter()
+    count = sum(len(parser.feed(text[i : i + 4])) for i in range(0, len(text), 4))
+    elapsed = time.perf_counter() - t0
+    if count != 4000 or elapsed > 1.0:
+        print(f"FAIL progressive linear: {count} fields of {len(text)} chars in {elapsed:.2f}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main() -> int:
+    """Offline checks for src/ai/partial_json.py (no server or API key needed).
+
+    EN: Run `python scripts/test_partial_json.py`; exits non-zero if any case fails.
+    中文：运行 `python scripts/test_partial_json.py`；有用例失败时以非零状态退出。
+    """
+
+    failures = _check_prefixes() + _check_progressive() + _check_progressive_linear()
+    total = len(PREFIX_CASES) + 6
+    print(f"partial_json: {total - failures}/{total} ok")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -24,7 +24,9 @@ from src.ai.deepseek_client import (  # noqa: E402
     extract_message_content,
     load_ai_config_from_env,
 )
-from src.config import default_ai_prompt_filename, load_settings  # noqa: E402
+from src.ai.json_repair import parse_json_tolerant  # noqa: E402
+from src.ai.prompts import get_prompt_registry  # noqa: E402
+from src.config import load_settings  # noqa: E402
 
 
 def _resolve_base_url() -> str:
@@ -33,71 +35,16 @@ def _resolve_base_url() -> str:
     return os.getenv("BASE_URL", f"http://{host}:{port}").rstrip("/")
 
 
-def _load_prompt_json(path: Path) -> Dict[str, Any]:
-    data = json.loads(path.read_text(encoding="utf-8"))
-    if not isinstance(data, dict):
-        raise ValueError("Prompt JSON must be an object")
-    if not isinstance(data.get("system_prompt"), str) or not data["system_prompt"].strip():
-        raise ValueError("Prompt JSON must contain non-empty system_prompt")
-    return data
-
-
-def _extract_json_text(raw: str) -> str:
-    """Best-effort JSON extractor.
-
-    EN: Some models return JSON wrapped in markdown code fences.
-    中文：部分模型会把 JSON 包在 markdown 代码块里，这里做一次兼容抽取。
-    """
-
-    s = (raw or "").strip()
-    if s.startswith("```"):
-        lines = s.splitlines()
-        if len(lines) >= 3 and lines[-1].strip().startswith("```"):
-            s = "\n".join(lines[1:-1]).strip()
-    # Try to slice the first JSON object/array.
-    obj_start = s.find("{")
-    obj_end = s.rfind("}")
-    arr_start = s.find("[")
-    arr_end = s.rfind("]")
-    if obj_start != -1 and obj_end != -1 and obj_end > obj_start:
-        return s[obj_start : obj_end + 1]
-    if arr_start != -1 and arr_end != -1 and arr_end > arr_start:
-        return s[arr_start : arr_end + 1]
-    return s
-
+def _resolve_prompt(cli_value: str | None) -> Dict[str, Any]:
+    registry = get_prompt_registry()
 
-def _resolve_prompt_path(cli_value: str | None) -> Path:
-    project_root = Path(__file__).resolve().parents[1]
-
-    # 1) CLI override
+    # 1) CLI override; otherwise env AI_PROMPT / settings.json via the prompt registry
     if cli_value:
-        raw = str(cli_value).strip().strip('"')
-        p = Path(raw)
-        if not p.is_absolute():
-            p = project_root / p
-        return p
-
-    # 2) Env override
-    env_value = (os.getenv("AI_PROMPT") or "").strip().strip('"')
-    if env_value:
-        p = Path(env_value)
+        p = Path(str(cli_value).strip().strip('"'))
         if not p.is_absolute():
-            p = project_root / p
-        if p.exists():
-            return p
-        if p.suffix.lower() == ".txt":
-            candidate = p.with_suffix(".json")
-            if candidate.exists():
-                return candidate
-
-    # 3) Default based on settings.json ai.language (default zh)
-    settings = load_settings()
-    default_path = project_root / "AI_PROMPT" / default_ai_prompt_filename(settings)
-    if default_path.exists():
-        return default_path
-
-    # 4) Final fallback for legacy setups
-    return project_root / "AI_PROMPT" / "AI_PROMPT_Default.json"
+            p = Path(__file__).resolve().parents[1] / p
+        return registry.load(p)
+    return registry.resolve(load_settings())[1]
 
 
 def _pipeline_call(*, base_url: str, url: str, order: str, max_comments: int) -> Dict[str, Any]:
@@ -188,8 +135,7 @@ def main() -> int:
         print("# Pipeline response")
         print(json.dumps(pipeline_data, ensure_ascii=False, indent=2))
 
-    prompt_path = _resolve_prompt_path(args.prompt)
-    prompt_obj = _load_prompt_json(prompt_path)
+    prompt_obj = _resolve_prompt(args.prompt)
 
     portrait_input = _to_portrait_input(pipeline_data)
     user_content = json.dumps(portrait_input, ensure_ascii=False)
@@ -209,7 +155,7 @@ def main() -> int:
 
     print("# Portrait result")
     try:
-        parsed = json.loads(_extract_json_text(raw))
+        parsed, _fixes = parse_json_tolerant(raw)
         print(json.dumps(parsed, ensure_ascii=False, indent=2))
         return 0
     except Exception:  # noqa: BLE001
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from src.database.sqlite import insert_ai_call
+from src.database.writer import get_writer
+
+GROUP_FIELDS = {
+    "model": ("model",),
+    "prompt": ("prompt_name", "prompt_version"),
+    "purpose": ("purpose",),
+    "provider": ("provider",),
+}
+PERCENTILES = (50, 90, 95, 99)
+CANCELLED_PREFIX = "cancelled:"
+
+
+def usage_tokens(usage: Optional[Dict[str, Any]]) -> Dict[str, Optional[int]]:
+    """prompt/completion/cache-hit tokens of an OpenAI-compatible `usage` object.
+
+    EN: Cache hits are read from DeepSeek's `prompt_cache_hit_tokens`, or from OpenAI's
+        `prompt_tokens_details.cached_tokens`. Missing fields stay None.
+    中文：缓存命中 token 取自 DeepSeek 的 `prompt_cache_hit_tokens`，或 OpenAI 的
+          `prompt_tokens_details.cached_tokens`；缺失的字段为 None。
+    """
+
+    usage = usage if isinstance(usage, dict) else {}
+
+    def _int(value: Any) -> Optional[int]:
+        return int(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+    hit = _int(usage.get("prompt_cache_hit_tokens"))
+    details = usage.get("prompt_tokens_details")
+    if hit is None and isinstance(details, dict):
+        hit = _int(details.get("cached_tokens"))
+    return {
+        "prompt_tokens": _int(usage.get("prompt_tokens")),
+        "completion_tokens": _int(usage.get("completion_tokens")),
+        "cache_hit_tokens": hit,
+    }
+
+
+def estimate_cost(
+    pricing: Dict[str, Dict[str, float]], model: Optional[str], tokens: Dict[str, Optional[int]]
+) -> Optional[float]:
+    """Cost of one call from `ai_accounting(settings)["pricing"]` (None for an unpriced model or no usage)."""
+
+    prices = pricing.get(model or "")
+    if prices is None or tokens.get("prompt_tokens") is None:
+        return None
+    prompt = int(tokens["prompt_tokens"] or 0)
+    hit = min(prompt, int(tokens.get("cache_hit_tokens") or 0))
+    completion = int(tokens.get("completion_tokens") or 0)
+    cost = (
+        (prompt - hit) * prices["input"]
+        + hit * prices["cached_input"]
+        + completion * prices["output"]
+    ) / 1_000_000
+    return round(cost, 8)
+
+
+def record_call(
+    account: Dict[str, Any],
+    *,
+    model: str,
+    meta: Dict[str, Any],
+    latency_ms: float,
+    error: Optional[str] = None,
+    prompt_tokens_est: Optional[int] = None,
+) -> None:
+    """Queue the ai_calls rows of one call on the writer thread (never blocks the caller on a commit).
+
+    EN: `account` carries db_file, accounting config and the call context (run_id, purpose,
+        prompt_name, prompt_version); `meta` is what the client and provider pool filled in
+        (http_status, ttfb_ms, usage, provider, model, retries, queue_ms). Each entry of
+        `meta["attempts"]` (failovers and hedges that lost the race) gets its own failed row:
+        a provider bills a request it has started even when the answer is thrown away, so a
+        cancelled attempt without usage is costed as `prompt_tokens_est` input tokens.
+    中文：`account` 包含 db_file、计费配置与调用上下文（run_id、purpose、prompt_name、prompt_version）；
+          `meta` 为客户端与服务商池填入的信息（http_status、ttfb_ms、usage、provider、model、retries、queue_ms）。
+          `meta["attempts"]` 中的每一项（故障切换与对冲落败的请求）单独记为一行失败记录：服务商已开始处理的
+          请求即使结果被丢弃也会计费，因此没有 usage 的已取消请求按 `prompt_tokens_est` 个输入 token 估算费用。
+    """
+
+    db_file = account.get("db_file")
+    cfg = account.get("accounting") or {}
+    if db_file is None or not cfg.get("enabled", True):
+        return
+    pricing = cfg.get("pricing") or {}
+    created_at = datetime.now(timezone.utc).isoformat()
+
+    def _row(
+        call_meta: Dict[str, Any], model: str, latency: float, error: Optional[str], retries: int
+    ) -> Dict[str, Any]:
+        tokens = usage_tokens(call_meta.get("usage"))
+        return {
+            "created_at": created_at,
+            "run_id": account.get("run_id"),
+            "purpose": account.get("purpose"),
+            "provider": call_meta.get("provider") or account.get("provider"),
+            "model": model,
+            "prompt_name": account.get("prompt_name"),
+            "prompt_version": account.get("prompt_version"),
+            **tokens,
+            # EN: Time spent waiting for the rate limiter is not provider latency. The provider pool
+            #     already measures each attempt from when it was sent.
+            # 中文：等待限流器的时间不计入服务商延迟；服务商池已从请求发出时开始计时。
+            "latency_ms": round(
+                float(call_meta["latency_ms"])
+                if call_meta.get("latency_ms") is not None
+                else max(0.0, latency - float(call_meta.get("queue_ms") or 0)),
+                1,
+            ),
+            "ttfb_ms": call_meta.get("ttfb_ms"),
+            "http_status": call_meta.get("http_status"),
+            "retries": retries,
+            "cost_est": estimate_cost(pricing, model, tokens),
+            "ok": error is None,
+            "error": (error or "")[:500] or None,
+        }
+
+    rows = [_row(meta, str(meta.get("model") or model), latency_ms, error, meta.get("retries") or 0)]
+    for entry in meta.get("attempts") or []:
+        attempt_meta = {**entry.get("meta", {}), "provider": entry.get("provider"), "latency_ms": entry["latency_ms"]}
+        if (
+            entry.get("cancelled")
+            and attempt_meta.get("sent")
+            and not attempt_meta.get("usage")
+            and prompt_tokens_est is not None
+        ):
+            attempt_meta["usage"] = {"prompt_tokens": prompt_tokens_est, "completion_tokens": 0}
+        rows.append(
+            _row(attempt_meta, str(entry.get("model") or model), float(entry["latency_ms"]), entry["error"], 0)
+        )
+
+    def _insert(wconn: Any) -> None:
+        for row in rows:
+            insert_ai_call(wconn, row)
+
+    get_writer(db_file).submit(_insert)
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50/p90/p95/p99 and max of `values` (None when empty)."""
+
+    ordered = sorted(values)
+    out: Dict[str, Optional[float]] = {}
+    for p in PERCENTILES:
+        out[f"p{p}"] = (
+            round(float(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]), 1) if ordered else None
+        )
+    out["max"] = round(float(ordered[-1]), 1) if ordered else None
+    return out
+
+
+def _cancelled(row: Dict[str, Any]) -> bool:
+    return str(row["error"] or "").startswith(CANCELLED_PREFIX)
+
+
+def _summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _sum(key: str) -> int:
+        return sum(int(r[key] or 0) for r in rows)
+
+    prompt_tokens = _sum("prompt_tokens")
+    hit = _sum("cache_hit_tokens")
+    costs = [float(r["cost_est"]) for r in rows if r["cost_est"] is not None]
+    return {
+        "calls": len(rows),
+        "errors": sum(1 for r in rows if not r["ok"] and not _cancelled(r)),
+        "cancelled": sum(1 for r in rows if _cancelled(r)),
+        "retries": _sum("retries"),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": _sum("completion_tokens"),
+        "cache_hit_tokens": hit,
+        "cache_hit_ratio": round(hit / prompt_tokens, 4) if prompt_tokens else None,
+        "cost_est": round(sum(costs), 6) if costs else None,
+        "unpriced_calls": len(rows) - len(costs),
+        "latency_ms": percentiles([float(r["latency_ms"]) for r in rows if r["latency_ms"] is not None]),
+        "ttfb_ms": percentiles([float(r["ttfb_ms"]) for r in rows if r["ttfb_ms"] is not None]),
+    }
+
+
+def summarize_calls(rows: Iterable[Any], group_by: Sequence[str]) -> Dict[str, Any]:
+    """Totals and per-group stats of ai_calls rows; `group_by` items are keys of GROUP_FIELDS."""
+
+    fields = [f for name in group_by for f in GROUP_FIELDS[name]]
+    items = [dict(r) for r in rows]
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for item in items:
+        groups.setdefault(tuple(item[f] for f in fields), []).append(item)
+    ordered = sorted(groups.items(), key=lambda kv: (-len(kv[1]), [str(v) for v in kv[0]]))
+    return {
+        "total": _summarize(items),
+        "groups": [{**dict(zip(fields, key)), **_summarize(members)} for key, members in ordered]
+        if fields
+        else [],
+    }
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import json
 import os
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
 import requests
 
@@ -35,12 +37,25 @@ def chat_completions(
     user_content: str,
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
-    timeout_seconds: int = 180,
+    response_format: Optional[Dict[str, Any]] = None,
+    timeout_seconds: float = 180,
+    session: Optional[requests.Session] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    on_response: Optional[Callable[[requests.Response], None]] = None,
 ) -> Dict[str, Any]:
     """Call DeepSeek (OpenAI-compatible) chat completions API.
 
-    EN: Returns the raw JSON response.
-    中文：返回接口的原始 JSON 响应。
+    EN: Returns the raw JSON response. `response_format={"type": "json_object"}` asks
+        the model for a syntactically valid JSON object.
+    中文：返回接口的原始 JSON 响应。`response_format={"type": "json_object"}` 要求模型输出合法的 JSON 对象。
+
+    EN: `session` is used for the request when given. With `on_response` the body is read
+        as a stream and the `Response` is handed over as soon as the headers arrive, so
+        another thread can close it (see src/ai/providers.py). `meta` (if given) receives
+        http_status, ttfb_ms (time to response headers) and usage, also when the call fails.
+    中文：传入 `session` 时使用该会话发送请求。传入 `on_response` 时以流式读取响应体，收到响应头后
+          立即把 `Response` 交给回调，其它线程可将其关闭（见 src/ai/providers.py）。
+          传入 `meta` 时写入 http_status、ttfb_ms（收到响应头的耗时）与 usage，调用失败时同样写入。
     """
 
     headers = {
@@ -61,12 +76,108 @@ def chat_completions(
         payload["temperature"] = temperature
     if max_tokens is not None:
         payload["max_tokens"] = max_tokens
-
-    resp = requests.post(api_url, headers=headers, json=payload, timeout=timeout_seconds)
+    if response_format is not None:
+        payload["response_format"] = response_format
+
+    resp = (session or requests).post(
+        api_url, headers=headers, json=payload, timeout=timeout_seconds, stream=on_response is not None
+    )
+    if on_response is not None:
+        on_response(resp)
+    if meta is not None:
+        meta["http_status"] = resp.status_code
+        meta["ttfb_ms"] = round(resp.elapsed.total_seconds() * 1000, 1)
     if resp.status_code != 200:
         raise RuntimeError(f"AI HTTP {resp.status_code}: {resp.text[:800]}")
 
-    return resp.json()
+    data = resp.json()
+    if meta is not None and isinstance(data.get("usage"), dict):
+        meta["usage"] = data["usage"]
+    return data
+
+
+def stream_chat_completions(
+    *,
+    api_url: str,
+    api_key: str,
+    model: str,
+    system_prompt: str,
+    user_content: str,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    timeout_seconds: float = 180,
+    session: Optional[requests.Session] = None,
+    meta: Optional[Dict[str, Any]] = None,
+    on_response: Optional[Callable[[requests.Response], None]] = None,
+) -> Iterator[str]:
+    """Call chat completions with `stream: true` and yield content deltas as they arrive.
+
+    EN: Consumes the OpenAI-compatible SSE stream (`data: {...}` lines, ended by
+        `data: [DONE]`). Keep-alive comments and empty deltas are skipped.
+    中文：读取 OpenAI 兼容的 SSE 流（`data: {...}` 行，以 `data: [DONE]` 结束），逐段产出 content；
+          忽略心跳注释与空增量。
+
+    EN: `meta` receives http_status, ttfb_ms (time to the first content delta), the
+        finish_reason and the usage of the final chunk (requested with `stream_options.include_usage`).
+    中文：`meta` 写入 http_status、ttfb_ms（首个内容增量的耗时）、finish_reason 以及最后一个分片中的 usage
+          （通过 `stream_options.include_usage` 请求）。`on_response` 同 `chat_completions`。
+    """
+
+    started = time.perf_counter()
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+    }
+
+    payload: Dict[str, Any] = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ],
+        "stream": True,
+        "stream_options": {"include_usage": True},
+    }
+
+    if temperature is not None:
+        payload["temperature"] = temperature
+    if max_tokens is not None:
+        payload["max_tokens"] = max_tokens
+    if response_format is not None:
+        payload["response_format"] = response_format
+
+    with (session or requests).post(
+        api_url, headers=headers, json=payload, timeout=timeout_seconds, stream=True
+    ) as resp:
+        if on_response is not None:
+            on_response(resp)
+        if meta is not None:
+            meta["http_status"] = resp.status_code
+        if resp.status_code != 200:
+            raise RuntimeError(f"AI HTTP {resp.status_code}: {resp.text[:800]}")
+
+        for line in resp.iter_lines(decode_unicode=False):
+            if not line or not line.startswith(b"data:"):
+                continue
+            data = line[len(b"data:") :].strip()
+            if data == b"[DONE]":
+                return
+            chunk = json.loads(data.decode("utf-8"))
+            if meta is not None and isinstance(chunk.get("usage"), dict):
+                meta["usage"] = chunk["usage"]
+            choices = chunk.get("choices") or []
+            if not choices or not isinstance(choices[0], dict):
+                continue
+            if meta is not None and choices[0].get("finish_reason"):
+                meta["finish_reason"] = choices[0]["finish_reason"]
+            delta = (choices[0].get("delta") or {}).get("content")
+            if isinstance(delta, str) and delta:
+                if meta is not None and "ttfb_ms" not in meta:
+                    meta["ttfb_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                yield delta
 
 
 def extract_message_content(response_json: Dict[str, Any]) -> str:
@@ -83,6 +194,15 @@ def extract_message_content(response_json: Dict[str, Any]) -> str:
     return content
 
 
+def generation_params_from_env() -> Dict[str, Any]:
+    """Sampling parameters shared by every endpoint (AI_TEMPERATURE, AI_MAX_TOKENS)."""
+
+    return {
+        "temperature": _env_float("AI_TEMPERATURE", 0.2),
+        "max_tokens": _env_int("AI_MAX_TOKENS", 1024),
+    }
+
+
 def load_ai_config_from_env() -> Dict[str, Any]:
     api_key = os.getenv("AI_API_KEY", "").strip() or os.getenv("AI-API-KEY", "").strip()
     api_url = os.getenv("AI_API_URL", "").strip()
@@ -99,6 +219,5 @@ def load_ai_config_from_env() -> Dict[str, Any]:
         "api_key": api_key,
         "api_url": api_url,
         "model": model,
-        "temperature": _env_float("AI_TEMPERATURE", 0.2),
-        "max_tokens": _env_int("AI_MAX_TOKENS", 1024),
+        **generation_params_from_env(),
     }
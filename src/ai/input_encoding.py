@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+
+from src.ai.tokens import estimate_json_tokens, estimate_tokens
+
+ENCODINGS = ("verbose", "compact")
+TIMESTAMP_PRECISIONS = {"hour": 13, "day": 10, "month": 7}
+
+# EN: Compact columns: short key -> (source field, kind).
+# 中文：紧凑格式的列：短键 -> (原字段, 类型)。
+_COMPACT_COLUMNS = (
+    ("l", "like_count", "int"),
+    ("r", "reply_count", "int"),
+    ("t", "published_at", "time"),
+    ("x", "text", "text"),
+)
+
+
+def input_encoding_options(prompt_obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Read the optional `input_encoding` of a prompt JSON.
+
+    EN: Either a name (`"compact"`) or an object such as
+        `{"name": "compact", "timestamp": "day", "max_comment_chars": 600}`.
+        Prompts without the key keep the original verbose encoding.
+    中文：可为名称（`"compact"`）或对象；未配置时保持原有的 verbose 编码。
+    """
+
+    raw = prompt_obj.get("input_encoding") or "verbose"
+    if isinstance(raw, str):
+        raw = {"name": raw}
+    if not isinstance(raw, dict):
+        raise ValueError("Prompt JSON input_encoding must be a string or an object")
+
+    name = str(raw.get("name") or "verbose").strip().lower()
+    if name not in ENCODINGS:
+        raise ValueError(f"Unknown input_encoding in prompt JSON: {name}")
+    timestamp = str(raw.get("timestamp") or "day").strip().lower()
+    if timestamp not in TIMESTAMP_PRECISIONS:
+        raise ValueError(f"Unknown input_encoding.timestamp in prompt JSON: {timestamp}")
+    try:
+        max_chars = max(0, int(raw.get("max_comment_chars") or 0))
+    except Exception as e:  # noqa: BLE001
+        raise ValueError(f"Invalid input_encoding.max_comment_chars: {raw.get('max_comment_chars')}") from e
+
+    return {"name": name, "timestamp": timestamp, "max_comment_chars": max_chars}
+
+
+def encoding_system_note(options: Dict[str, Any]) -> str:
+    """Text appended to the system prompt so the model can read the compact layout."""
+
+    if options["name"] != "compact":
+        return ""
+    precision = {"hour": "YYYY-MM-DDTHH", "day": "YYYY-MM-DD", "month": "YYYY-MM"}[options["timestamp"]]
+    note = (
+        "\n\nInput encoding note: the user message uses a compact table instead of the comment "
+        "objects described above: {\"video_id\": string, \"cols\": [...], \"rows\": [[...], ...]}. "
+        "Each row is one comment with values in `cols` order. Column keys: l = like_count, "
+        f"r = reply_count, t = published_at ({precision}), x = text. Columns whose values are all "
+        "empty are omitted; missing counts are 0 and missing times are \"\"."
+    )
+    if options["max_comment_chars"]:
+        note += f" Texts longer than {options['max_comment_chars']} characters are cut and end with \"…\"."
+    return note
+
+
+def _compact_row(comment: Dict[str, Any], columns: Sequence[Tuple[str, str, str]], options: Dict[str, Any]) -> List[Any]:
+    cut = TIMESTAMP_PRECISIONS[options["timestamp"]]
+    max_chars = int(options["max_comment_chars"])
+    row: List[Any] = []
+    for _key, field, kind in columns:
+        value = comment.get(field)
+        if kind == "int":
+            row.append(int(value or 0))
+        elif kind == "time":
+            row.append(str(value or "")[:cut])
+        else:
+            text = str(value or "")
+            if max_chars and len(text) > max_chars:
+                text = text[:max_chars].rstrip() + "…"
+            row.append(text)
+    return row
+
+
+def comment_tokens(comment: Dict[str, Any], options: Dict[str, Any]) -> int:
+    """Estimated tokens one comment adds to the input in the selected encoding.
+
+    EN: For `compact` this is its row with every column (an upper bound: columns that are
+        empty for the whole run are dropped when encoding).
+    中文：`compact` 下按包含全部列的行估算（上界：整个 run 都为空的列在编码时会被省略）。
+    """
+
+    if options["name"] != "compact":
+        return estimate_json_tokens(comment)
+    return estimate_tokens(
+        json.dumps(_compact_row(comment, _COMPACT_COLUMNS, options), ensure_ascii=False, separators=(",", ":"))
+    )
+
+
+def encode_input(video_id: str, comments: List[Dict[str, Any]], options: Dict[str, Any]) -> str:
+    """Serialize portrait input with the selected encoding.
+
+    EN: `verbose` is byte-identical to the historical format (so cache keys stay valid).
+        `compact` drops comment_id/author, keeps only non-empty columns, coarsens
+        timestamps and optionally truncates long texts.
+    中文：`verbose` 与历史格式完全一致（缓存键不变）；`compact` 去掉 comment_id/author，
+          只保留非空列，时间戳降低精度，并可截断超长评论。
+    """
+
+    if options["name"] != "compact":
+        return json.dumps({"video_id": video_id, "comments": comments}, ensure_ascii=False)
+
+    columns = [
+        (key, field, kind)
+        for key, field, kind in _COMPACT_COLUMNS
+        if kind == "text" or any(comment.get(field) for comment in comments)
+    ]
+    rows = [_compact_row(c, columns, options) for c in comments]
+    return json.dumps(
+        {"video_id": video_id, "cols": [key for key, _f, _k in columns], "rows": rows},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def encoding_report(
+    video_id: str, comments: List[Dict[str, Any]], encoded: str, options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Estimated tokens of the encoded input vs. the verbose encoding."""
+
+    tokens = estimate_tokens(encoded)
+    if options["name"] == "verbose":
+        verbose_tokens = tokens
+    else:
+        verbose_tokens = estimate_tokens(encode_input(video_id, comments, {"name": "verbose"}))
+    return {
+        "name": options["name"],
+        "tokens_est": tokens,
+        "verbose_tokens_est": verbose_tokens,
+        "tokens_saved_est": verbose_tokens - tokens,
+    }
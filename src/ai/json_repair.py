@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import json
+import re
+from collections import Counter
+from typing import Any, List, Optional, Tuple
+
+from src.ai.partial_json import complete_json_prefix
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)```", re.S)
+_SMART_OPEN = "“‘"
+_SMART_CLOSE = "”’"
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _balanced_end(text: str, start: int) -> int:
+    """Index just past the container that opens at `start`, or -1 if it never closes."""
+
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return -1
+
+
+def extract_json_text(raw: str) -> str:
+    """Best-effort JSON slice of a model reply.
+
+    EN: Prefers the content of a ```json fence, then the first *balanced* object (or array)
+        found by a string-aware scan, so braces inside strings or trailing prose after the
+        JSON do not break it. An unclosed object (truncated reply) is returned up to the end.
+    中文：优先取 ```json 代码块内容；然后用感知字符串的扫描找到第一个括号配平的对象（或数组），
+          字符串内的括号或 JSON 之后的说明文字都不会干扰；未闭合的对象（回复被截断）返回到末尾。
+    """
+
+    s = (raw or "").strip()
+    fence = _FENCE_RE.search(s)
+    if fence and "{" in fence.group(1):
+        s = fence.group(1).strip()
+    elif s.startswith("```"):
+        s = s.split("\n", 1)[1] if "\n" in s else ""
+
+    obj_start = s.find("{")
+    start = obj_start if obj_start != -1 else s.find("[")
+    if start == -1:
+        return s
+    end = _balanced_end(s, start)
+    return s[start:] if end == -1 else s[start:end]
+
+
+def _normalize_tokens(text: str, fixes: List[str]) -> str:
+    """Smart quotes used as delimiters, trailing commas and Python literals, outside strings only."""
+
+    out: List[str] = []
+    in_string = False
+    escape = False
+    closer = '"'
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == closer or (closer != '"' and ch in _SMART_CLOSE):
+                in_string = False
+                out.append('"')
+                i += 1
+                continue
+            elif ch == '"' and closer != '"':
+                # EN: A plain quote inside a smart-quoted string must be escaped.
+                # 中文：弯引号字符串内部的直引号需要转义。
+                out.append('\\"')
+                i += 1
+                continue
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string, closer = True, '"'
+        elif ch in _SMART_OPEN or ch in _SMART_CLOSE:
+            in_string, closer = True, ch
+            fixes.append("smart_quotes")
+            out.append('"')
+            i += 1
+            continue
+        elif ch == ",":
+            j = i + 1
+            while j < n and text[j] in " \t\r\n":
+                j += 1
+            if j < n and text[j] in "}]":
+                fixes.append("trailing_comma")
+                i += 1
+                continue
+        elif ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            if word in _LITERALS:
+                fixes.append("python_literal")
+                word = _LITERALS[word]
+            out.append(word)
+            i = j
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _complete_keys(text: str) -> Counter:
+    """Object keys in `text` whose value is finished (followed by `,` or the closing `}`)."""
+
+    done: Counter = Counter()
+    # EN: One entry per open container: its kind and the object key whose value is being read.
+    # 中文：每个未闭合的容器一项：容器类型，以及当前正在读取其值的对象键。
+    stack: List[List[Any]] = []
+    in_string = False
+    escape = False
+    start = 0
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                j = i + 1
+                while j < len(text) and text[j] in " \t\r\n":
+                    j += 1
+                if stack and stack[-1][0] == "{" and j < len(text) and text[j] == ":":
+                    try:
+                        stack[-1][1] = json.loads(text[start : i + 1])
+                    except ValueError:
+                        stack[-1][1] = text[start + 1 : i]
+            continue
+        if ch == '"':
+            in_string = True
+            start = i
+        elif ch in "{[":
+            stack.append([ch, None])
+        elif ch in ",}]" and stack:
+            frame = stack.pop() if ch != "," else stack[-1]
+            if frame[0] == "{" and frame[1] is not None:
+                done[frame[1]] += 1
+                frame[1] = None
+    return done
+
+
+def _value_keys(value: Any) -> Counter:
+    keys: Counter = Counter()
+    if isinstance(value, dict):
+        keys.update(value.keys())
+        for item in value.values():
+            keys.update(_value_keys(item))
+    elif isinstance(value, list):
+        for item in value:
+            keys.update(_value_keys(item))
+    return keys
+
+
+def parse_json_tolerant(raw: str) -> Tuple[Any, List[str]]:
+    """Parse a model reply as JSON, repairing common defects.
+
+    Returns (value, list of applied fixes); raises ValueError when nothing works.
+
+    EN: Steps, each tried only if the previous one fails: plain parse of the extracted
+        slice; token-level repair (smart quotes, trailing commas, Python literals);
+        closing a truncated reply (open strings and containers are closed, a dangling
+        key or half-written number is dropped). A completed reply is rejected if it lost
+        any key whose value was already finished in the original text, so the caller runs
+        its fix call instead of accepting silently dropped fields.
+    中文：依次尝试（前一步失败才进行下一步）：直接解析抽取的片段；词法修复（弯引号、尾逗号、
+          Python 字面量）；补全被截断的回复（闭合未结束的字符串与括号，去掉悬空的键或写了一半的数字）。
+          若补全结果丢失了原文中值已写完的键，则视为失败，由调用方发起修复调用，而不是悄悄丢掉字段。
+    """
+
+    text = extract_json_text(raw)
+    try:
+        return json.loads(text), []
+    except ValueError as e:
+        first_error = e
+
+    fixes: List[str] = []
+    repaired = _normalize_tokens(text, fixes)
+    try:
+        return json.loads(repaired), sorted(set(fixes))
+    except ValueError:
+        pass
+
+    candidate, closed = complete_json_prefix(repaired)
+    if not closed:
+        try:
+            value = json.loads(_normalize_tokens(candidate, fixes))
+        except ValueError:
+            pass
+        else:
+            lost = _complete_keys(repaired) - _value_keys(value)
+            if not lost:
+                return value, sorted(set(fixes)) + ["truncated"]
+            raise ValueError(f"{first_error} (truncation repair lost keys: {', '.join(map(str, sorted(lost)))})")
+    raise ValueError(str(first_error))
+
+
+def try_parse_json(raw: str) -> Tuple[Optional[Any], List[str], Optional[str]]:
+    """`parse_json_tolerant` without raising: (value or None, fixes, error or None)."""
+
+    try:
+        value, fixes = parse_json_tolerant(raw)
+    except ValueError as e:
+        return None, [], str(e)
+    return value, fixes, None
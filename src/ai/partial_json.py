@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# EN: A scalar at the very end of a prefix: a number or a (possibly partial) literal.
+# 中文：前缀末尾的标量：数字或（可能写了一半的）true/false/null。
+_TAIL_SCALAR_RE = re.compile(r"(-?[0-9][0-9.eE+\-]*|-|t|tr|tru|true|f|fa|fal|fals|false|n|nu|nul|null)$")
+_PARTIAL_UNICODE_ESCAPE_RE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+
+
+def _is_key(text: str, quote_pos: int) -> bool:
+    """Whether the string starting at `quote_pos` is an object key (preceded by `{` or `,`)."""
+
+    j = quote_pos - 1
+    while j >= 0 and text[j] in " \t\r\n":
+        j -= 1
+    return j >= 0 and text[j] in "{,"
+
+
+def _trim_tail(body: str, *, raw_end: bool) -> str:
+    """Drop trailing fragments that are not a complete value: partial scalars, `,`, `"key":`.
+
+    EN: `raw_end` says `body` still ends where the raw text ends. Only then can a trailing
+        scalar be unfinished; a scalar followed by whitespace or by a separator that is
+        stripped here is complete and is kept.
+    中文：`raw_end` 表示 `body` 的结尾仍是原文的结尾。只有此时末尾的标量才可能未写完；
+          后面跟着空白或分隔符（即使在此被去掉）的标量已完整，予以保留。
+    """
+
+    s = body
+    if raw_end:
+        m = _TAIL_SCALAR_RE.search(s)
+        if m and m.group(1) not in ("true", "false", "null"):
+            # EN: Numbers may still grow ("0.7" -> "0.75"), so an unterminated number is dropped.
+            # 中文：数字可能还没写完（"0.7" -> "0.75"），未结束的数字一律丢弃。
+            s = s[: m.start()]
+    while True:
+        s = s.rstrip()
+        if s.endswith(","):
+            s = s[:-1]
+            continue
+        if s.endswith(":"):
+            s = s[:-1].rstrip()
+            # EN: Remove the dangling key (keys never contain quotes in our schemas).
+            # 中文：去掉悬空的键（本项目的输出结构中键不含引号）。
+            s = s[: s.rfind('"', 0, len(s) - 1)] if s.endswith('"') else s
+            continue
+        return s
+
+
+def complete_json_prefix(text: str) -> Tuple[str, bool]:
+    """Turn a JSON prefix into parseable JSON by closing open strings and containers.
+
+    Returns (candidate JSON, whether the top-level value is already closed).
+    """
+
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    string_start = -1
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+            string_start = i
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[: i + 1], True
+
+    body = text
+    raw_end = True
+    if in_string:
+        raw_end = False
+        if stack and stack[-1] == "{" and _is_key(text, string_start):
+            body = text[:string_start]
+        else:
+            # EN: Keep a half-written string value; drop an unfinished escape, then close it.
+            # 中文：保留写了一半的字符串值：去掉未写完的转义后补上引号。
+            if escape:
+                body = body[:-1]
+            body = _PARTIAL_UNICODE_ESCAPE_RE.sub("", body) + '"'
+    elif (
+        string_start >= 0
+        and body.rstrip().endswith('"')
+        and stack
+        and stack[-1] == "{"
+        and _is_key(text, string_start)
+    ):
+        # EN: A complete key whose `:` has not arrived yet.
+        # 中文：键已写完但冒号尚未到达。
+        body = text[:string_start]
+        raw_end = False
+    body = _trim_tail(body, raw_end=raw_end)
+    closing = "".join("}" if c == "{" else "]" for c in reversed(stack))
+    return body + closing, False
+
+
+def parse_partial_json(text: str) -> Optional[Any]:
+    """Best-effort parse of a JSON object that is still being generated (None if nothing yet)."""
+
+    start = text.find("{")
+    if start == -1:
+        return None
+    candidate, _closed = complete_json_prefix(text[start:])
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        return None
+
+
+class ProgressiveJsonParser:
+    """Feed streamed text; get top-level object fields as soon as each one is complete.
+
+    EN: A top-level field counts as complete once the `,` or `}` that ends it arrives at
+        depth 1, so every value reported by `feed` is final. The scanner state (depth,
+        string, escape, where the current member starts) is kept across calls: each delta
+        is scanned once and only the slice of a finished member is decoded, so a stream
+        costs O(n) in total instead of re-parsing the whole prefix per delta.
+    中文：当结束某个顶层字段的 `,` 或 `}` 在第 1 层出现时，该字段即视为完成，因此 `feed` 返回的值都是
+          最终值。扫描状态（深度、字符串、转义、当前成员的起点）跨调用保留：每个增量只扫描一次，只解码
+          已完成成员的片段，整个流的开销为 O(n)，而不是每个增量都重新解析全部前缀。
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self._emitted: Dict[str, Any] = {}
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = -1
+        self._closed = False
+
+    def feed(self, delta: str) -> List[Tuple[str, Any]]:
+        self.text += delta
+        text = self.text
+        fresh: List[Tuple[str, Any]] = []
+        i = self._pos
+        n = len(text)
+        while i < n and not self._closed:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self._member_start < 0:
+                # EN: Skip anything before the top-level object (prose, a code fence).
+                # 中文：跳过顶层对象之前的内容（说明文字、代码块标记）。
+                if ch == "{":
+                    self._depth = 1
+                    self._member_start = i + 1
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(text[self._member_start : i], fresh)
+                    self._closed = True
+            elif ch == "," and self._depth == 1:
+                self._emit(text[self._member_start : i], fresh)
+                self._member_start = i + 1
+            i += 1
+        self._pos = i
+        return fresh
+
+    def _emit(self, member: str, fresh: List[Tuple[str, Any]]) -> None:
+        """Decode one finished `"key": value` member; malformed members are skipped."""
+
+        if not member.strip():
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except ValueError:
+            return
+        for key, value in parsed.items():
+            if key not in self._emitted:
+                self._emitted[key] = value
+                fresh.append((key, value))
+
+    def snapshot(self) -> Optional[Any]:
+        """Current best-effort value, including the field still being written."""
+
+        return parse_partial_json(self.text)
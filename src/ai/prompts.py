@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import default_ai_prompt_filename, project_root
+
+LEGACY_PROMPT_FILENAME = "AI_PROMPT_Default.json"
+
+
+def prompt_dir() -> Path:
+    return project_root() / "AI_PROMPT"
+
+
+def load_prompt_file(path: Path) -> Dict[str, Any]:
+    """Parse and validate one prompt JSON (an object with a non-empty `system_prompt`)."""
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError("Prompt JSON must be an object")
+    if not isinstance(data.get("system_prompt"), str) or not data["system_prompt"].strip():
+        raise ValueError("Prompt JSON must include a non-empty system_prompt (string)")
+    return data
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class PromptRegistry:
+    """Parsed prompt JSON files, cached in memory and reloaded when a file changes.
+
+    EN: Every `*.json` under the prompt directory is loaded once. Lookups do no file I/O
+        except a re-stat of the directory and known files at most every `check_interval`
+        seconds; files whose (mtime, size) changed are re-parsed, new files are picked up
+        and deleted ones dropped. Prompt files outside the directory (AI_PROMPT pointing
+        elsewhere) are cached the same way once they are first requested.
+    中文：启动后一次性加载提示词目录下所有 `*.json`。查询时不读磁盘，最多每 `check_interval` 秒
+          重新 stat 一次目录与已知文件：(mtime, size) 变化的文件重新解析，新增文件自动加入，已删除的移除。
+          目录外的提示词文件（AI_PROMPT 指向其它位置）首次使用后同样缓存。
+    """
+
+    def __init__(self, directory: Path, *, check_interval: float = 2.0) -> None:
+        self.directory = directory
+        self.check_interval = float(check_interval)
+        self._lock = threading.Lock()
+        # EN: path -> {"stat": (mtime_ns, size), "prompt": dict | None, "error": str | None}
+        # 中文：路径 -> {"stat": (mtime_ns, size), "prompt": 解析结果或 None, "error": 错误或 None}
+        self._entries: Dict[Path, Dict[str, Any]] = {}
+        self._checked_at: Optional[float] = None
+
+    def _load_entry(self, path: Path, stat: Tuple[int, int]) -> None:
+        try:
+            prompt, error = load_prompt_file(path), None
+        except Exception as e:  # noqa: BLE001
+            prompt, error = None, str(e)
+        self._entries[path] = {"stat": stat, "prompt": prompt, "error": error}
+
+    def _refresh_locked(self, *, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        listed = set(self.directory.glob("*.json")) if self.directory.is_dir() else set()
+        for path in listed | set(self._entries):
+            stat = _stat_key(path)
+            if stat is None:
+                self._entries.pop(path, None)
+                continue
+            entry = self._entries.get(path)
+            if entry is None or entry["stat"] != stat:
+                self._load_entry(path, stat)
+
+    def reload(self) -> None:
+        """Re-stat everything now, ignoring `check_interval`."""
+
+        with self._lock:
+            self._refresh_locked(force=True)
+
+    def exists(self, path: Path) -> bool:
+        path = Path(path)
+        with self._lock:
+            self._refresh_locked()
+            if path not in self._entries:
+                stat = _stat_key(path)
+                if stat is None:
+                    return False
+                self._load_entry(path, stat)
+            return True
+
+    def load(self, path: Path) -> Dict[str, Any]:
+        """Parsed prompt of `path` (raises like `load_prompt_file` for a missing/invalid file)."""
+
+        path = Path(path)
+        if not self.exists(path):
+            raise FileNotFoundError(f"Prompt JSON not found: {path}")
+        with self._lock:
+            entry = self._entries[path]
+        if entry["prompt"] is None:
+            raise ValueError(f"{path.name}: {entry['error']}")
+        return entry["prompt"]
+
+    def get(self, name: str, version: Optional[int] = None) -> Tuple[Path, Dict[str, Any]]:
+        """Look a prompt up by its `name` (and optionally `version`), or by file name/stem."""
+
+        with self._lock:
+            self._refresh_locked()
+            entries = sorted(self._entries.items())
+        for path, entry in entries:
+            prompt = entry["prompt"]
+            if prompt is None:
+                continue
+            if str(prompt.get("name") or "") == name and (
+                version is None or int(prompt.get("version") or 1) == int(version)
+            ):
+                return path, prompt
+        for path, entry in entries:
+            if entry["prompt"] is not None and name in (path.name, path.stem):
+                return path, entry["prompt"]
+        raise KeyError(f"Unknown prompt: {name}" + (f" v{version}" if version is not None else ""))
+
+    def list_prompts(self) -> List[Dict[str, Any]]:
+        """Metadata of every known prompt file, including files that failed to parse."""
+
+        with self._lock:
+            self._refresh_locked()
+            entries = sorted(self._entries.items())
+        items: List[Dict[str, Any]] = []
+        for path, entry in entries:
+            prompt = entry["prompt"] or {}
+            items.append(
+                {
+                    "file": path.name if path.parent == self.directory else str(path),
+                    "name": prompt.get("name"),
+                    "version": int(prompt.get("version") or 1) if prompt else None,
+                    "notes": prompt.get("notes"),
+                    "input_encoding": prompt.get("input_encoding"),
+                    "system_prompt_chars": len(prompt.get("system_prompt") or ""),
+                    "modified_ns": entry["stat"][0],
+                    "ok": entry["error"] is None,
+                    "error": entry["error"],
+                }
+            )
+        return items
+
+    def resolve_path(self, settings: Dict[str, Any]) -> Path:
+        """Prompt file in effect.
+
+        Priority:
+        1) .env AI_PROMPT (explicit override; a `.txt` path falls back to the `.json` next to it)
+        2) settings.json (ai.language + ai.prompt_template)
+        3) legacy fallback
+        """
+
+        env_value = (os.getenv("AI_PROMPT") or "").strip().strip('"')
+        if env_value:
+            p = Path(env_value)
+            if not p.is_absolute():
+                p = project_root() / p
+            if self.exists(p):
+                return p
+            if p.suffix.lower() == ".txt":
+                candidate = p.with_suffix(".json")
+                if self.exists(candidate):
+                    return candidate
+
+        p = self.directory / default_ai_prompt_filename(settings)
+        if self.exists(p):
+            return p
+        return self.directory / LEGACY_PROMPT_FILENAME
+
+    def resolve(self, settings: Dict[str, Any]) -> Tuple[Path, Dict[str, Any]]:
+        path = self.resolve_path(settings)
+        return path, self.load(path)
+
+    def resolve_template(self, settings: Dict[str, Any], template: str) -> Tuple[Path, Dict[str, Any]]:
+        """Prompt of `template` (default | optimized) in the configured language.
+
+        EN: Used by routing rules, so it takes precedence over AI_PROMPT; falls back to
+            `resolve(settings)` when that template has no file for the language.
+        中文：供路由规则使用，因此优先于 AI_PROMPT；该模板没有对应语言的文件时退回 `resolve(settings)`。
+        """
+
+        ai = {**(settings.get("ai") or {}), "prompt_template": template}
+        p = self.directory / default_ai_prompt_filename({**settings, "ai": ai})
+        if self.exists(p):
+            return p, self.load(p)
+        return self.resolve(settings)
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Process-wide registry over AI_PROMPT/."""
+
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry(prompt_dir())
+        return _registry
@@ -0,0 +1,543 @@
+from __future__ import annotations
+
+import itertools
+import json
+import math
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from src.ai.deepseek_client import (
+    chat_completions,
+    generation_params_from_env,
+    load_ai_config_from_env,
+    stream_chat_completions,
+)
+from src.ai.rate_limit import RateLimiter
+from src.config import ai_failover, ai_providers
+
+class _Lost(Exception):
+    """Raised inside an attempt that lost the race (its result is discarded)."""
+
+
+def _shutdown(sock: socket.socket) -> None:
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class _Abort:
+    """Drops one attempt's HTTP connection from another thread, and records when it was sent.
+
+    EN: Closing a requests.Session does not stop a request in flight (the connection is
+        checked out of the pool). Every socket the attempt's session opens is registered
+        here when it connects (http.client may drop `conn.sock` once the headers are read),
+        as is the `Response` once headers arrive; `abort()` shuts the sockets down,
+        which wakes the blocked read (before or after the headers) so the request really
+        ends and its executor thread is freed.
+    中文：关闭 requests.Session 并不能中止进行中的请求（连接已从连接池取出）。本次请求打开的每个 socket
+          在建立连接时登记（读完响应头后 http.client 可能会清空 `conn.sock`），收到响应头后的 `Response`
+          也登记在此；`abort()` 直接关闭 socket，唤醒阻塞中的读取（响应头前后均可），请求真正结束并释放线程池中的线程。
+
+    `sent_at` is set (and `wake` signalled) once the attempt has its rate-limit slot and goes out.
+    """
+
+    def __init__(self, wake: Optional[threading.Event] = None) -> None:
+        self._wake = wake
+        self.sent_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._socks: List[socket.socket] = []
+        self._responses: List[requests.Response] = []
+        self.aborted = False
+        self.session = requests.Session()
+        adapter = _AbortableAdapter(self)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def mark_sent(self) -> None:
+        self.sent_at = time.monotonic()
+        if self._wake is not None:
+            self._wake.set()
+
+    def elapsed(self) -> Optional[float]:
+        """Seconds since the attempt was sent (None if it never was)."""
+
+        return None if self.sent_at is None else time.monotonic() - self.sent_at
+
+    def track_socket(self, sock: socket.socket) -> None:
+        with self._lock:
+            self._socks.append(sock)
+            aborted = self.aborted
+        if aborted:
+            _shutdown(sock)
+
+    def track_response(self, resp: requests.Response) -> None:
+        with self._lock:
+            self._responses.append(resp)
+            aborted = self.aborted
+        if aborted:
+            resp.close()
+
+    def abort(self) -> None:
+        with self._lock:
+            self.aborted = True
+            socks, responses = list(self._socks), list(self._responses)
+        for sock in socks:
+            _shutdown(sock)
+        for resp in responses:
+            try:
+                resp.close()
+            except Exception:  # noqa: BLE001
+                pass
+        self.session.close()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class _AbortableAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections register themselves with an `_Abort` once connected."""
+
+    def __init__(self, abort: _Abort) -> None:
+        self._abort = abort
+        super().__init__()
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        abort = self._abort
+
+        class _Conn(HTTPConnection):
+            def connect(self) -> None:
+                super().connect()
+                abort.track_socket(self.sock)
+
+        class _TlsConn(HTTPSConnection):
+            def connect(self) -> None:
+                super().connect()
+                abort.track_socket(self.sock)
+
+        class _Pool(HTTPConnectionPool):
+            ConnectionCls = _Conn
+
+        class _TlsPool(HTTPSConnectionPool):
+            ConnectionCls = _TlsConn
+
+        self.poolmanager.pool_classes_by_scheme = {"http": _Pool, "https": _TlsPool}
+
+
+class ProviderHealth:
+    """Rolling latency window and failure state of one provider."""
+
+    def __init__(self, *, window: int = 200) -> None:
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.hedges_won = 0
+        self.cancelled = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.down_until = 0.0
+
+    def record_success(self, seconds: float, *, hedged: bool = False) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            self.successes += 1
+            self.hedges_won += 1 if hedged else 0
+            self.consecutive_failures = 0
+            self.down_until = 0.0
+
+    def record_cancelled(self, seconds: Optional[float]) -> None:
+        # EN: A lost attempt had run at least `seconds`; keep it as a (lower-bound) latency sample
+        #     so a slow provider's percentile does not drift down just because it keeps losing.
+        #     An attempt cancelled before it was sent (None) is not a sample.
+        # 中文：被取消的请求至少已耗时 `seconds`，作为延迟样本（下界）记录，避免慢服务商因总是落败而分位数偏低；
+        #       发送前就被取消（None）的请求不计入样本。
+        with self._lock:
+            if seconds is not None:
+                self._latencies.append(seconds)
+            self.cancelled += 1
+
+    def record_failure(self, error: str, *, threshold: int, cooldown: float) -> None:
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = error[:300]
+            if self.consecutive_failures >= threshold:
+                self.down_until = time.monotonic() + cooldown
+
+    def available(self) -> bool:
+        with self._lock:
+            return time.monotonic() >= self.down_until
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, max(0, math.ceil(q / 100 * len(samples)) - 1))]
+
+    def samples(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        with self._lock:
+            return {
+                "available": time.monotonic() >= self.down_until,
+                "successes": self.successes,
+                "failures": self.failures,
+                "consecutive_failures": self.consecutive_failures,
+                "hedges_won": self.hedges_won,
+                "cancelled": self.cancelled,
+                "latency_samples": len(self._latencies),
+                "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                "last_error": self.last_error,
+                "down_for_s": round(max(0.0, self.down_until - time.monotonic()), 1),
+            }
+
+
+class _Race:
+    """First attempt to claim wins; only the winner may emit stream deltas."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.winner: Optional[int] = None
+        self.cancelled: set = set()
+
+    def claim(self, attempt: int) -> bool:
+        with self._lock:
+            if attempt in self.cancelled:
+                return False
+            if self.winner is None:
+                self.winner = attempt
+            return self.winner == attempt
+
+    def cancel(self, attempt: int) -> None:
+        with self._lock:
+            self.cancelled.add(attempt)
+
+
+class ProviderPool:
+    """Failover and hedged requests over `ai.providers`, with per-provider health.
+
+    EN: Providers are tried in priority order, skipping ones in cooldown (they are still
+        used as a last resort). When the running request has been out (rate-limit slot
+        acquired and sent) longer than the provider's hedge delay, a duplicate goes to
+        the next provider; the first answer wins and the other
+        request is aborted by shutting down its socket (see `_Abort`). A failed request fails over to the
+        next provider. Streams are hedged on time-to-first-delta; once a stream has emitted
+        deltas it is not retried elsewhere (the consumer has already seen them).
+    中文：按优先级依次尝试服务商，跳过冷却中的服务商（仍作为最后手段）。当前请求发出后（已取得限流名额）超过该服务商的对冲延迟时，
+          向下一个服务商发出重复请求，先返回者胜出，另一个通过关闭其 socket 中止（见 `_Abort`）；请求失败则切换到下一个服务商。
+          流式请求按首个增量到达时间对冲；一旦已输出增量，失败时不再换服务商重试（调用方已收到部分内容）。
+    """
+
+    def __init__(self, providers: List[Dict[str, Any]], failover: Dict[str, Any]) -> None:
+        if not providers:
+            raise ValueError("ProviderPool needs at least one provider")
+        self.providers = providers
+        self.failover = failover
+        self.health: Dict[str, ProviderHealth] = {p["name"]: ProviderHealth() for p in providers}
+
+    def preferring(self, name_or_model: str) -> "ProviderPool":
+        """View of this pool that tries the provider with that name (or model) first.
+
+        Health records are shared with the original pool. Raises KeyError when no provider matches.
+        """
+
+        first = [p for p in self.providers if name_or_model in (p["name"], p["model"])][:1]
+        if not first:
+            raise KeyError(f"Unknown AI provider: {name_or_model}")
+        view = ProviderPool(first + [p for p in self.providers if p is not first[0]], self.failover)
+        view.health = self.health
+        return view
+
+    def ordered(self) -> List[Dict[str, Any]]:
+        up = [p for p in self.providers if self.health[p["name"]].available()]
+        return up + [p for p in self.providers if p not in up]
+
+    def hedge_delay(self, provider: Dict[str, Any]) -> float:
+        """Seconds to wait on `provider` before sending a hedged duplicate."""
+
+        cfg = self.failover
+        health = self.health[provider["name"]]
+        delay = cfg["hedge_default_ms"] / 1000
+        if health.samples() >= cfg["hedge_min_samples"]:
+            delay = health.percentile(cfg["hedge_percentile"]) or delay
+        return max(cfg["hedge_min_ms"] / 1000, delay)
+
+    def _attempt(
+        self,
+        attempt: int,
+        provider: Dict[str, Any],
+        abort: _Abort,
+        request: Dict[str, Any],
+        race: _Race,
+        on_delta: Optional[Callable[[str], None]],
+        rate_limiter: Optional[RateLimiter],
+    ) -> Dict[str, Any]:
+        if rate_limiter is not None:
+            waited = rate_limiter.acquire()
+            if request.get("meta") is not None:
+                request["meta"]["queue_ms"] = round(waited * 1000, 1)
+        if abort.aborted:
+            # EN: Cancelled while waiting for the rate limiter: never send it.
+            # 中文：等待限流期间已被取消：不再发送。
+            raise _Lost()
+        if request.get("meta") is not None:
+            request["meta"]["sent"] = True
+        abort.mark_sent()
+        kwargs = {
+            **request,
+            "api_url": provider["api_url"],
+            "api_key": provider["api_key"],
+            "model": provider["model"],
+            "timeout_seconds": provider["timeout_seconds"],
+            "session": abort.session,
+            "on_response": abort.track_response,
+        }
+        if on_delta is None:
+            resp = chat_completions(**kwargs)
+            if not race.claim(attempt):
+                raise _Lost()
+            return resp
+        parts: List[str] = []
+        for delta in stream_chat_completions(**kwargs):
+            if not race.claim(attempt):
+                raise _Lost()
+            parts.append(delta)
+            on_delta(delta)
+        if not race.claim(attempt):
+            raise _Lost()
+        resp: Dict[str, Any] = {
+            "model": provider["model"],
+            "choices": [
+                {
+                    "message": {"role": "assistant", "content": "".join(parts)},
+                    "finish_reason": (request.get("meta") or {}).get("finish_reason"),
+                }
+            ],
+        }
+        if (request.get("meta") or {}).get("usage"):
+            resp["usage"] = request["meta"]["usage"]
+        return resp
+
+    def complete(
+        self,
+        request: Dict[str, Any],
+        *,
+        on_delta: Optional[Callable[[str], None]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Run one chat completion (`request` = chat_completions kwargs without endpoint fields).
+
+        `meta` receives the winning (or last failed) attempt's call metadata plus `provider`,
+        `model`, `latency_ms` (from when that attempt was sent, so rate-limit waits are not
+        counted) and `retries` (attempts beyond the first: hedges and failovers). Every other
+        attempt (failed, or cancelled after losing a hedge race) is listed in
+        `meta["attempts"]` so it can be logged and costed too.
+        """
+
+        cfg = self.failover
+        candidates = iter(self.ordered())
+        race = _Race()
+        attempt_ids = itertools.count()
+        pending: Dict[Future, Tuple[int, Dict[str, Any], _Abort, bool]] = {}
+        errors: List[str] = []
+        metas: Dict[int, Dict[str, Any]] = {}
+        others: Dict[int, Dict[str, Any]] = {}
+        hedged = False
+        # EN: Set when an attempt is sent or finishes. Each call gets its own threads (at most
+        #     one per provider), so an attempt never queues behind other calls' attempts.
+        # 中文：请求发出或结束时置位。每次调用使用自己的线程（每个服务商至多一个），请求不会排在其它调用之后。
+        wake = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(self.providers), thread_name_prefix="ai-provider")
+
+        def _latency_ms(abort: _Abort) -> float:
+            return round((abort.elapsed() or 0.0) * 1000, 1)
+
+        def _log(attempt: int, provider: Dict[str, Any], abort: _Abort, error: str, *, cancelled: bool) -> None:
+            others[attempt] = {
+                "meta": dict(metas[attempt]),
+                "provider": provider["name"],
+                "model": provider["model"],
+                "latency_ms": _latency_ms(abort),
+                "error": error,
+                "cancelled": cancelled,
+            }
+
+        def _report(attempt: int, provider: Dict[str, Any], abort: _Abort) -> None:
+            if meta is not None:
+                meta.update(
+                    metas[attempt],
+                    provider=provider["name"],
+                    model=provider["model"],
+                    retries=len(metas) - 1,
+                    latency_ms=_latency_ms(abort),
+                    attempts=[entry for a, entry in sorted(others.items()) if a != attempt],
+                )
+
+        def _cancel_all() -> None:
+            for attempt, provider, abort, _hedge in pending.values():
+                race.cancel(attempt)
+                abort.abort()
+                self.health[provider["name"]].record_cancelled(abort.elapsed())
+                _log(attempt, provider, abort, "cancelled: lost hedge race", cancelled=True)
+            pending.clear()
+
+        def _launch(*, hedge: bool) -> bool:
+            provider = next(candidates, None)
+            if provider is None:
+                return False
+            abort = _Abort(wake)
+            attempt = next(attempt_ids)
+            metas[attempt] = {}
+            future = executor.submit(
+                self._attempt,
+                attempt,
+                provider,
+                abort,
+                {**request, "meta": metas[attempt]},
+                race,
+                on_delta,
+                rate_limiter,
+            )
+            future.add_done_callback(lambda _f: wake.set())
+            pending[future] = (attempt, provider, abort, hedge)
+            return True
+
+        try:
+            _launch(hedge=False)
+            while pending:
+                wake.clear()
+                done = [f for f in pending if f.done()]
+                if not done:
+                    timeout: Optional[float] = None
+                    if cfg["hedge"] and not hedged and len(pending) == 1 and race.winner is None:
+                        (_a, provider, abort, _h), = pending.values()
+                        # EN: The hedge clock starts when the request is sent, not while it waits
+                        #     for a rate-limit slot.
+                        # 中文：对冲计时从请求发出时开始，等待限流名额的时间不计入。
+                        if abort.sent_at is not None:
+                            timeout = max(0.0, abort.sent_at + self.hedge_delay(provider) - time.monotonic())
+                    if not wake.wait(timeout):
+                        hedged = True
+                        _launch(hedge=True)
+                    continue
+
+                for future in done:
+                    attempt, provider, abort, hedge = pending.pop(future)
+                    health = self.health[provider["name"]]
+                    abort.close()
+                    try:
+                        resp = future.result()
+                    except _Lost:
+                        _log(attempt, provider, abort, "cancelled: lost hedge race", cancelled=True)
+                        continue
+                    except Exception as e:  # noqa: BLE001
+                        health.record_failure(
+                            str(e), threshold=cfg["failure_threshold"], cooldown=cfg["cooldown_seconds"]
+                        )
+                        errors.append(f"{provider['name']}: {e}")
+                        _log(attempt, provider, abort, str(e), cancelled=False)
+                        if race.winner == attempt:
+                            # EN: A stream that already emitted deltas cannot be replayed elsewhere.
+                            # 中文：已输出增量的流无法在其它服务商上重放。
+                            _cancel_all()
+                            _report(attempt, provider, abort)
+                            raise RuntimeError(f"AI provider {provider['name']} failed mid-stream: {e}") from e
+                        _report(attempt, provider, abort)
+                        if not pending:
+                            _launch(hedge=False)
+                        continue
+
+                    health.record_success(abort.elapsed() or 0.0, hedged=hedge)
+                    _cancel_all()
+                    _report(attempt, provider, abort)
+                    return resp
+        finally:
+            # EN: Aborted attempts end on their own; do not wait for them here.
+            # 中文：已中止的请求会自行结束，这里不等待。
+            executor.shutdown(wait=False)
+
+        raise RuntimeError("All AI providers failed: " + "; ".join(errors)[:800])
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": p["name"],
+                "model": p["model"],
+                "api_url": p["api_url"],
+                "priority": p["priority"],
+                "timeout_seconds": p["timeout_seconds"],
+                "hedge_delay_ms": round(self.hedge_delay(p) * 1000),
+                **self.health[p["name"]].snapshot(),
+            }
+            for p in self.providers
+        ]
+
+
+_pools: Dict[str, ProviderPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_provider_pool(settings: Dict[str, Any]) -> Optional[ProviderPool]:
+    """Process-wide pool for the configured providers (None when `ai.providers` is empty).
+
+    EN: Pools are keyed by their configuration, so health history survives across requests
+        and a settings change starts a fresh pool. API keys are read from the env here.
+    中文：按配置缓存连接池，健康记录在请求间保留，修改配置后自动新建；API 密钥在此从环境变量读取。
+    """
+
+    providers = ai_providers(settings)
+    if not providers:
+        return None
+    failover = ai_failover(settings)
+    key = json.dumps([providers, failover], sort_keys=True)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            resolved = []
+            for p in providers:
+                api_key = os.getenv(p["api_key_env"], "").strip()
+                if not api_key:
+                    raise ValueError(f"Missing {p['api_key_env']} in .env (ai.providers: {p['name']})")
+                resolved.append({**p, "api_key": api_key})
+            pool = _pools[key] = ProviderPool(resolved, failover)
+        return pool
+
+
+def load_ai_config(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """AI config for the portrait pipeline: the provider pool when configured, else .env.
+
+    EN: With `ai.providers`, api_url/model are those of the first provider (they name the
+        request in the response cache key) and `pool` carries the failover logic.
+    中文：配置了 `ai.providers` 时，api_url/model 取第一个服务商（作为响应缓存键中的请求标识），
+          `pool` 负责故障切换与对冲。
+    """
+
+    pool = get_provider_pool(settings)
+    if pool is None:
+        return load_ai_config_from_env()
+    primary = pool.providers[0]
+    return {
+        "api_key": primary["api_key"],
+        "api_url": primary["api_url"],
+        "model": primary["model"],
+        **generation_params_from_env(),
+        "pool": pool,
+    }
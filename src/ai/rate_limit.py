@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RateLimiter:
+    """Thread-safe request pacer: at most `per_minute` acquisitions per minute, evenly spaced."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.interval = 60.0 / float(per_minute)
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until the next slot; returns the seconds waited."""
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_limiters: Dict[float, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(per_minute: float) -> Optional[RateLimiter]:
+    """Process-wide limiter for a given rate (None when `per_minute` <= 0, i.e. unlimited).
+
+    EN: Shared by every portrait request in the process, so concurrent batches and API
+        calls together stay under the provider's limit.
+    中文：进程内共享，批量任务与普通接口的请求合计不超过服务商限速。
+    """
+
+    if per_minute <= 0:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(float(per_minute))
+        if limiter is None:
+            limiter = _limiters[float(per_minute)] = RateLimiter(per_minute)
+        return limiter
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+from src.ai.accounting import record_call
+from src.ai.deepseek_client import chat_completions, extract_message_content, stream_chat_completions
+from src.ai.json_repair import try_parse_json
+from src.ai.rate_limit import RateLimiter
+from src.ai.tokens import estimate_tokens
+from src.database.sqlite import get_cached_response, put_cached_response, touch_cached_response
+from src.database.writer import get_writer, read_connection, run_write
+
+if TYPE_CHECKING:
+    from src.ai.providers import ProviderPool
+
+
+def cache_key(
+    *,
+    model: str,
+    temperature: Optional[float],
+    system_prompt: str,
+    user_content: str,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    """SHA-256 over the request fields that determine the answer.
+
+    EN: max_tokens is included as well: a reply truncated under a small limit must not be
+        served for a request with a larger one. `response_format` only enters the key
+        when set, so existing entries keep their keys.
+    中文：max_tokens 也计入键：小上限下被截断的回复不能复用给更大上限的请求。
+          `response_format` 仅在设置时计入，已有缓存条目的键不变。
+    """
+
+    fields: list = [model, temperature, max_tokens, system_prompt, user_content]
+    if response_format is not None:
+        fields.append(response_format)
+    material = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _iso_hours_ago(hours: float) -> Optional[str]:
+    if hours <= 0:
+        return None
+    return (datetime.now(timezone.utc) - timedelta(hours=hours)).replace(microsecond=0).isoformat()
+
+
+def _fetch(
+    *,
+    on_delta: Optional[Callable[[str], None]],
+    rate_limiter: Optional[RateLimiter] = None,
+    pool: Optional["ProviderPool"] = None,
+    meta: Dict[str, Any],
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """Plain or streamed call; a streamed reply is reassembled into the non-streaming shape.
+
+    A reassembled reply carries the stream's `finish_reason` and `usage` (if the provider sent one).
+    """
+
+    if pool is not None:
+        request = {k: v for k, v in kwargs.items() if k not in ("api_url", "api_key", "model")}
+        return pool.complete(request, on_delta=on_delta, rate_limiter=rate_limiter, meta=meta)
+    if rate_limiter is not None:
+        meta["queue_ms"] = round(rate_limiter.acquire() * 1000, 1)
+    if on_delta is None:
+        return chat_completions(meta=meta, **kwargs)
+    parts = []
+    for delta in stream_chat_completions(meta=meta, **kwargs):
+        parts.append(delta)
+        on_delta(delta)
+    resp: Dict[str, Any] = {
+        "choices": [
+            {
+                "message": {"role": "assistant", "content": "".join(parts)},
+                "finish_reason": meta.get("finish_reason"),
+            }
+        ]
+    }
+    if meta.get("usage"):
+        resp["usage"] = meta["usage"]
+    return resp
+
+
+def _fetch_accounted(account: Optional[Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+    """`_fetch`, logging the request to ai_calls when `account` is given (also on failure)."""
+
+    meta: Dict[str, Any] = {}
+    started = time.perf_counter()
+
+    def _record(error: Optional[str] = None) -> None:
+        if account is None:
+            return
+        record_call(
+            account,
+            model=kwargs["model"],
+            meta=meta,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            error=error,
+            prompt_tokens_est=estimate_tokens(kwargs["system_prompt"] + kwargs["user_content"]),
+        )
+
+    try:
+        resp = _fetch(meta=meta, **kwargs)
+    except Exception as e:
+        _record(str(e))
+        raise
+    _record()
+    return resp
+
+
+def _cacheable(resp: Dict[str, Any], *, expect_json: bool) -> bool:
+    """Whether a fresh reply may be stored: not cut off by max_tokens, and JSON when JSON is expected.
+
+    EN: Replaying a truncated or unparseable reply would return the same failure until the
+        entry expires, so such replies are served once and never cached.
+    中文：缓存被截断或无法解析的回复会在过期前反复返回同样的失败结果，因此这类回复只返回一次，不写入缓存。
+    """
+
+    choices = resp.get("choices") or []
+    if choices and isinstance(choices[0], dict) and choices[0].get("finish_reason") == "length":
+        return False
+    if not expect_json:
+        return True
+    try:
+        content = extract_message_content(resp)
+    except RuntimeError:
+        return False
+    _value, fixes, error = try_parse_json(content)
+    return error is None and "truncated" not in fixes
+
+
+def cached_chat_completions(
+    *,
+    db_file: Optional[Path],
+    cache: Dict[str, Any],
+    api_url: str,
+    api_key: str,
+    model: str,
+    system_prompt: str,
+    user_content: str,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    pool: Optional["ProviderPool"] = None,
+    account: Optional[Dict[str, Any]] = None,
+    expect_json: bool = False,
+    refresh: bool = False,
+) -> Tuple[Dict[str, Any], bool]:
+    """`chat_completions` behind the SQLite response cache.
+
+    EN: `cache` is `ai_cache(settings)`; the cache is bypassed when it is disabled or
+        `db_file` is None. Returns (response JSON, cache hit). Hit counters
+        are updated asynchronously on the writer thread so a hit never waits for a commit.
+        With `on_delta` the request is streamed and each content delta is passed to it
+        (a cache hit delivers the whole content as one delta). `rate_limiter` only paces
+        requests that actually reach the provider.
+    中文：`cache` 为 `ai_cache(settings)`；缓存关闭或 `db_file` 为 None 时直接请求。返回 (响应 JSON, 是否命中)。命中计数由写线程异步更新，
+          命中时无需等待提交。传入 `on_delta` 时以流式请求，每段增量内容回调一次（命中缓存时整段回调一次）。
+          `rate_limiter` 只对实际发出的请求计数，命中缓存不占配额。
+
+    EN: With `pool` (see src/ai/providers.py) a cache miss goes through provider failover
+        and hedging; the key still uses `model`, the primary provider's model.
+    中文：传入 `pool`（见 src/ai/providers.py）时，未命中缓存的请求走服务商故障切换与对冲；
+          缓存键仍使用 `model`（首选服务商的模型）。
+
+    EN: With `account` (see src/ai/accounting.py) every request that reaches a provider is
+        logged to ai_calls with tokens, latency and estimated cost; cache hits are not logged.
+    中文：传入 `account`（见 src/ai/accounting.py）时，每个实际发给服务商的请求都会记录到 ai_calls
+          （token、延迟与估算费用）；命中缓存的不记录。
+
+    EN: A reply is stored only if it was not cut off (`finish_reason: length`) and, with
+        `expect_json` or a `json_object` response_format, parses as JSON. `refresh` skips
+        the lookup and overwrites the entry with the fresh reply.
+    中文：只有未被截断（`finish_reason: length`）且在 `expect_json` 或 `json_object` 格式下能解析为 JSON
+          的回复才会写入缓存。`refresh` 跳过查找，并用新回复覆盖缓存条目。
+    """
+
+    request_kwargs: Dict[str, Any] = {
+        "api_url": api_url,
+        "api_key": api_key,
+        "model": model,
+        "system_prompt": system_prompt,
+        "user_content": user_content,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "response_format": response_format,
+    }
+    if db_file is None or not cache.get("enabled"):
+        resp = _fetch_accounted(
+            account, on_delta=on_delta, rate_limiter=rate_limiter, pool=pool, **request_kwargs
+        )
+        return resp, False
+
+    key = cache_key(
+        model=model,
+        temperature=temperature,
+        system_prompt=system_prompt,
+        user_content=user_content,
+        max_tokens=max_tokens,
+        response_format=response_format,
+    )
+    not_before = _iso_hours_ago(float(cache["ttl_hours"]))
+
+    cached = None
+    if not refresh:
+        conn = read_connection(db_file)
+        try:
+            cached = get_cached_response(conn, key, not_before=not_before)
+        finally:
+            conn.close()
+    if cached is not None:
+        get_writer(db_file).submit(lambda wconn: touch_cached_response(wconn, key))
+        if on_delta is not None:
+            on_delta(extract_message_content(cached))
+        return cached, True
+
+    resp = _fetch_accounted(account, on_delta=on_delta, rate_limiter=rate_limiter, pool=pool, **request_kwargs)
+    json_format = isinstance(response_format, dict) and response_format.get("type") == "json_object"
+    if not _cacheable(resp, expect_json=expect_json or json_format):
+        return resp, False
+    run_write(
+        db_file,
+        lambda wconn: put_cached_response(
+            wconn,
+            key,
+            model=model,
+            response=resp,
+            expire_before=not_before,
+            max_bytes=int(cache["max_bytes"]) or None,
+        ),
+    )
+    return resp, False
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+_BOUNDS = (
+    ("min_comments", "comments", 1),
+    ("max_comments", "comments", -1),
+    ("min_input_tokens", "input_tokens", 1),
+    ("max_input_tokens", "input_tokens", -1),
+)
+
+
+def select_route(routing: Dict[str, Any], *, comments: int, input_tokens: int) -> Optional[Dict[str, Any]]:
+    """First rule of `ai_routing(settings)` matching the run size, or None (routing off / no match).
+
+    The returned dict is the rule plus the measured `comments` and `input_tokens`.
+    """
+
+    if not routing["enabled"]:
+        return None
+    measured = {"comments": int(comments), "input_tokens": int(input_tokens)}
+    for rule in routing["rules"]:
+        if all(
+            key not in rule or (measured[field] - rule[key]) * sign >= 0
+            for key, field, sign in _BOUNDS
+        ):
+            return {**rule, **measured}
+    return None
+
+
+def apply_route(ai_cfg: Dict[str, Any], route: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """AI config with the route's model/provider and max_tokens applied.
+
+    EN: With a provider pool, `provider` (or `model`) picks the provider tried first, so
+        failover and hedging still apply; with the single .env endpoint `model` replaces
+        AI_MODEL_NAME.
+    中文：配置了服务商池时，`provider`（或 `model`）决定优先尝试的服务商，故障切换与对冲照常生效；
+          使用 .env 单一端点时，`model` 直接替换 AI_MODEL_NAME。
+    """
+
+    if route is None:
+        return ai_cfg
+    cfg = dict(ai_cfg)
+    pool = cfg.get("pool")
+    target = route.get("provider") or route.get("model")
+    if pool is not None and target:
+        cfg["pool"] = pool.preferring(target)
+        first = cfg["pool"].providers[0]
+        cfg.update(api_url=first["api_url"], api_key=first["api_key"], model=first["model"])
+    elif route.get("model"):
+        cfg["model"] = route["model"]
+    if route.get("max_tokens"):
+        cfg["max_tokens"] = int(route["max_tokens"])
+    return cfg
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterable, List
+
+# EN: Rough ratios published for DeepSeek's tokenizer: ~0.6 token per CJK character,
+#     ~0.3 token per other character. Good enough for budgeting; never used for billing.
+# 中文：参考 DeepSeek 官方给出的粗略换算：1 个中日韩字符约 0.6 token，其它字符约 0.3 token。
+#       仅用于预算估算，不用于计费。
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+
+
+def _is_cjk(ch: str) -> bool:
+    code = ord(ch)
+    return (
+        0x3040 <= code <= 0x30FF  # Hiragana / Katakana
+        or 0x3400 <= code <= 0x4DBF  # CJK Ext A
+        or 0x4E00 <= code <= 0x9FFF  # CJK Unified
+        or 0xAC00 <= code <= 0xD7AF  # Hangul syllables
+        or 0xF900 <= code <= 0xFAFF  # CJK compatibility
+        or 0xFF00 <= code <= 0xFFEF  # full-width forms
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text` (no tokenizer dependency)."""
+
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    other = len(text) - cjk
+    return int(cjk * CJK_TOKENS_PER_CHAR + other * OTHER_TOKENS_PER_CHAR) + 1
+
+
+def estimate_json_tokens(obj: Any) -> int:
+    return estimate_tokens(json.dumps(obj, ensure_ascii=False))
+
+
+def split_by_token_budget(
+    items: Iterable[Dict[str, Any]], budget: int
+) -> List[List[Dict[str, Any]]]:
+    """Greedily pack items (in order) into chunks whose estimated JSON size stays under `budget`.
+
+    EN: An item larger than the budget on its own still gets a chunk of its own.
+    中文：按顺序贪心装箱；单条超过预算的条目单独成块。
+    """
+
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = 0
+    for item in items:
+        cost = estimate_json_tokens(item)
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import json
+import threading
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
 
 
 def project_root() -> Path:
@@ -13,6 +16,25 @@ def settings_path() -> Path:
     return project_root() / "settings.json"
 
 
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def ensure_env_loaded() -> None:
+    """Load `.env` once per process.
+
+    EN: Entry points call `load_dotenv()` themselves; library code on the portrait hot
+        path uses this instead so it does not re-read `.env` on every call.
+    中文：入口脚本自行调用 `load_dotenv()`；画像热路径上的库代码改用本函数，避免每次调用都重新读取 `.env`。
+    """
+
+    global _env_loaded
+    with _env_lock:
+        if not _env_loaded:
+            load_dotenv()
+            _env_loaded = True
+
+
 def load_settings() -> Dict[str, Any]:
     path = settings_path()
     if not path.exists():
@@ -100,3 +122,498 @@ def default_ai_prompt_filename(settings: Dict[str, Any]) -> str:
     if template == "optimized":
         return f"AI_PROMPT_Optimized.{lang}.json"
     return f"AI_PROMPT_Default.{lang}.json"
+
+
+def db_retention(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Run archival / vacuum policy.
+
+    EN: Runs older than `archive_after_days` have their raw JSON moved into
+        compressed per-run files under `archive_dir`; 0 disables archival.
+    中文：超过 `archive_after_days` 天的 run 会把原始 JSON 移到 `archive_dir` 下的压缩文件；0 表示关闭归档。
+    """
+
+    raw = settings.get("database", {}).get("retention", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid database.retention in settings.json: must be an object")
+
+    def _int(key: str, default: int) -> int:
+        value = raw.get(key, default)
+        try:
+            return max(0, int(value))
+        except Exception as e:  # noqa: BLE001
+            raise ValueError(f"Invalid database.retention.{key} in settings.json: {value}") from e
+
+    archive_dir = Path(str(raw.get("archive_dir") or "data/archive"))
+    if not archive_dir.is_absolute():
+        archive_dir = project_root() / archive_dir
+
+    return {
+        "archive_after_days": _int("archive_after_days", 0),
+        "archive_dir": archive_dir,
+        "vacuum_pages": _int("vacuum_pages", 2000),
+        "interval_minutes": _int("interval_minutes", 60),
+    }
+
+
+_DEFAULT_DB_PRAGMAS: Dict[str, Any] = {
+    "synchronous": "NORMAL",
+    "cache_size": -20000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+    "wal_autocheckpoint": 1000,
+}
+
+_PRAGMA_CHOICES = {
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def db_pragmas(settings: Dict[str, Any], *, defaults: bool = True) -> Dict[str, Any]:
+    """SQLite performance pragmas applied by `connect()`.
+
+    EN: Missing keys fall back to the defaults above; set a key to null to keep
+        SQLite's own default. cache_size follows SQLite semantics (negative = KiB).
+        `defaults=False` only validates the given keys (used for explicit `pragmas=`).
+    中文：缺省的键使用上面的默认值；设为 null 则保留 SQLite 自身默认值。cache_size 为负数时单位是 KiB。
+          `defaults=False` 时只校验给出的键（用于显式传入的 `pragmas=`）。
+    """
+
+    raw = settings.get("database", {}).get("pragmas", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid database.pragmas in settings.json: must be an object")
+
+    unknown = set(raw) - set(_DEFAULT_DB_PRAGMAS)
+    if unknown:
+        raise ValueError(f"Unknown database.pragmas in settings.json: {sorted(unknown)}")
+
+    merged = {**_DEFAULT_DB_PRAGMAS, **raw} if defaults else raw
+    result: Dict[str, Any] = {}
+    for key, value in merged.items():
+        if value is None:
+            continue
+        if key in _PRAGMA_CHOICES:
+            value = str(value).strip().upper()
+            if value not in _PRAGMA_CHOICES[key]:
+                raise ValueError(f"Invalid database.pragmas.{key} in settings.json: {value}")
+        else:
+            try:
+                value = int(value)
+            except Exception as e:  # noqa: BLE001
+                raise ValueError(f"Invalid database.pragmas.{key} in settings.json: {value}") from e
+        result[key] = value
+    return result
+
+
+def ai_chunking(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Map-reduce portrait generation for large runs.
+
+    EN: mode `auto` switches to chunked generation when the estimated input exceeds
+        `single_call_max_tokens`; `single` always sends one request; `chunked` always splits.
+        Each chunk holds at most `chunk_tokens` (estimated) and up to `max_workers`
+        chunks are generated concurrently before one reduce call merges them.
+    中文：mode 为 `auto` 时，估算输入超过 `single_call_max_tokens` 才分块；`single` 始终单次请求；
+          `chunked` 始终分块。每块约 `chunk_tokens` 个 token，最多 `max_workers` 块并发生成，最后一次 reduce 合并。
+    """
+
+    raw = settings.get("ai", {}).get("chunking", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.chunking in settings.json: must be an object")
+
+    mode = str(raw.get("mode", "auto")).strip().lower()
+    if mode not in {"auto", "single", "chunked"}:
+        raise ValueError(f"Unknown ai.chunking.mode in settings.json: {mode}")
+
+    def _int(key: str, default: int) -> int:
+        value = raw.get(key, default)
+        try:
+            value = int(value)
+        except Exception as e:  # noqa: BLE001
+            raise ValueError(f"Invalid ai.chunking.{key} in settings.json: {value}") from e
+        if value <= 0:
+            raise ValueError(f"Invalid ai.chunking.{key} in settings.json: must be positive")
+        return value
+
+    return {
+        "mode": mode,
+        "single_call_max_tokens": _int("single_call_max_tokens", 24000),
+        "chunk_tokens": _int("chunk_tokens", 12000),
+        "max_workers": _int("max_workers", 4),
+    }
+
+
+def ai_sampling(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Token-budgeted comment sampling before portrait generation.
+
+    EN: When the estimated input exceeds `budget_tokens`, a representative subset is sent
+        (see `src.data_analyse.sampling`). `top_engagement` comments are always included.
+    中文：估算输入超过 `budget_tokens` 时只发送代表性子集；互动最高的 `top_engagement` 条始终保留。
+    """
+
+    raw = settings.get("ai", {}).get("sampling", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.sampling in settings.json: must be an object")
+
+    def _int(key: str, default: int) -> int:
+        value = raw.get(key, default)
+        try:
+            return max(0, int(value))
+        except Exception as e:  # noqa: BLE001
+            raise ValueError(f"Invalid ai.sampling.{key} in settings.json: {value}") from e
+
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "budget_tokens": _int("budget_tokens", 48000),
+        "top_engagement": _int("top_engagement", 30),
+        "seed": _int("seed", 42),
+    }
+
+
+def ai_cache(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """LLM response cache (SQLite table llm_response_cache).
+
+    EN: Entries expire after `ttl_hours` (0 = never); beyond `max_mb` the least recently
+        used entries are evicted.
+    中文：缓存条目 `ttl_hours` 小时后过期（0 表示不过期）；总大小超过 `max_mb` 时按最近最少使用淘汰。
+    """
+
+    raw = settings.get("ai", {}).get("cache", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.cache in settings.json: must be an object")
+
+    def _num(key: str, default: float) -> float:
+        value = raw.get(key, default)
+        try:
+            return max(0.0, float(value))
+        except Exception as e:  # noqa: BLE001
+            raise ValueError(f"Invalid ai.cache.{key} in settings.json: {value}") from e
+
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "ttl_hours": _num("ttl_hours", 168),
+        "max_bytes": int(_num("max_mb", 256) * 1024 * 1024),
+    }
+
+
+def ai_batch(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Batch portrait generation and AI request pacing.
+
+    EN: `concurrency` runs are generated in parallel by /api/portrait/batch and the batch
+        CLI; `requests_per_minute` caps every AI request made by the process (0 = unlimited).
+    中文：`concurrency` 为批量生成时并行处理的 run 数；`requests_per_minute` 限制本进程发出的全部 AI
+          请求（0 表示不限）。
+    """
+
+    raw = settings.get("ai", {}).get("batch", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.batch in settings.json: must be an object")
+
+    try:
+        concurrency = int(raw.get("concurrency", 4))
+        rpm = float(raw.get("requests_per_minute", 60))
+    except Exception as e:  # noqa: BLE001
+        raise ValueError(f"Invalid ai.batch in settings.json: {raw}") from e
+    if concurrency <= 0:
+        raise ValueError("Invalid ai.batch.concurrency in settings.json: must be positive")
+    return {"concurrency": concurrency, "requests_per_minute": max(0.0, rpm)}
+
+
+def ai_local(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Local (no-LLM) statistics engine.
+
+    EN: With `prefill_stats`, language_distribution and sentiment are computed locally from
+        all clean comments before the LLM call and replace the model's values. Setting the
+        env AI_PROVIDER=local (or `provider: "local"` in a request) skips the LLM entirely.
+    中文：开启 `prefill_stats` 时，language_distribution 与 sentiment 在调用 LLM 前基于全部清洗评论本地计算，
+          并覆盖模型输出；环境变量 AI_PROVIDER=local（或请求中 `provider: "local"`）则完全不调用 LLM。
+    """
+
+    raw = settings.get("ai", {}).get("local", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.local in settings.json: must be an object")
+    return {"prefill_stats": bool(raw.get("prefill_stats", False))}
+
+
+def ai_topics(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Local TF-IDF + k-means topic clustering (requires numpy).
+
+    EN: With `enabled`, the local provider fills `topics` from the clusters; `prompt_hints`
+        also appends the clusters to the LLM input as evidence for its own `topics`.
+    中文：`enabled` 时本地引擎用聚类结果填充 `topics`；`prompt_hints` 还会把聚类结果附加到 LLM 输入中作为参考。
+    """
+
+    raw = settings.get("ai", {}).get("topics", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.topics in settings.json: must be an object")
+
+    try:
+        k = int(raw.get("k", 6))
+        max_features = int(raw.get("max_features", 5000))
+        min_df = int(raw.get("min_df", 2))
+        max_iter = int(raw.get("max_iter", 20))
+        seed = int(raw.get("seed", 42))
+    except Exception as e:  # noqa: BLE001
+        raise ValueError(f"Invalid ai.topics in settings.json: {raw}") from e
+    if k <= 0 or max_features <= 0 or max_iter <= 0:
+        raise ValueError("Invalid ai.topics in settings.json: k, max_features and max_iter must be positive")
+
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "prompt_hints": bool(raw.get("prompt_hints", False)),
+        "k": k,
+        "max_features": max_features,
+        "min_df": max(1, min_df),
+        "max_iter": max_iter,
+        "seed": seed,
+    }
+
+
+def ai_json_repair(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Recovery of malformed portrait JSON.
+
+    EN: Replies are always repaired locally first (balanced-object extraction, smart
+        quotes, trailing commas, truncation). With `fix_call`, a reply that still fails is
+        sent back once with `response_format: json_object` to be fixed.
+    中文：回复总是先在本地修复（配平对象抽取、弯引号、尾逗号、截断补全）；开启 `fix_call` 时，
+          仍无法解析的回复会以 `response_format: json_object` 发回模型修正一次。
+    """
+
+    raw = settings.get("ai", {}).get("json_repair", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.json_repair in settings.json: must be an object")
+    return {"fix_call": bool(raw.get("fix_call", True))}
+
+
+def ai_providers(settings: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Ordered list of AI endpoints for failover (empty = the single endpoint from .env).
+
+    EN: Each entry: {name, api_url, model, api_key_env?, priority?, timeout_seconds?, enabled?}.
+        Keys never live in settings.json: `api_key_env` names the env variable holding the
+        key (default AI_API_KEY). Lower `priority` is tried first.
+    中文：每项为 {name, api_url, model, api_key_env?, priority?, timeout_seconds?, enabled?}。
+          密钥不写入 settings.json：`api_key_env` 为保存密钥的环境变量名（默认 AI_API_KEY）；`priority` 越小越优先。
+    """
+
+    raw = settings.get("ai", {}).get("providers", []) or []
+    if not isinstance(raw, list):
+        raise ValueError("Invalid ai.providers in settings.json: must be a list")
+
+    providers: List[Dict[str, Any]] = []
+    for i, item in enumerate(raw):
+        if not isinstance(item, dict):
+            raise ValueError(f"Invalid ai.providers[{i}] in settings.json: must be an object")
+        if not bool(item.get("enabled", True)):
+            continue
+        name = str(item.get("name") or f"provider{i}").strip()
+        api_url = str(item.get("api_url") or "").strip()
+        model = str(item.get("model") or "").strip()
+        if not api_url or not model:
+            raise ValueError(f"Invalid ai.providers[{i}] in settings.json: api_url and model are required")
+        try:
+            priority = int(item.get("priority", i))
+            timeout = float(item.get("timeout_seconds", 180))
+        except Exception as e:  # noqa: BLE001
+            raise ValueError(f"Invalid ai.providers[{i}] in settings.json: {item}") from e
+        if timeout <= 0:
+            raise ValueError(f"Invalid ai.providers[{i}].timeout_seconds in settings.json: must be positive")
+        providers.append(
+            {
+                "name": name,
+                "api_url": api_url,
+                "model": model,
+                "api_key_env": str(item.get("api_key_env") or "AI_API_KEY").strip(),
+                "priority": priority,
+                "timeout_seconds": timeout,
+            }
+        )
+    if len({p["name"] for p in providers}) != len(providers):
+        raise ValueError("Invalid ai.providers in settings.json: names must be unique")
+    providers.sort(key=lambda p: p["priority"])
+    return providers
+
+
+def ai_failover(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Hedged requests and health tracking across `ai.providers`.
+
+    EN: With `hedge`, a duplicate request goes to the next provider once the first has run
+        longer than its `hedge_percentile` latency (after `hedge_min_samples` calls;
+        `hedge_default_ms` before that, never below `hedge_min_ms`); the first answer wins.
+        `failure_threshold` consecutive failures take a provider out of rotation for
+        `cooldown_seconds`.
+    中文：开启 `hedge` 时，首个请求耗时超过该服务商 `hedge_percentile` 分位延迟（样本数达到
+          `hedge_min_samples` 之前用 `hedge_default_ms`，且不低于 `hedge_min_ms`）后，向下一个服务商
+          发出对冲请求，先返回者胜出；连续失败 `failure_threshold` 次的服务商暂停 `cooldown_seconds` 秒。
+    """
+
+    raw = settings.get("ai", {}).get("failover", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.failover in settings.json: must be an object")
+
+    try:
+        cfg = {
+            "hedge": bool(raw.get("hedge", True)),
+            "hedge_percentile": float(raw.get("hedge_percentile", 95)),
+            "hedge_min_samples": int(raw.get("hedge_min_samples", 20)),
+            "hedge_default_ms": float(raw.get("hedge_default_ms", 20000)),
+            "hedge_min_ms": float(raw.get("hedge_min_ms", 2000)),
+            "failure_threshold": int(raw.get("failure_threshold", 3)),
+            "cooldown_seconds": float(raw.get("cooldown_seconds", 60)),
+        }
+    except Exception as e:  # noqa: BLE001
+        raise ValueError(f"Invalid ai.failover in settings.json: {raw}") from e
+    if not 0 < cfg["hedge_percentile"] <= 100:
+        raise ValueError("Invalid ai.failover.hedge_percentile in settings.json: must be in (0, 100]")
+    if cfg["failure_threshold"] <= 0:
+        raise ValueError("Invalid ai.failover.failure_threshold in settings.json: must be positive")
+    return cfg
+
+
+_ROUTE_CONDITIONS = ("min_comments", "max_comments", "min_input_tokens", "max_input_tokens")
+
+
+def ai_routing(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Input-size-aware routing rules for portrait generation.
+
+    EN: Rules are checked in order; the first whose conditions all hold is used (a rule
+        without conditions matches everything). Conditions: min_/max_comments (clean
+        comments of the run) and min_/max_input_tokens (estimated tokens actually sent),
+        max bounds inclusive. A rule may set `model` (or `provider`, a name in
+        ai.providers), `max_tokens`, `prompt_template` and `single_call_max_tokens`.
+    中文：按顺序匹配规则，使用第一条所有条件都满足的规则（无条件的规则匹配一切）。条件：min_/max_comments
+          （run 的清洗评论数）与 min_/max_input_tokens（实际发送内容的估算 token，上限含等号）。
+          规则可设置 `model`（或 ai.providers 中的 `provider` 名称）、`max_tokens`、`prompt_template`
+          与 `single_call_max_tokens`。
+    """
+
+    raw = settings.get("ai", {}).get("routing", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.routing in settings.json: must be an object")
+    rules_raw = raw.get("rules", []) or []
+    if not isinstance(rules_raw, list):
+        raise ValueError("Invalid ai.routing.rules in settings.json: must be a list")
+
+    rules: List[Dict[str, Any]] = []
+    for i, item in enumerate(rules_raw):
+        if not isinstance(item, dict):
+            raise ValueError(f"Invalid ai.routing.rules[{i}] in settings.json: must be an object")
+        rule: Dict[str, Any] = {"name": str(item.get("name") or f"rule{i}")}
+        try:
+            for key in _ROUTE_CONDITIONS + ("max_tokens", "single_call_max_tokens"):
+                if item.get(key) is not None:
+                    rule[key] = int(item[key])
+        except Exception as e:  # noqa: BLE001
+            raise ValueError(f"Invalid ai.routing.rules[{i}] in settings.json: {item}") from e
+        for key in ("model", "provider"):
+            if item.get(key):
+                rule[key] = str(item[key]).strip()
+        if item.get("prompt_template"):
+            rule["prompt_template"] = ai_prompt_template({"ai": {"prompt_template": item["prompt_template"]}})
+        rules.append(rule)
+    return {"enabled": bool(raw.get("enabled", False)), "rules": rules}
+
+
+def ai_accounting(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-call accounting of AI requests (SQLite table ai_calls).
+
+    EN: Every request actually sent is logged with its token usage, latency and an
+        estimated cost. `pricing` maps a model name to prices per 1M tokens
+        {input, cached_input, output} in `currency`; calls of unpriced models get no cost.
+    中文：每个实际发出的请求都会记录 token 用量、延迟与估算费用。`pricing` 将模型名映射到每百万 token
+          的价格 {input, cached_input, output}（单位 `currency`）；未配置价格的模型不估算费用。
+    """
+
+    raw = settings.get("ai", {}).get("accounting", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.accounting in settings.json: must be an object")
+    pricing_raw = raw.get("pricing", {}) or {}
+    if not isinstance(pricing_raw, dict):
+        raise ValueError("Invalid ai.accounting.pricing in settings.json: must be an object")
+
+    pricing: Dict[str, Dict[str, float]] = {}
+    for model, prices in pricing_raw.items():
+        if not isinstance(prices, dict):
+            raise ValueError(f"Invalid ai.accounting.pricing.{model} in settings.json: must be an object")
+        try:
+            entry = {key: float(prices.get(key, 0)) for key in ("input", "output")}
+            # EN: Cached input defaults to the full input price (no prefix-cache discount).
+            # 中文：未配置 cached_input 时按普通输入价计费（不享受前缀缓存折扣）。
+            entry["cached_input"] = float(prices.get("cached_input", entry["input"]))
+        except Exception as e:  # noqa: BLE001
+            raise ValueError(f"Invalid ai.accounting.pricing.{model} in settings.json: {prices}") from e
+        if any(v < 0 for v in entry.values()):
+            raise ValueError(f"Invalid ai.accounting.pricing.{model} in settings.json: prices must be >= 0")
+        pricing[str(model)] = entry
+
+    return {
+        "enabled": bool(raw.get("enabled", True)),
+        "currency": str(raw.get("currency") or "USD"),
+        "pricing": pricing,
+    }
+
+
+def ai_prefix_cache(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Request layout tuned for provider-side prompt prefix caching (e.g. DeepSeek context caching).
+
+    EN: With `enabled`, every portrait request starts with the same analyst system prompt
+        (reduce / incremental instructions follow it instead of preceding it), and comments
+        are sent in a deterministic order (published_at, then comment_id) so re-collected
+        videos and repeated runs share the longest possible prefix. Variable parts (topic
+        hints) stay at the end of the user message.
+    中文：开启 `enabled` 时，所有画像请求都以相同的分析师系统提示词开头（reduce / 增量说明附在其后而非其前），
+          评论按确定顺序（published_at，其次 comment_id）发送，使重新采集的视频与重复生成共享尽可能长的前缀；
+          可变部分（主题提示）始终放在用户消息末尾。
+    """
+
+    raw = settings.get("ai", {}).get("prefix_cache", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.prefix_cache in settings.json: must be an object")
+    return {"enabled": bool(raw.get("enabled", True))}
+
+
+_DEFAULT_SECTIONS = (
+    {"name": "overview", "keys": ["summary", "tags"]},
+    {"name": "distributions", "keys": ["language_distribution", "sentiment"]},
+    {"name": "topics", "keys": ["topics"]},
+    {"name": "audience", "keys": ["audience_insights", "confidence"]},
+)
+
+
+def ai_sections(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Sectioned (parallel) portrait generation for single-call runs.
+
+    EN: With `enabled`, the output schema is split into `groups` of top-level keys; each
+        group is requested concurrently (at most `max_workers` at once) on the same input
+        and the replies are assembled in group order into one portrait. Wall time follows
+        the slowest group instead of the whole completion; input tokens are paid per group.
+    中文：开启 `enabled` 时，输出结构按 `groups`（顶层字段分组）拆开，对同一输入并发请求各组（最多
+          `max_workers` 个同时进行），再按分组顺序拼装为一个画像。耗时取决于最慢的一组而非整段输出；
+          输入 token 按组数计费。
+    """
+
+    raw = settings.get("ai", {}).get("sections", {}) or {}
+    if not isinstance(raw, dict):
+        raise ValueError("Invalid ai.sections in settings.json: must be an object")
+
+    groups_raw = raw.get("groups") or _DEFAULT_SECTIONS
+    if not isinstance(groups_raw, (list, tuple)):
+        raise ValueError("Invalid ai.sections.groups in settings.json: must be a list")
+    groups: List[Dict[str, Any]] = []
+    seen: set = set()
+    for i, item in enumerate(groups_raw):
+        keys = item.get("keys") if isinstance(item, dict) else None
+        if not isinstance(keys, list) or not keys or not all(isinstance(k, str) and k for k in keys):
+            raise ValueError(f"Invalid ai.sections.groups[{i}] in settings.json: keys must be a non-empty list")
+        if seen & set(keys):
+            raise ValueError(f"Invalid ai.sections.groups[{i}] in settings.json: key in two groups")
+        seen.update(keys)
+        groups.append({"name": str(item.get("name") or f"section{i}"), "keys": list(keys)})
+
+    try:
+        max_workers = int(raw.get("max_workers", 4))
+    except Exception as e:  # noqa: BLE001
+        raise ValueError(f"Invalid ai.sections.max_workers in settings.json: {raw.get('max_workers')}") from e
+    if max_workers <= 0:
+        raise ValueError("Invalid ai.sections.max_workers in settings.json: must be positive")
+
+    return {"enabled": bool(raw.get("enabled", False)), "max_workers": max_workers, "groups": groups}
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+
+def _ensure_project_root_on_syspath() -> None:
+    """Ensure imports like `from src...` work when run as a script.
+
+    EN: When using `python -m ...`, this is unnecessary.
+    中文：若用 `python -m ...` 运行则不需要；直接运行脚本时需要把项目根目录加入 sys.path。
+    """
+
+    root = Path(__file__).resolve().parents[2]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+
+
+_ensure_project_root_on_syspath()
+
+from src.config import ai_batch, db_path, load_settings  # noqa: E402
+from src.data_analyse.portrait import generate_portrait_for_run  # noqa: E402
+from src.database.sqlite import list_run_ids_without_portrait  # noqa: E402
+from src.database.writer import read_connection  # noqa: E402
+
+
+def _one(run_id: int, settings: Dict[str, Any], overwrite: bool, incremental: bool) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        result = generate_portrait_for_run(
+            run_id=run_id, settings=settings, overwrite=overwrite, incremental=incremental
+        )
+    except Exception as e:  # noqa: BLE001
+        return {
+            "run_id": run_id,
+            "ok": False,
+            "error": str(e),
+            "elapsed_s": round(time.perf_counter() - t0, 3),
+        }
+    generation = result.get("generation") or {}
+    return {
+        "run_id": run_id,
+        "ok": True,
+        "parse_ok": bool(result.get("parse_ok")),
+        "cached": bool(result.get("cached")),
+        "mode": generation.get("mode"),
+        "llm_calls": generation.get("llm_calls"),
+        "llm_cache_hits": generation.get("llm_cache_hits"),
+        "base_run_id": result.get("base_run_id"),
+        "error": result.get("error"),
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+    }
+
+
+def iter_batch_portraits(
+    run_ids: Iterable[int],
+    *,
+    settings: Optional[Dict[str, Any]] = None,
+    overwrite: bool = False,
+    concurrency: Optional[int] = None,
+    incremental: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Generate portraits for many runs on a bounded thread pool, yielding each result as it finishes.
+
+    EN: At most `concurrency` runs are in flight (default: settings ai.batch.concurrency);
+        only that many are submitted at a time, so a huge backlog never queues up in memory.
+        AI requests are additionally paced by ai.batch.requests_per_minute. A failing run
+        yields `ok: false` and does not stop the batch.
+    中文：同时最多处理 `concurrency` 个 run（默认取 ai.batch.concurrency），且只按并发数逐步提交，
+          大批量回填不会一次性堆积在内存中；AI 请求另受 ai.batch.requests_per_minute 限速。
+          单个 run 失败只返回 `ok: false`，不影响其它 run。
+
+    EN: With `incremental`, each run updates the portrait stored for an earlier run of
+        its video at the moment it starts (runs in flight together do not see each other).
+    中文：开启 `incremental` 时，每个 run 基于开始处理时已存在的同视频旧画像增量更新
+          （同时处理中的 run 彼此不可见）。
+    """
+
+    settings = settings or load_settings()
+    workers = int(concurrency or ai_batch(settings)["concurrency"])
+    pending = iter(run_ids)
+    in_flight: set[Future] = set()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="portrait-batch") as pool:
+
+        def _submit_next() -> bool:
+            run_id = next(pending, None)
+            if run_id is None:
+                return False
+            in_flight.add(pool.submit(_one, int(run_id), settings, overwrite, incremental))
+            return True
+
+        while len(in_flight) < workers and _submit_next():
+            pass
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                _submit_next()
+                yield future.result()
+
+
+def summarize(results: List[Dict[str, Any]], elapsed_s: float) -> Dict[str, Any]:
+    return {
+        "summary": True,
+        "total": len(results),
+        "ok": sum(1 for r in results if r.get("ok")),
+        "parse_ok": sum(1 for r in results if r.get("parse_ok")),
+        "failed": sum(1 for r in results if not r.get("ok")),
+        "elapsed_s": round(elapsed_s, 3),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    load_dotenv()
+    settings = load_settings()
+
+    parser = argparse.ArgumentParser(
+        description="Generate portraits for many runs with bounded concurrency (one JSON line per run)."
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--run-id", type=int, action="append", help="Run to process (repeatable)")
+    group.add_argument("--missing", action="store_true", help="Every run with clean comments but no portrait")
+    parser.add_argument("--overwrite", action="store_true", help="Regenerate existing portraits")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Update the latest earlier portrait of the same video with only the new comments",
+    )
+    parser.add_argument("--concurrency", type=int, default=0, help="Runs in flight (default: ai.batch.concurrency)")
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=None,
+        help="AI requests per minute (default: ai.batch.requests_per_minute, 0 = unlimited)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.rpm is not None:
+        settings.setdefault("ai", {}).setdefault("batch", {})["requests_per_minute"] = args.rpm
+
+    if args.missing:
+        conn = read_connection(db_path(settings))
+        try:
+            run_ids = list_run_ids_without_portrait(conn)
+        finally:
+            conn.close()
+    else:
+        run_ids = list(args.run_id)
+
+    t0 = time.perf_counter()
+    results: List[Dict[str, Any]] = []
+    for result in iter_batch_portraits(
+        run_ids,
+        settings=settings,
+        overwrite=args.overwrite,
+        concurrency=args.concurrency or None,
+        incremental=args.incremental,
+    ):
+        results.append(result)
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    print(json.dumps(summarize(results, time.perf_counter() - t0), ensure_ascii=False))
+    return 0 if all(r.get("ok") for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
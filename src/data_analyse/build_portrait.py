@@ -24,7 +24,9 @@ def _ensure_project_root_on_syspath() -> None:
 
 _ensure_project_root_on_syspath()
 
-from src.config import default_ai_prompt_filename, db_path, load_settings  # noqa: E402
+from src.ai.json_repair import parse_json_tolerant  # noqa: E402
+from src.ai.prompts import get_prompt_registry  # noqa: E402
+from src.config import db_path, load_settings  # noqa: E402
 from src.database.sqlite import (  # noqa: E402
     connect,
     get_ai_portrait,
@@ -40,57 +42,6 @@ from src.ai.deepseek_client import (  # noqa: E402
 )
 
 
-def _load_prompt_file(path: Path) -> Dict[str, Any]:
-    text = path.read_text(encoding="utf-8")
-    data = json.loads(text)
-    if not isinstance(data, dict):
-        raise ValueError("Prompt JSON must be an object")
-    if "system_prompt" not in data or not isinstance(data["system_prompt"], str):
-        raise ValueError("Prompt JSON must include system_prompt (string)")
-    return data
-
-
-def _resolve_prompt_path() -> Path:
-    project_root = Path(__file__).resolve().parents[2]
-
-    env_value = (os.getenv("AI_PROMPT") or "").strip().strip('"')
-    if env_value:
-        p = Path(env_value)
-        if not p.is_absolute():
-            p = project_root / p
-        if p.exists():
-            return p
-        if p.suffix.lower() == ".txt":
-            candidate = p.with_suffix(".json")
-            if candidate.exists():
-                return candidate
-
-    settings = load_settings()
-    p = project_root / "AI_PROMPT" / default_ai_prompt_filename(settings)
-    if p.exists():
-        return p
-
-    return project_root / "AI_PROMPT" / "AI_PROMPT_Default.json"
-
-
-def _extract_json_text(raw: str) -> str:
-    s = (raw or "").strip()
-    if s.startswith("```"):
-        lines = s.splitlines()
-        if len(lines) >= 3 and lines[-1].strip().startswith("```"):
-            s = "\n".join(lines[1:-1]).strip()
-
-    obj_start = s.find("{")
-    obj_end = s.rfind("}")
-    arr_start = s.find("[")
-    arr_end = s.rfind("]")
-    if obj_start != -1 and obj_end != -1 and obj_end > obj_start:
-        return s[obj_start : obj_end + 1]
-    if arr_start != -1 and arr_end != -1 and arr_end > arr_start:
-        return s[arr_start : arr_end + 1]
-    return s
-
-
 def main() -> int:
     load_dotenv()
     settings = load_settings()
@@ -143,8 +94,7 @@ def main() -> int:
             )
 
         video_id = str(comments[0].get("video_id") or "")
-        prompt_path = _resolve_prompt_path()
-        prompt_obj = _load_prompt_file(prompt_path)
+        _prompt_path, prompt_obj = get_prompt_registry().resolve(settings)
 
         input_obj = {
             "video_id": video_id,
@@ -181,7 +131,7 @@ def main() -> int:
         error: Optional[str] = None
 
         try:
-            parsed = json.loads(_extract_json_text(raw_content))
+            parsed, _fixes = parse_json_tolerant(raw_content)
             portrait_json = json.dumps(parsed, ensure_ascii=False)
             parse_ok = True
         except Exception as e:  # noqa: BLE001
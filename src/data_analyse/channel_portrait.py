@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.data_analyse.language import LANGUAGES
+from src.data_analyse.local_portrait import SENTIMENTS, round_shares
+from src.database.sqlite import channel_portraits_fingerprint, list_channel_portraits
+
+MAX_TAGS = 20
+MAX_TOPICS = 10
+MAX_INSIGHTS = 10
+
+# EN: Known key order of the distribution fields; other keys a prompt may add follow.
+# 中文：分布字段的已知键顺序；提示词额外产出的键排在其后。
+_KNOWN_KEYS = {"language_distribution": LANGUAGES, "sentiment": SENTIMENTS}
+
+
+def _weighted_distribution(items: Sequence[Tuple[Dict[str, Any], float]]) -> Dict[str, float]:
+    """Shares of many {key: share} dicts, each weighted by its portrait's comment count."""
+
+    mass: Dict[str, float] = {}
+    for dist, weight in items:
+        for key, value in dist.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                mass[str(key)] = mass.get(str(key), 0.0) + float(value) * weight
+    return mass
+
+
+def _ranked_terms(items: Sequence[Tuple[List[Any], float]], limit: int) -> List[str]:
+    """Strings that appear in many (heavily weighted) portraits first; case-insensitive dedup."""
+
+    score: Dict[str, float] = {}
+    label: Dict[str, str] = {}
+    for values, weight in items:
+        for value in values:
+            text = str(value.get("name") if isinstance(value, dict) else value or "").strip()
+            if not text:
+                continue
+            key = text.casefold()
+            label.setdefault(key, text)
+            score[key] = score.get(key, 0.0) + weight
+    ranked = sorted(score, key=lambda k: (-score[k], k))[:limit]
+    return [label[k] for k in ranked]
+
+
+def _merged_topics(items: Sequence[Tuple[List[Any], float]], limit: int) -> List[Dict[str, Any]]:
+    """Topics combined by name; weight = sum of (topic weight x comment count), re-normalized."""
+
+    mass: Dict[str, float] = {}
+    label: Dict[str, str] = {}
+    for topics, weight in items:
+        for topic in topics:
+            if not isinstance(topic, dict):
+                continue
+            name = str(topic.get("name") or "").strip()
+            value = topic.get("weight")
+            if not name or not isinstance(value, (int, float)):
+                continue
+            key = name.casefold()
+            label.setdefault(key, name)
+            mass[key] = mass.get(key, 0.0) + float(value) * weight
+    top = sorted(mass, key=lambda k: (-mass[k], k))[:limit]
+    shares = round_shares(mass, top)
+    return [{"name": label[k], "weight": shares[k]} for k in top]
+
+
+def _summary(videos: int, comments: int, portrait: Dict[str, Any], language: str) -> str:
+    topics = "、".join(t["name"] for t in portrait["topics"][:3])
+    sent = portrait.get("sentiment") or {}
+    if language == "zh":
+        text = f"基于 {videos} 个视频、{comments} 条评论的频道聚合画像（由已存储画像合并，未调用 AI）。"
+        if sent:
+            text += (
+                f"整体情感：正面 {sent.get('positive', 0):.0%} / 中性 {sent.get('neutral', 0):.0%}"
+                f" / 负面 {sent.get('negative', 0):.0%}。"
+            )
+        if topics:
+            text += f"主要话题：{topics}。"
+        return text
+    text = f"Channel portrait merged from {videos} stored video portraits ({comments} comments, no AI call)."
+    if sent:
+        text += (
+            f" Sentiment: positive {sent.get('positive', 0):.0%} / neutral {sent.get('neutral', 0):.0%}"
+            f" / negative {sent.get('negative', 0):.0%}."
+        )
+    if topics:
+        text += f" Main topics: {topics.replace('、', ', ')}."
+    return text
+
+
+def aggregate_portraits(
+    portraits: Sequence[Tuple[Dict[str, Any], int]], *, language: str = "zh"
+) -> Dict[str, Any]:
+    """Merge (portrait, clean_count) pairs into one portrait with the same output structure.
+
+    EN: Distribution fields (objects of numbers such as language_distribution, sentiment)
+        are averaged with each portrait weighted by its clean_count; topics are merged by
+        name with weight x clean_count; tags and audience_insights lists are ranked by the
+        clean_count of the portraits that mention them; confidence is the weighted mean.
+    中文：分布字段（数值对象，如 language_distribution、sentiment）按各画像的 clean_count 加权平均；
+          topics 按名称合并，权重为 weight x clean_count；tags 与 audience_insights 各列表按提及它们的
+          画像 clean_count 之和排序；confidence 取加权平均。
+    """
+
+    pairs = [(p, float(max(1, int(n or 0)))) for p, n in portraits if isinstance(p, dict)]
+    total_weight = sum(w for _p, w in pairs)
+    result: Dict[str, Any] = {}
+
+    distribution_fields: List[str] = []
+    for portrait, _w in pairs:
+        for name, value in portrait.items():
+            if (
+                name not in distribution_fields
+                and isinstance(value, dict)
+                and value
+                and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value.values())
+            ):
+                distribution_fields.append(name)
+    for name in distribution_fields:
+        mass = _weighted_distribution(
+            [(p[name], w) for p, w in pairs if isinstance(p.get(name), dict)]
+        )
+        known = list(_KNOWN_KEYS.get(name, ()))
+        keys = known + sorted(k for k in mass if k not in known)
+        result[name] = round_shares(mass, keys)
+
+    result["topics"] = _merged_topics(
+        [(p["topics"], w) for p, w in pairs if isinstance(p.get("topics"), list)], MAX_TOPICS
+    )
+    result["tags"] = _ranked_terms(
+        [(p["tags"], w) for p, w in pairs if isinstance(p.get("tags"), list)], MAX_TAGS
+    )
+
+    insight_keys: List[str] = []
+    for portrait, _w in pairs:
+        insights = portrait.get("audience_insights")
+        if isinstance(insights, dict):
+            insight_keys.extend(k for k in insights if k not in insight_keys)
+    result["audience_insights"] = {
+        key: _ranked_terms(
+            [
+                (p["audience_insights"][key], w)
+                for p, w in pairs
+                if isinstance(p.get("audience_insights"), dict)
+                and isinstance(p["audience_insights"].get(key), list)
+            ],
+            MAX_INSIGHTS,
+        )
+        for key in insight_keys
+    }
+
+    confidences = [
+        (float(p["confidence"]), w) for p, w in pairs if isinstance(p.get("confidence"), (int, float))
+    ]
+    if confidences:
+        result["confidence"] = round(
+            sum(c * w for c, w in confidences) / sum(w for _c, w in confidences), 2
+        )
+
+    result["summary"] = _summary(len(pairs), int(total_weight), result, language)
+    return {"summary": result.pop("summary"), **result}
+
+
+class ChannelPortraitCache:
+    """Aggregates per (channel_id, window), recomputed only when the underlying portraits change.
+
+    EN: Each lookup runs one cheap fingerprint query (count, id sum, newest created_at of
+        the channel's parsed portraits in the window); the aggregate is rebuilt only when it
+        differs from the cached one. At most `max_entries` windows are kept (LRU).
+    中文：每次查询只执行一次轻量的指纹查询（窗口内已解析画像的数量、id 之和、最新生成时间），
+          与缓存不一致时才重新聚合；最多保留 `max_entries` 个窗口（LRU）。
+    """
+
+    def __init__(self, *, max_entries: int = 256) -> None:
+        self.max_entries = int(max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[Any, ...], Tuple[Tuple[Any, ...], Dict[str, Any]]]" = OrderedDict()
+
+    def get(
+        self,
+        conn: Any,
+        channel_id: str,
+        *,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        language: str = "zh",
+        refresh: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Aggregate for the channel/window (None when it has no parsed portrait)."""
+
+        key = (channel_id, date_from, date_to, language)
+        fingerprint = channel_portraits_fingerprint(conn, channel_id, date_from=date_from, date_to=date_to)
+        if not fingerprint[0]:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fingerprint and not refresh:
+                self._entries.move_to_end(key)
+                return {**entry[1], "cached": True}
+
+        result = build_channel_portrait(
+            conn, channel_id, date_from=date_from, date_to=date_to, language=language
+        )
+        with self._lock:
+            self._entries[key] = (fingerprint, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return {**result, "cached": False}
+
+
+def build_channel_portrait(
+    conn: Any,
+    channel_id: str,
+    *,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    language: str = "zh",
+) -> Dict[str, Any]:
+    """Aggregate portrait of a channel from its stored per-video portraits (no AI call)."""
+
+    t0 = time.perf_counter()
+    rows = list_channel_portraits(conn, channel_id, date_from=date_from, date_to=date_to)
+    portraits: List[Tuple[Dict[str, Any], int]] = []
+    runs: List[Dict[str, Any]] = []
+    for row in rows:
+        try:
+            portrait = json.loads(row["portrait_json"] or "")
+        except ValueError:
+            continue
+        if not isinstance(portrait, dict):
+            continue
+        portraits.append((portrait, int(row["clean_count"] or 0)))
+        runs.append(
+            {
+                "run_id": int(row["run_id"]),
+                "video_id": row["video_id"],
+                "video_title": row["video_title"],
+                "collected_at": row["collected_at"],
+                "clean_count": int(row["clean_count"] or 0),
+            }
+        )
+
+    return {
+        "channel_id": channel_id,
+        "channel_title": next((r["channel_title"] for r in rows if r["channel_title"]), None),
+        "date_from": date_from,
+        "date_to": date_to,
+        "videos": len(runs),
+        "comments": sum(r["clean_count"] for r in runs),
+        "portrait": aggregate_portraits(portraits, language=language) if portraits else None,
+        "runs": runs,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+
+_cache: Optional[ChannelPortraitCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_channel_portrait_cache() -> ChannelPortraitCache:
+    """Process-wide cache used by /api/channels/<channel_id>/portrait."""
+
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChannelPortraitCache()
+        return _cache
@@ -27,6 +27,7 @@ _ensure_project_root_on_syspath()
 from src.config import db_path, load_settings  # noqa: E402
 from src.database.sqlite import (  # noqa: E402
     connect,
+    get_run_archive_path,
     init_schema,
     insert_clean_comment,
     iter_raw_threads,
@@ -94,6 +95,11 @@ def main(argv: Optional[list[str]] = None) -> int:
         run_id = int(args.run_id) if int(args.run_id) > 0 else (latest_run_id(conn) or 0)
         if run_id <= 0:
             raise SystemExit("No collection_runs found. Run collection first.")
+        if get_run_archive_path(conn, run_id) is not None:
+            raise SystemExit(
+                f"run_id={run_id} is archived. Restore it first: "
+                f"python -m src.database.archive --restore {run_id}"
+            )
 
         scanned = 0
         inserted_or_ignored = 0
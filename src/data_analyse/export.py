@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+
+def _ensure_project_root_on_syspath() -> None:
+    """Ensure imports like `from src...` work when run as a script.
+
+    EN: When using `python -m ...`, this is unnecessary.
+    中文：若用 `python -m ...` 运行则不需要；直接运行脚本时需要把项目根目录加入 sys.path。
+    """
+
+    root = Path(__file__).resolve().parents[2]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+
+
+_ensure_project_root_on_syspath()
+
+from src.config import db_path, load_settings  # noqa: E402
+from src.database.sqlite import get_ai_portrait, iter_export_comments  # noqa: E402
+from src.database.writer import read_connection  # noqa: E402
+
+FORMATS = ("parquet", "arrow")
+DEFAULT_CHUNK_SIZE = 5000
+
+MIME_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+_COMMENT_COLUMNS = (
+    "run_id",
+    "video_id",
+    "comment_id",
+    "published_at",
+    "author",
+    "like_count",
+    "reply_count",
+    "text",
+    "collected_at",
+    "video_url",
+    "video_title",
+    "channel_id",
+    "channel_title",
+)
+
+
+def _pyarrow() -> Any:
+    # EN: pyarrow is only needed for exports; keep the rest of the app importable without it.
+    # 中文：pyarrow 仅导出时需要，未安装时不影响其它功能。
+    try:
+        import pyarrow as pa  # noqa: WPS433
+    except ImportError as e:
+        raise RuntimeError("Columnar export requires pyarrow: pip install pyarrow") from e
+    return pa
+
+
+def export_schema() -> Any:
+    pa = _pyarrow()
+    return pa.schema(
+        [
+            ("run_id", pa.int64()),
+            ("video_id", pa.string()),
+            ("comment_id", pa.string()),
+            ("published_at", pa.string()),
+            ("author", pa.string()),
+            ("like_count", pa.int64()),
+            ("reply_count", pa.int64()),
+            ("text", pa.string()),
+            ("collected_at", pa.string()),
+            ("video_url", pa.string()),
+            ("video_title", pa.string()),
+            ("channel_id", pa.string()),
+            ("channel_title", pa.string()),
+            ("portrait_parse_ok", pa.bool_()),
+            ("portrait_model", pa.string()),
+            ("portrait_created_at", pa.string()),
+            ("portrait_confidence", pa.float64()),
+            ("portrait_sentiment_positive", pa.float64()),
+            ("portrait_sentiment_neutral", pa.float64()),
+            ("portrait_sentiment_negative", pa.float64()),
+            ("portrait_tags", pa.list_(pa.string())),
+        ]
+    )
+
+
+def _num(value: Any) -> Optional[float]:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _portrait_facts(conn: sqlite3.Connection, run_id: int) -> Dict[str, Any]:
+    """Flatten the scalar facts of a run's portrait into export columns (all None if absent)."""
+
+    facts: Dict[str, Any] = {
+        "portrait_parse_ok": None,
+        "portrait_model": None,
+        "portrait_created_at": None,
+        "portrait_confidence": None,
+        "portrait_sentiment_positive": None,
+        "portrait_sentiment_neutral": None,
+        "portrait_sentiment_negative": None,
+        "portrait_tags": None,
+    }
+    row = get_ai_portrait(conn, run_id)
+    if row is None:
+        return facts
+
+    facts["portrait_parse_ok"] = bool(row["parse_ok"])
+    facts["portrait_model"] = row["model"]
+    facts["portrait_created_at"] = row["created_at"]
+    try:
+        portrait = json.loads(row["portrait_json"]) if row["portrait_json"] else None
+    except Exception:  # noqa: BLE001
+        portrait = None
+    if not isinstance(portrait, dict):
+        return facts
+
+    facts["portrait_confidence"] = _num(portrait.get("confidence"))
+    sentiment = portrait.get("sentiment")
+    if isinstance(sentiment, dict):
+        for key in ("positive", "neutral", "negative"):
+            facts[f"portrait_sentiment_{key}"] = _num(sentiment.get(key))
+    tags = portrait.get("tags")
+    if isinstance(tags, list):
+        facts["portrait_tags"] = [str(t) for t in tags]
+    return facts
+
+
+def iter_record_batches(
+    conn: sqlite3.Connection, run_ids: List[int], *, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[Any]:
+    """Yield pyarrow RecordBatches of at most `chunk_size` comments.
+
+    EN: Rows are paged with keyset pagination, so only one chunk is in memory at a time.
+        Portrait facts are looked up once per run and repeated on its comment rows.
+    中文：按 keyset 分页读取，内存中只保留一个分块；画像字段每个 run 只查一次，平铺到该 run 的评论行。
+    """
+
+    pa = _pyarrow()
+    schema = export_schema()
+    facts_by_run: Dict[int, Dict[str, Any]] = {}
+    after: Optional[int] = None
+    while True:
+        rows = iter_export_comments(conn, run_ids, after=after, limit=chunk_size)
+        if not rows:
+            return
+        after = int(rows[-1]["comment_row_id"])
+
+        columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+        for r in rows:
+            run_id = int(r["run_id"])
+            facts = facts_by_run.get(run_id)
+            if facts is None:
+                facts = facts_by_run[run_id] = _portrait_facts(conn, run_id)
+            for name in _COMMENT_COLUMNS:
+                columns[name].append(r[name])
+            for name, value in facts.items():
+                columns[name].append(value)
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes to a generator (for streaming HTTP)."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._parts.append(chunk)
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        return None
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _open_writer(fmt: str, sink: Any, schema: Any) -> Any:
+    pa = _pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq  # noqa: WPS433
+
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    if fmt == "arrow":
+        return pa.ipc.new_file(sink, schema)
+    raise ValueError(f"Unsupported export format: {fmt} (expected one of {FORMATS})")
+
+
+def write_export(
+    conn: sqlite3.Connection,
+    run_ids: List[int],
+    out_file: Path,
+    *,
+    fmt: str = "parquet",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """Write runs to a Parquet / Arrow IPC file chunk by chunk. Returns rows written."""
+
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_file.with_name(out_file.name + ".tmp")
+    rows = 0
+    writer = _open_writer(fmt, str(tmp), export_schema())
+    try:
+        for batch in iter_record_batches(conn, run_ids, chunk_size=chunk_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        writer.close()
+    tmp.replace(out_file)
+    return rows
+
+
+def stream_export(
+    db_file: Path,
+    run_ids: List[int],
+    *,
+    fmt: str = "parquet",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Generate the export file as byte chunks (one per record batch) for a streaming response.
+
+    EN: Opens its own read-only connection so it can outlive the request handler.
+    中文：生成器内部自行打开只读连接，可在请求处理函数返回后继续输出。
+    """
+
+    pa = _pyarrow()
+    sink = _ChunkSink()
+    conn = read_connection(db_file)
+    try:
+        writer = _open_writer(fmt, pa.PythonFile(sink, mode="w"), export_schema())
+        for batch in iter_record_batches(conn, run_ids, chunk_size=chunk_size):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+        writer.close()
+        data = sink.drain()
+        if data:
+            yield data
+    finally:
+        conn.close()
+
+
+def resolve_run_ids(
+    conn: sqlite3.Connection,
+    *,
+    run_ids: Optional[List[int]] = None,
+    channel_id: Optional[str] = None,
+) -> List[int]:
+    """Explicit run ids (kept if they exist), else every run of a channel, else all runs."""
+
+    if run_ids:
+        placeholders = ", ".join("?" for _ in run_ids)
+        rows = conn.execute(
+            f"SELECT id FROM collection_runs WHERE id IN ({placeholders}) ORDER BY id ASC",
+            [int(x) for x in run_ids],
+        ).fetchall()
+    elif channel_id:
+        rows = conn.execute(
+            "SELECT id FROM collection_runs WHERE channel_id = ? ORDER BY id ASC", (channel_id,)
+        ).fetchall()
+    else:
+        rows = conn.execute("SELECT id FROM collection_runs ORDER BY id ASC").fetchall()
+    return [int(r["id"]) for r in rows]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    load_dotenv()
+    settings = load_settings()
+
+    parser = argparse.ArgumentParser(
+        description="Export clean comments + run metadata + portrait facts to Parquet or Arrow IPC."
+    )
+    parser.add_argument("--run-id", type=int, action="append", default=None, help="Run to export (repeatable)")
+    parser.add_argument("--channel-id", default=None, help="Export every run of this channel")
+    parser.add_argument("--all", action="store_true", help="Export every run in the DB")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per record batch")
+    parser.add_argument("--out", required=True, help="Output file path")
+    args = parser.parse_args(argv)
+
+    if not (args.run_id or args.channel_id or args.all):
+        raise SystemExit("Choose what to export: --run-id, --channel-id or --all")
+    if args.chunk_size <= 0:
+        raise SystemExit("--chunk-size must be positive")
+
+    conn = read_connection(db_path(settings))
+    try:
+        run_ids = resolve_run_ids(conn, run_ids=args.run_id, channel_id=args.channel_id)
+        if not run_ids:
+            raise SystemExit("No matching collection_runs.")
+        rows = write_export(conn, run_ids, Path(args.out), fmt=args.format, chunk_size=args.chunk_size)
+    finally:
+        conn.close()
+
+    print(f"Export done. runs={len(run_ids)} rows={rows} format={args.format} out={args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
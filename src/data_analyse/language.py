@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import Dict
+
+# EN: Languages reported by the portrait prompt's language_distribution.
+# 中文：与提示词 language_distribution 中的语言键保持一致。
+LANGUAGES = ("zh", "ja", "ko", "en", "other")
+
+
+def script_counts(text: str) -> Dict[str, int]:
+    """Count characters per writing system: han, kana, hangul, latin."""
+
+    counts = {"han": 0, "kana": 0, "hangul": 0, "latin": 0}
+    for ch in text:
+        code = ord(ch)
+        if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF or 0xF900 <= code <= 0xFAFF:
+            counts["han"] += 1
+        elif 0x3040 <= code <= 0x30FF or 0x31F0 <= code <= 0x31FF or 0xFF66 <= code <= 0xFF9F:
+            counts["kana"] += 1
+        elif 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+            counts["hangul"] += 1
+        elif ch.isascii() and ch.isalpha():
+            counts["latin"] += 1
+    return counts
+
+
+def detect_language(text: str) -> str:
+    """Guess the main language of a comment from its scripts (zh | ja | ko | en | other).
+
+    EN: Kana amounting to at least a tenth of the kanji means Japanese (Japanese mixes
+        both); otherwise the dominant script wins. Latin script is reported as `en`.
+    中文：假名数量达到汉字的十分之一即判为日文（日文混用假名与汉字）；否则按占比最高的文字判断，
+          拉丁字母记为 `en`。
+    """
+
+    counts = script_counts(text or "")
+    if counts["kana"] > 0 and counts["kana"] * 10 >= counts["han"]:
+        return "ja"
+    best = max(counts, key=lambda k: counts[k])
+    if counts[best] == 0:
+        return "other"
+    return {"han": "zh", "kana": "ja", "hangul": "ko", "latin": "en"}[best]
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from src.data_analyse.language import LANGUAGES, detect_language
+
+LOCAL_PROVIDER = "local"
+LOCAL_MODEL = "lexicon-v1"
+SENTIMENTS = ("positive", "neutral", "negative")
+
+# EN: Fields the local engine computes exactly; with ai.local.prefill_stats they replace the LLM's guesses.
+# 中文：本地引擎可精确计算的字段；开启 ai.local.prefill_stats 后覆盖 LLM 给出的估计值。
+STATS_FIELDS = ("language_distribution", "sentiment")
+
+# EN: CJK has no word boundaries, so CJK cues are matched as substrings.
+# 中文：中日韩文本没有词边界，情感词按子串匹配。
+_CJK_POSITIVE = (
+    # zh
+    "喜欢", "喜歡", "好听", "好聽", "好看", "很好", "真好", "太好", "不错", "不錯", "厉害", "厲害",
+    "支持", "加油", "感动", "感動", "期待", "漂亮", "可爱", "可愛", "优秀", "優秀", "精彩", "完美",
+    "牛逼", "绝了", "太棒", "好棒", "真棒", "赞", "讚", "爱了", "愛了", "哈哈", "谢谢", "謝謝",
+    # ja
+    "好き", "最高", "すごい", "凄い", "素晴らしい", "かわいい", "素敵", "ありがとう", "楽しみ", "綺麗",
+    "きれい", "神曲", "泣ける",
+    # ko
+    "좋아", "좋다", "최고", "사랑", "대박", "감동", "멋지", "멋있", "예쁘", "고마워", "감사",
+)
+_CJK_NEGATIVE = (
+    # zh
+    "难听", "難聽", "难看", "難看", "垃圾", "失望", "讨厌", "討厭", "恶心", "噁心", "无聊", "無聊",
+    "可惜", "难过", "難過", "生气", "生氣", "太烂", "太爛", "好烂", "烂片", "爛片", "退粉", "糟糕",
+    "差劲", "差勁", "尴尬", "尷尬",
+    # ja
+    "嫌い", "最悪", "つまらない", "残念", "ひどい", "酷い", "悲しい", "うざい",
+    # ko
+    "싫어", "최악", "별로", "실망", "짜증", "슬프", "노잼",
+)
+_CJK_NEGATORS = "不没沒别別无無"
+
+# EN: "like" is left out on purpose: it is mostly a comparison or filler ("looks like", "like 5 times").
+# 中文：刻意不收录 "like"：它多用于比较或口头禅（"looks like"、"like 5 times"），而非表达喜欢。
+_LATIN_POSITIVE = frozenset(
+    """
+    love loved loving lovely liked great amazing awesome best beautiful good nice cool perfect
+    thank thanks wow fantastic excellent favorite favourite incredible masterpiece brilliant fun
+    enjoy enjoyed wonderful cute happy gorgeous legend legendary goat fire
+    """.split()
+)
+_LATIN_NEGATIVE = frozenset(
+    """
+    hate hated bad worst terrible awful boring disappointed disappointing sad trash cringe ugly
+    annoying stupid sucks suck horrible poor worse overrated mid waste
+    """.split()
+)
+_LATIN_NEGATORS = frozenset("not no never dont don't doesnt doesn't isnt isn't wasnt wasn't didnt didn't cant can't".split())
+
+_EMOJI_POSITIVE = "❤♥😍🥰😘👍👏🔥✨💯😊😁🤩💕💖"
+_EMOJI_NEGATIVE = "👎😡🤬💩😒🙄"
+
+_CJK_POSITIVE_RE = re.compile("|".join(map(re.escape, _CJK_POSITIVE)))
+_CJK_NEGATIVE_RE = re.compile("|".join(map(re.escape, _CJK_NEGATIVE)))
+_CJK_NEGATED_POSITIVE_RE = re.compile(
+    f"[{_CJK_NEGATORS}](?:太|很|是很|怎么|怎麼)?(?:" + "|".join(map(re.escape, _CJK_POSITIVE)) + ")"
+)
+_EMOJI_POSITIVE_RE = re.compile(f"[{_EMOJI_POSITIVE}]")
+_EMOJI_NEGATIVE_RE = re.compile(f"[{_EMOJI_NEGATIVE}]")
+_LATIN_WORD_RE = re.compile(r"[a-z']+")
+
+
+def comment_sentiment(text: str) -> str:
+    """Lexicon polarity of one comment: positive | neutral | negative.
+
+    EN: Counts positive/negative cue words (zh/ja/ko substrings, English words, emoji).
+        A negator right before a positive cue flips it ("不喜欢", "not good").
+    中文：统计正/负面情感词（中日韩子串、英文单词、表情符号），否定词紧跟正面词时记为负面
+          （如“不喜欢”“not good”）。
+    """
+
+    text = text or ""
+    score = len(_CJK_POSITIVE_RE.findall(text)) - len(_CJK_NEGATIVE_RE.findall(text))
+    # EN: A negated cue was counted +1 above; -2 turns it into -1.
+    # 中文：被否定的正面词上面已记 +1，这里减 2 变为 -1。
+    score -= 2 * len(_CJK_NEGATED_POSITIVE_RE.findall(text))
+    score += len(_EMOJI_POSITIVE_RE.findall(text)) - len(_EMOJI_NEGATIVE_RE.findall(text))
+
+    negate_left = 0
+    for word in _LATIN_WORD_RE.findall(text.lower()):
+        if word in _LATIN_NEGATORS:
+            negate_left = 3
+            continue
+        polarity = (word in _LATIN_POSITIVE) - (word in _LATIN_NEGATIVE)
+        if polarity:
+            score += -polarity if negate_left else polarity
+        negate_left = max(0, negate_left - 1)
+
+    if score > 0:
+        return "positive"
+    if score < 0:
+        return "negative"
+    return "neutral"
+
+
+def round_shares(counts: Dict[str, float], keys: Sequence[str]) -> Dict[str, float]:
+    """Shares rounded to 2 decimals that sum to exactly 1 (largest remainder)."""
+
+    total = sum(counts.get(k, 0) for k in keys)
+    if total <= 0:
+        return {k: 0.0 for k in keys}
+    exact = {k: counts.get(k, 0) * 100 / total for k in keys}
+    cents = {k: int(math.floor(v)) for k, v in exact.items()}
+    for k in sorted(keys, key=lambda k: exact[k] - cents[k], reverse=True)[: 100 - sum(cents.values())]:
+        cents[k] += 1
+    return {k: cents[k] / 100 for k in keys}
+
+
+def local_stats(texts: Iterable[str]) -> Dict[str, Any]:
+    """Per-comment language and sentiment, aggregated into the portrait's statistical fields."""
+
+    languages = {k: 0 for k in LANGUAGES}
+    sentiments = {k: 0 for k in SENTIMENTS}
+    for text in texts:
+        languages[detect_language(text)] += 1
+        sentiments[comment_sentiment(text)] += 1
+    return {
+        "comments": sum(languages.values()),
+        "language_distribution": round_shares(languages, LANGUAGES),
+        "sentiment": round_shares(sentiments, SENTIMENTS),
+    }
+
+
+def merge_stats(previous: Dict[str, Any], previous_count: int, stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Statistical fields over old + new comments from the previous portrait and `local_stats` of the new ones.
+
+    EN: Each share is weighted by its comment count (previous shares x previous_count +
+        new shares x new count), so the old comments never need to be re-read.
+    中文：按评论数加权合并（旧占比 x 旧评论数 + 新占比 x 新评论数），无需重新读取旧评论。
+    """
+
+    new_count = int(stats["comments"])
+    merged: Dict[str, Any] = {"comments": int(previous_count) + new_count}
+    for name, keys in (("language_distribution", LANGUAGES), ("sentiment", SENTIMENTS)):
+        old = previous.get(name)
+        old = old if isinstance(old, dict) else {}
+        counts = {
+            k: (float(old[k]) if isinstance(old.get(k), (int, float)) else 0.0) * int(previous_count)
+            + stats[name][k] * new_count
+            for k in keys
+        }
+        merged[name] = round_shares(counts, keys)
+    return merged
+
+
+def _summary(stats: Dict[str, Any], language: str) -> str:
+    n = stats["comments"]
+    langs = stats["language_distribution"]
+    sent = stats["sentiment"]
+    top_lang = max(LANGUAGES, key=lambda k: langs[k])
+    top_sent = max(SENTIMENTS, key=lambda k: sent[k])
+    if language == "zh":
+        lang_names = {"zh": "中文", "ja": "日文", "ko": "韩文", "en": "英文", "other": "其他语言"}
+        sent_names = {"positive": "正面", "neutral": "中性", "negative": "负面"}
+        return (
+            f"基于 {n} 条评论的本地统计画像（未调用 AI）：评论以{lang_names[top_lang]}为主"
+            f"（{langs[top_lang]:.0%}），整体情感以{sent_names[top_sent]}为主"
+            f"（正面 {sent['positive']:.0%} / 中性 {sent['neutral']:.0%} / 负面 {sent['negative']:.0%}）。"
+        )
+    lang_names = {"zh": "Chinese", "ja": "Japanese", "ko": "Korean", "en": "English", "other": "other languages"}
+    return (
+        f"Local statistical portrait of {n} comments (no AI call): mostly {lang_names[top_lang]} "
+        f"({langs[top_lang]:.0%}), overall {top_sent} "
+        f"(positive {sent['positive']:.0%} / neutral {sent['neutral']:.0%} / negative {sent['negative']:.0%})."
+    )
+
+
+def build_local_portrait(
+    comments: List[Dict[str, Any]],
+    *,
+    language: str = "zh",
+    stats: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Portrait with the prompt's output structure, computed without any LLM call.
+
+    EN: Statistical fields are exact; text fields that need a model (tags, insights) stay
+        empty and `confidence` is kept low to mark the portrait as statistics only.
+    中文：统计字段为精确值；需要模型理解的文本字段（tags、audience_insights）留空，
+          `confidence` 取较低值以表明这是纯统计画像。
+    """
+
+    if stats is None:
+        stats = local_stats(str(c.get("text") or "") for c in comments)
+    return {
+        "summary": _summary(stats, language),
+        "tags": [],
+        "language_distribution": stats["language_distribution"],
+        "sentiment": stats["sentiment"],
+        "topics": [],
+        "audience_insights": {"interests": [], "values": [], "content_preferences": []},
+        "confidence": round(min(0.5, 0.1 + 0.1 * math.log10(1 + stats["comments"])), 2),
+    }
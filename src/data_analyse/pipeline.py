@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import os
+import sqlite3
 import sys
 from pathlib import Path
 from typing import Any, Dict, List, Literal, Optional, Tuple
@@ -30,12 +31,11 @@ from src.data_analyse.collect_youtube_comments import (  # noqa: E402
     fetch_video_metadata,
 )
 from src.database.sqlite import (  # noqa: E402
-    connect,
-    init_schema,
     insert_collection_run,
     insert_raw_thread,
     iter_clean_comments,
 )
+from src.database.writer import read_connection, run_write  # noqa: E402
 
 OrderInput = Literal["hot", "time"]
 
@@ -96,9 +96,7 @@ def collect_raw_to_db(
         retry_interval=max(0, int(retry_interval)),
     )
 
-    conn = connect(db_path(settings))
-    try:
-        init_schema(conn)
+    def _store(conn: sqlite3.Connection) -> int:
         run_id = insert_collection_run(
             conn,
             video_id=video_id,
@@ -111,9 +109,11 @@ def collect_raw_to_db(
         )
         for item in items:
             insert_raw_thread(conn, run_id=run_id, video_id=video_id, item=item)
-        conn.commit()
-    finally:
-        conn.close()
+        return run_id
+
+    # EN: All writes go through the single writer thread (see src/database/writer.py).
+    # 中文：所有写操作经由单写线程串行执行（见 src/database/writer.py）。
+    run_id = run_write(db_path(settings), _store)
 
     return run_id, video_id, len(items)
 
@@ -128,14 +128,21 @@ def clean_run_to_db(*, run_id: int, settings: Optional[Dict[str, Any]] = None) -
     """
 
     from src.data_analyse.clean_data import _extract_top_level, _normalize_text  # noqa: E402
-    from src.database.sqlite import iter_raw_threads, insert_clean_comment  # noqa: E402
+    from src.database.sqlite import (  # noqa: E402
+        get_run_archive_path,
+        insert_clean_comment,
+        iter_raw_threads,
+    )
 
     load_dotenv()
     settings = settings or load_settings()
 
-    conn = connect(db_path(settings))
-    try:
-        init_schema(conn)
+    def _clean(conn: sqlite3.Connection) -> int:
+        if get_run_archive_path(conn, run_id) is not None:
+            raise ValueError(
+                f"run_id={run_id} is archived; restore it first "
+                f"(python -m src.database.archive --restore {run_id})"
+            )
         inserted_or_ignored = 0
         for row in iter_raw_threads(conn, run_id=run_id):
             raw_thread_id = int(row["id"])
@@ -165,11 +172,9 @@ def clean_run_to_db(*, run_id: int, settings: Optional[Dict[str, Any]] = None) -
                 text_original=text_original,
             )
             inserted_or_ignored += 1
-
-        conn.commit()
         return inserted_or_ignored
-    finally:
-        conn.close()
+
+    return run_write(db_path(settings), _clean)
 
 
 def fetch_clean_result(*, run_id: int, settings: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
@@ -182,9 +187,8 @@ def fetch_clean_result(*, run_id: int, settings: Optional[Dict[str, Any]] = None
     load_dotenv()
     settings = settings or load_settings()
 
-    conn = connect(db_path(settings))
+    conn = read_connection(db_path(settings))
     try:
-        init_schema(conn)
         rows = list(iter_clean_comments(conn, run_id=run_id))
         return [
             {
@@ -2,80 +2,669 @@ from __future__ import annotations
 
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
 
-from dotenv import load_dotenv
-
-from src.ai.deepseek_client import chat_completions, extract_message_content, load_ai_config_from_env
-from src.config import db_path, default_ai_prompt_filename, load_settings
+from src.ai.accounting import usage_tokens
+from src.ai.deepseek_client import extract_message_content
+from src.ai.input_encoding import (
+    comment_tokens,
+    encode_input,
+    encoding_report,
+    encoding_system_note,
+    input_encoding_options,
+)
+from src.ai.json_repair import try_parse_json
+from src.ai.partial_json import ProgressiveJsonParser
+from src.ai.prompts import get_prompt_registry
+from src.ai.providers import load_ai_config
+from src.ai.routing import apply_route, select_route
+from src.ai.rate_limit import get_rate_limiter
+from src.ai.response_cache import cached_chat_completions
+from src.ai.tokens import estimate_tokens, split_by_token_budget
+from src.config import (
+    ai_accounting,
+    ai_batch,
+    ai_cache,
+    ai_chunking,
+    ai_json_repair,
+    ai_language,
+    ai_local,
+    ai_prefix_cache,
+    ai_routing,
+    ai_sampling,
+    ai_sections,
+    ai_topics,
+    db_path,
+    ensure_env_loaded,
+    load_settings,
+)
+from src.data_analyse.local_portrait import (
+    LOCAL_MODEL,
+    LOCAL_PROVIDER,
+    STATS_FIELDS,
+    build_local_portrait,
+    local_stats,
+    merge_stats,
+)
+from src.data_analyse.sampling import sample_comments
+from src.data_analyse.topics import portrait_topics, topics_from_settings, topics_hint
 from src.database.sqlite import (
-    connect,
+    clean_comment_ids,
+    find_base_portrait_run,
     get_ai_portrait,
-    init_schema,
     iter_clean_comments,
     upsert_ai_portrait,
 )
+from src.database.writer import read_connection, run_write
 
 
-def _load_prompt_file(path: Path) -> Dict[str, Any]:
-    data = json.loads(path.read_text(encoding="utf-8"))
-    if not isinstance(data, dict):
-        raise ValueError("Prompt JSON must be an object")
-    if "system_prompt" not in data or not isinstance(data["system_prompt"], str):
-        raise ValueError("Prompt JSON must include system_prompt (string)")
-    return data
+def resolve_prompt_path(*, settings: Optional[Dict[str, Any]] = None) -> Path:
+    """Resolve prompt JSON path (see `PromptRegistry.resolve_path` for the priority)."""
 
+    ensure_env_loaded()
+    return get_prompt_registry().resolve_path(settings or load_settings())
 
-def _extract_json_text(raw: str) -> str:
-    s = (raw or "").strip()
-    if s.startswith("```"):
-        lines = s.splitlines()
-        if len(lines) >= 3 and lines[-1].strip().startswith("```"):
-            s = "\n".join(lines[1:-1]).strip()
 
-    obj_start = s.find("{")
-    obj_end = s.rfind("}")
-    arr_start = s.find("[")
-    arr_end = s.rfind("]")
-    if obj_start != -1 and obj_end != -1 and obj_end > obj_start:
-        return s[obj_start : obj_end + 1]
-    if arr_start != -1 and arr_end != -1 and arr_end > arr_start:
-        return s[arr_start : arr_end + 1]
-    return s
+# EN: One text per task; `{where}` says where the analyst prompt is ("above" when the note
+#     follows it, "below" when it precedes it).
+# 中文：每种任务只有一份说明文本；`{where}` 指明分析师提示词的位置（说明在其后为 "above"，在其前为 "below"）。
+_REDUCE_TASK_NOTE = (
+    "Task for this request (replaces the input description {where}): merge partial audience "
+    "portraits into one final portrait. The user message is ONE JSON object: {{\"video_id\": string, "
+    "\"total_comments\": number, \"partials\": [{{\"chunk\": number, \"comment_count\": number, "
+    "\"portrait\": object}}]}}. Each partial was produced from a disjoint slice of the same video's "
+    "comments by an analyst following the instructions {where}. Merge them: weight distributions and "
+    "topic weights by comment_count, deduplicate tags/topics/insights, keep the most representative "
+    "items, and write a single coherent summary. Output STRICT JSON ONLY, using exactly the output "
+    "schema, language and constraints of the instructions {where}."
+)
 
 
-def resolve_prompt_path(*, settings: Optional[Dict[str, Any]] = None) -> Path:
-    """Resolve prompt JSON path.
+_INCREMENTAL_TASK_NOTE = (
+    "Task for this request: update an existing audience portrait with newly collected comments. "
+    "The user message starts with ONE JSON object: {{\"video_id\": string, \"previous_comment_count\": "
+    "number, \"previous_portrait\": object}}, followed by the NEW comments only (comments already "
+    "covered by the previous portrait are not repeated), in the input format described {where}. Revise "
+    "the previous portrait: keep what the new comments do not contradict, add tags/topics/insights they "
+    "support, and re-weight distributions and topic weights as if previous_comment_count old comments "
+    "and the new ones were analyzed together. Output STRICT JSON ONLY, using exactly the output schema, "
+    "language and constraints of the instructions {where}."
+)
+
+
+# EN: Prefix-cache layout appends the note after the analyst prompt, so every portrait request
+#     (single, map, reduce, incremental) starts with the identical prefix; without it the
+#     note is put first.
+# 中文：前缀缓存布局把说明附在分析师提示词之后，使所有画像请求（单次、map、reduce、增量）都以完全相同的
+#       前缀开头；关闭时说明放在最前面。
+def _with_task_note(system_prompt: str, note: str, *, stable_prefix: bool) -> str:
+    if stable_prefix:
+        return system_prompt + "\n\n" + note.format(where="above")
+    return note.format(where="below") + "\n\n" + system_prompt
+
+
+# EN: Appended to the end of the user message, so all sections share the request prefix.
+# 中文：附在用户消息末尾，使各分组请求共享相同的前缀。
+_SECTION_NOTE = (
+    "\n\nSection request: output ONLY one JSON object with exactly these top-level keys of the output "
+    "schema: {keys}. Follow the schema, language and constraints above for them and omit every other key."
+)
+
+
+_FIX_JSON_SYSTEM_PROMPT = (
+    "The user message is a JSON object written by another model that is malformed. "
+    "Return it as ONE valid JSON object: keep every key and value that is present and fix the syntax "
+    "(quotes, commas, brackets, escapes). Do not add keys, content or commentary."
+)
+
+
+def _call_llm(
+    ai_cfg: Dict[str, Any],
+    system_prompt: str,
+    user_content: str,
+    *,
+    cache: Optional[Dict[str, Any]] = None,
+    calls: Optional[List[Dict[str, Any]]] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    max_tokens: Optional[int] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    purpose: str = "single",
+    meta: Optional[Dict[str, Any]] = None,
+) -> str:
+    """One chat completion, through the response cache when `cache` is given.
 
-    Priority:
-    1) .env AI_PROMPT (explicit override)
-    2) settings.json (ai.language + ai.prompt_template)
-    3) legacy fallback
+    EN: `cache` is `ai_cache(settings)` plus `db_file` and `refresh`; one entry per call (purpose, response
+        cache hit, finish_reason, token usage incl. prompt_cache_hit_tokens) is appended to `calls`
+        (list.append is safe across the map threads). With `on_delta` the reply is streamed.
+        When `ai_cfg` has an `account`, the call is logged to ai_calls under `purpose`
+        (single | map | reduce | section | fix). `meta` receives the reply's `finish_reason`.
+    中文：`cache` 为 `ai_cache(settings)` 加上 `db_file` 与 `refresh`；每次调用向 `calls` 追加一条记录（用途、是否命中
+          响应缓存、finish_reason、token 用量，含 prompt_cache_hit_tokens）。传入 `on_delta` 时以流式方式接收回复。
+          `ai_cfg` 含 `account` 时，调用按 `purpose`（single | map | reduce | section | fix）记录到 ai_calls。
+          `meta` 写入回复的 `finish_reason`。
     """
 
-    load_dotenv()
-    settings = settings or load_settings()
+    account = ai_cfg.get("account")
+
+    resp_json, hit = cached_chat_completions(
+        db_file=cache["db_file"] if cache else None,
+        cache=cache or {"enabled": False},
+        api_url=ai_cfg["api_url"],
+        api_key=ai_cfg["api_key"],
+        model=ai_cfg["model"],
+        system_prompt=system_prompt,
+        user_content=user_content,
+        temperature=float(ai_cfg["temperature"]),
+        max_tokens=int(max_tokens or ai_cfg["max_tokens"]),
+        response_format=response_format,
+        on_delta=on_delta,
+        rate_limiter=ai_cfg.get("rate_limiter"),
+        pool=ai_cfg.get("pool"),
+        account={**account, "purpose": purpose} if account is not None else None,
+        expect_json=True,
+        refresh=bool(cache and cache.get("refresh")),
+    )
+    choices = resp_json.get("choices") or []
+    finish_reason = choices[0].get("finish_reason") if choices and isinstance(choices[0], dict) else None
+    if meta is not None:
+        meta["finish_reason"] = finish_reason
+    if calls is not None:
+        # EN: A response-cache hit sent nothing, so it used no tokens.
+        # 中文：命中响应缓存时没有发出请求，不消耗 token。
+        tokens = usage_tokens(None if hit else resp_json.get("usage"))
+        calls.append(
+            {
+                "purpose": purpose,
+                "response_cache": hit,
+                "finish_reason": finish_reason,
+                "prompt_tokens": tokens["prompt_tokens"],
+                "prompt_cache_hit_tokens": tokens["cache_hit_tokens"],
+                "completion_tokens": tokens["completion_tokens"],
+            }
+        )
+    return extract_message_content(resp_json)
+
+
+def _calls_report(calls: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """generation fields for the calls made: counts, and token usage per call and in total."""
+
+    def _sum(key: str) -> int:
+        return sum(int(c[key] or 0) for c in calls)
+
+    prompt_tokens = _sum("prompt_tokens")
+    hit_tokens = _sum("prompt_cache_hit_tokens")
+    return {
+        "llm_calls": len(calls),
+        "llm_cache_hits": sum(1 for c in calls if c["response_cache"]),
+        "llm_usage": {
+            "prompt_tokens": prompt_tokens,
+            "prompt_cache_hit_tokens": hit_tokens,
+            "prompt_cache_hit_ratio": round(hit_tokens / prompt_tokens, 4) if prompt_tokens else None,
+            "completion_tokens": _sum("completion_tokens"),
+            "calls": calls,
+        },
+    }
+
+
+def _incremental_base(
+    conn: Any,
+    run_id: int,
+    video_id: str,
+    comments: List[Dict[str, Any]],
+    base_run_id: Optional[int],
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Previous portrait to update and the comments it has not seen.
+
+    EN: The base is `base_run_id`, or else the latest earlier run of the same video with a
+        parsed portrait. New comments are those whose comment_id is not in the base run.
+        Returns (base, None), or (None, reason) when a full generation is needed instead.
+    中文：基准为 `base_run_id`，未指定时取同一视频此前最近一次解析成功的画像；新评论指 comment_id
+          不在基准 run 中的评论。返回 (基准信息, None)，或在需要完整生成时返回 (None, 原因)。
+    """
+
+    if base_run_id is None:
+        base_run_id = find_base_portrait_run(conn, run_id)
+        if base_run_id is None:
+            return None, "no earlier portrait of this video"
+    base_run_id = int(base_run_id)
+    if base_run_id == int(run_id):
+        return None, "base_run_id is this run"
+
+    row = get_ai_portrait(conn, base_run_id)
+    if row is None or not row["parse_ok"] or not row["portrait_json"]:
+        return None, f"run {base_run_id} has no parsed portrait"
+    base_video = conn.execute(
+        "SELECT video_id FROM collection_runs WHERE id = ? LIMIT 1", (base_run_id,)
+    ).fetchone()
+    if base_video is None or str(base_video["video_id"] or "") != video_id:
+        return None, f"run {base_run_id} is not the same video"
+    try:
+        portrait = json.loads(row["portrait_json"])
+    except Exception:  # noqa: BLE001
+        portrait = None
+    if not isinstance(portrait, dict):
+        return None, f"run {base_run_id} portrait is not a JSON object"
+
+    seen = clean_comment_ids(conn, base_run_id)
+    generation = json.loads(row["generation_json"]) if row["generation_json"] else {}
+    return {
+        "run_id": base_run_id,
+        "row": row,
+        "portrait": portrait,
+        # EN: A chain of updates keeps counting; a full generation covered its whole run.
+        # 中文：连续增量更新时累计计数；完整生成覆盖其整个 run。
+        "covered": int(generation.get("covered_comments") or len(seen)),
+        "comments": [c for c in comments if str(c["comment_id"]) not in seen],
+    }, None
 
-    project_root = Path(__file__).resolve().parents[2]
 
-    env_value = (os.getenv("AI_PROMPT") or "").strip().strip('"')
-    if env_value:
-        p = Path(env_value)
-        if not p.is_absolute():
-            p = project_root / p
-        if p.exists():
-            return p
-        if p.suffix.lower() == ".txt":
-            candidate = p.with_suffix(".json")
-            if candidate.exists():
-                return candidate
+def _incremental_input(video_id: str, base: Dict[str, Any], encoded_new: str) -> str:
+    head = json.dumps(
+        {
+            "video_id": video_id,
+            "previous_comment_count": base["covered"],
+            "previous_portrait": base["portrait"],
+        },
+        ensure_ascii=False,
+    )
+    return head + ("\n\nNew comments:\n" + encoded_new if encoded_new else "")
+
+
+def _prepare_input(
+    video_id: str,
+    comments: List[Dict[str, Any]],
+    prompt_obj: Dict[str, Any],
+    base: Optional[Dict[str, Any]],
+    *,
+    stable_prefix: bool = False,
+) -> Dict[str, Any]:
+    """Encoded user content, its token estimate and the system prompt for one prompt JSON.
+
+    With `stable_prefix` (ai.prefix_cache) the incremental instructions follow the analyst
+    prompt instead of preceding it.
+    """
+
+    # EN: The prompt JSON picks the input encoding (verbose by default, or compact).
+    # 中文：由提示词 JSON 选择输入编码（默认 verbose，可选 compact）。
+    encoding = input_encoding_options(prompt_obj)
+    input_json = encode_input(video_id, comments, encoding)
+    encoding_stats = encoding_report(video_id, comments, input_json, encoding)
+    estimated_tokens = int(encoding_stats["tokens_est"])
+    system_prompt = str(prompt_obj["system_prompt"]) + encoding_system_note(encoding)
+    if base is not None:
+        input_json = _incremental_input(video_id, base, input_json)
+        estimated_tokens = estimate_tokens(input_json)
+        system_prompt = _with_task_note(system_prompt, _INCREMENTAL_TASK_NOTE, stable_prefix=stable_prefix)
+    return {
+        "encoding": encoding,
+        "input_json": input_json,
+        "encoding_stats": encoding_stats,
+        "estimated_tokens": estimated_tokens,
+        "system_prompt": system_prompt,
+    }
+
+
+def _parse_portrait(raw_content: str) -> Tuple[Optional[Any], Optional[str]]:
+    """Returns (parsed JSON, None) or (None, error message); common defects are repaired locally."""
+
+    parsed, _fixes, error = try_parse_json(raw_content)
+    if error is not None:
+        return None, f"Portrait JSON parse failed: {error}"
+    return parsed, None
+
+
+def _check_reply(
+    raw_content: str, *, keys: Sequence[str] = (), cut_off: bool = False
+) -> Tuple[Optional[Any], List[str], Optional[str]]:
+    """`try_parse_json` for a final reply: (parsed or None, fixes, error or None).
+
+    EN: A reply cut off by max_tokens (`cut_off`, or a local repair that had to close it) is an
+        error: closing it would store a portrait with missing fields or a half-written value.
+        With `keys`, the reply must be an object holding every one of those top-level keys.
+    中文：被 max_tokens 截断的回复（`cut_off`，或本地修复时需要补全）视为错误：补全后的画像会缺字段或
+          含写了一半的值。传入 `keys` 时，回复必须是包含这些顶层字段的对象。
+    """
+
+    if cut_off:
+        return None, [], "reply cut off at max_tokens (finish_reason: length)"
+    parsed, fixes, error = try_parse_json(raw_content)
+    if error is not None:
+        return None, fixes, error
+    if "truncated" in fixes:
+        return None, fixes, "reply is truncated"
+    if keys:
+        # EN: Well-formed but off-schema: the parsed value is returned with the error.
+        # 中文：语法正确但不符合结构：与错误一起返回解析结果。
+        if not isinstance(parsed, dict):
+            return parsed, fixes, "reply is not a JSON object"
+        missing = [k for k in keys if k not in parsed]
+        if missing:
+            return parsed, fixes, "missing keys: " + ", ".join(missing)
+    return parsed, fixes, None
+
+
+def _parse_or_fix(
+    ai_cfg: Dict[str, Any],
+    raw_content: str,
+    *,
+    fix_call: bool,
+    keys: Sequence[str] = (),
+    finish_reason: Optional[str] = None,
+    cache: Optional[Dict[str, Any]] = None,
+    calls: Optional[List[Dict[str, Any]]] = None,
+) -> Tuple[Optional[Any], Optional[str], Optional[Dict[str, Any]]]:
+    """Parse the final reply; if local repair fails, ask the model once to fix the JSON.
+
+    EN: The fix call sends only the broken reply, with `response_format: json_object` and
+        a max_tokens sized to that reply, which is much cheaper than regenerating the
+        portrait from the comments. A truncated reply (`finish_reason` length) or one missing
+        any of `keys` (the schema's top-level keys) is not sent: the fix call cannot restore
+        content that was never written. Returns (parsed, error, repair info or None).
+    中文：本地修复失败时，只把出错的回复发给模型修正一次（`response_format: json_object`，
+          max_tokens 按该回复长度设定），远比基于评论重新生成画像便宜。被截断（`finish_reason` 为 length）
+          或缺少 `keys`（输出结构的顶层字段）的回复不发修正调用：修正无法补回从未生成的内容。
+          返回 (解析结果, 错误, 修复信息或 None)。
+    """
+
+    parsed, fixes, error = _check_reply(raw_content, keys=keys, cut_off=finish_reason == "length")
+    if error is None:
+        return parsed, None, ({"fixes": fixes} if fixes else None)
+    error = f"Portrait JSON parse failed: {error}"
+    if not fix_call or finish_reason == "length" or parsed is not None or "truncated" in fixes:
+        return None, error, ({"fixes": fixes} if fixes else None)
+
+    info: Dict[str, Any] = {"fixes": [], "fix_call": True, "fix_ok": False}
+    meta: Dict[str, Any] = {}
+    try:
+        fixed_raw = _call_llm(
+            ai_cfg,
+            _FIX_JSON_SYSTEM_PROMPT,
+            raw_content,
+            cache=cache,
+            calls=calls,
+            max_tokens=min(int(ai_cfg["max_tokens"]), int(estimate_tokens(raw_content) * 1.2) + 256),
+            response_format={"type": "json_object"},
+            purpose="fix",
+            meta=meta,
+        )
+    except Exception as e:  # noqa: BLE001
+        info["fix_error"] = str(e)
+        return None, error, info
+    parsed, fixes, fix_error = _check_reply(fixed_raw, keys=keys, cut_off=meta.get("finish_reason") == "length")
+    if fix_error is not None:
+        info["fix_error"] = fix_error
+        return None, error, info
+    info.update({"fixes": fixes, "fix_ok": True})
+    return parsed, None, info
+
+
+def _generate_chunked(
+    *,
+    ai_cfg: Dict[str, Any],
+    prompt_obj: Dict[str, Any],
+    video_id: str,
+    comments: List[Dict[str, Any]],
+    chunking: Dict[str, Any],
+    encoding: Dict[str, Any],
+    cache: Optional[Dict[str, Any]] = None,
+    calls: Optional[List[Dict[str, Any]]] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    hint: str = "",
+    base: Optional[Dict[str, Any]] = None,
+    stable_prefix: bool = False,
+) -> Tuple[str, Dict[str, Any]]:
+    """Map-reduce: partial portraits per token-budgeted chunk (concurrently), then one merge call.
+
+    EN: Chunks whose call or JSON parse fails are skipped as long as one chunk succeeds.
+    中文：按 token 预算切块并发生成局部画像，再用一次 reduce 调用合并为最终结构；
+          只要有一块成功，失败的块会被跳过并记录。
+
+    `on_event` receives one `chunk` event per finished map call; `on_delta` streams the
+    reduce call. `hint` (local topic clusters) is appended to the reduce input. With `base`
+    (incremental update) the previous portrait joins the reduce as one more partial. With
+    `stable_prefix` the reduce instructions follow the analyst prompt, so the reduce call
+    shares its prefix with the map calls.
+
+    Returns (raw content of the reduce call, generation info).
+    """
 
-    p = project_root / "AI_PROMPT" / default_ai_prompt_filename(settings)
-    if p.exists():
-        return p
+    chunks = split_by_token_budget(comments, int(chunking["chunk_tokens"]))
+    system_prompt = str(prompt_obj["system_prompt"])
+    map_prompt = system_prompt + encoding_system_note(encoding)
+
+    done: List[int] = []
+
+    def _map(chunk: List[Dict[str, Any]]) -> Tuple[Optional[Any], Optional[str]]:
+        try:
+            raw = _call_llm(
+                ai_cfg,
+                map_prompt,
+                encode_input(video_id, chunk, encoding),
+                cache=cache,
+                calls=calls,
+                purpose="map",
+            )
+            result = _parse_portrait(raw)
+        except Exception as e:  # noqa: BLE001
+            result = None, str(e)
+        done.append(1)
+        if on_event is not None:
+            on_event({"event": "chunk", "done": len(done), "total": len(chunks), "ok": result[1] is None})
+        return result
 
-    return project_root / "AI_PROMPT" / "AI_PROMPT_Default.json"
+    workers = max(1, min(int(chunking["max_workers"]), len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="portrait-map") as pool:
+        results = list(pool.map(_map, chunks))
+
+    partials = [
+        {"chunk": i, "comment_count": len(chunk), "portrait": parsed}
+        for i, (chunk, (parsed, _err)) in enumerate(zip(chunks, results))
+        if parsed is not None
+    ]
+    errors = [f"chunk {i}: {err}" for i, (_p, err) in enumerate(results) if err]
+    if not partials:
+        raise RuntimeError("All portrait chunks failed: " + "; ".join(errors)[:800])
+    total_comments = len(comments)
+    if base is not None:
+        # EN: chunk -1 is the previous portrait, weighted by the comments it already covers.
+        # 中文：chunk -1 为此前的画像，按其已覆盖的评论数加权。
+        partials.insert(0, {"chunk": -1, "comment_count": base["covered"], "portrait": base["portrait"]})
+        total_comments += base["covered"]
+
+    if prompt_obj.get("reduce_system_prompt"):
+        reduce_prompt = str(prompt_obj["reduce_system_prompt"])
+    else:
+        reduce_prompt = _with_task_note(system_prompt, _REDUCE_TASK_NOTE, stable_prefix=stable_prefix)
+    reduce_meta: Dict[str, Any] = {}
+    raw_content = _call_llm(
+        ai_cfg,
+        reduce_prompt,
+        json.dumps(
+            {"video_id": video_id, "total_comments": total_comments, "partials": partials},
+            ensure_ascii=False,
+        )
+        + hint,
+        cache=cache,
+        calls=calls,
+        on_delta=on_delta,
+        purpose="reduce",
+        meta=reduce_meta,
+    )
+    generation = {
+        "mode": "chunked",
+        "finish_reason": reduce_meta.get("finish_reason"),
+        "chunks": len(chunks),
+        "chunk_tokens": int(chunking["chunk_tokens"]),
+        "failed_chunks": len(chunks) - len(partials),
+        "chunk_errors": errors[:10],
+    }
+    return raw_content, generation
+
+
+def _generate_sectioned(
+    *,
+    ai_cfg: Dict[str, Any],
+    system_prompt: str,
+    user_content: str,
+    sections: Dict[str, Any],
+    fix_call: bool,
+    skip_keys: Optional[Set[str]] = None,
+    cache: Optional[Dict[str, Any]] = None,
+    calls: Optional[List[Dict[str, Any]]] = None,
+    relay: Optional[Callable[[], Callable[[str], None]]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Sectioned mode: one call per group of top-level keys, all concurrently on the same input.
+
+    EN: Groups whose keys are all in `skip_keys` (filled locally) are not requested; their
+        keys keep their schema position and are filled in by `_store_portrait`. `relay`
+        makes one streaming callback per section (each with its own JSON parser). Each
+        reply goes through local repair and the optional fix call; any section that still
+        fails fails the generation, since the schema would be incomplete.
+    中文：所有字段都由本地统计填充（`skip_keys`）的分组不发请求，其字段保留结构中的位置，由
+          `_store_portrait` 填入。`relay` 为每个分组生成独立的流式回调（各自的 JSON 解析器）。
+          每段回复都经过本地修复与可选的修正调用；仍有分组失败时整体失败，因为结构不完整。
+
+    Returns (raw content = the assembled portrait JSON, generation info).
+    """
+
+    skip_keys = skip_keys or set()
+    groups = [g for g in sections["groups"] if not set(g["keys"]) <= skip_keys]
+
+    def _section(group: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        t0 = time.perf_counter()
+        info: Dict[str, Any] = {"name": group["name"], "keys": group["keys"]}
+        note = _SECTION_NOTE.format(keys=", ".join(json.dumps(k) for k in group["keys"]))
+        meta: Dict[str, Any] = {}
+        try:
+            raw = _call_llm(
+                ai_cfg,
+                system_prompt,
+                user_content + note,
+                cache=cache,
+                calls=calls,
+                on_delta=relay() if relay is not None else None,
+                purpose="section",
+                meta=meta,
+            )
+            parsed, error, repair = _parse_or_fix(
+                ai_cfg,
+                raw,
+                fix_call=fix_call,
+                keys=group["keys"],
+                finish_reason=meta.get("finish_reason"),
+                cache=cache,
+                calls=calls,
+            )
+        except Exception as e:  # noqa: BLE001
+            parsed, error, repair = None, str(e), None
+        if repair is not None:
+            info["json_repair"] = repair
+        info.update(ok=error is None, elapsed_ms=round((time.perf_counter() - t0) * 1000, 1))
+        if error is not None:
+            info["error"] = error[:300]
+            return None, info
+        return {k: parsed[k] for k in group["keys"]}, info
+
+    t0 = time.perf_counter()
+    workers = max(1, min(int(sections["max_workers"]), len(groups)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="portrait-section") as pool:
+        results = list(pool.map(_section, groups))
+    wall_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+    infos = [info for _values, info in results]
+    failed = [f"{info['name']}: {info['error']}" for info in infos if not info["ok"]]
+    if failed:
+        raise RuntimeError("Portrait sections failed: " + "; ".join(failed)[:800])
+
+    values: Dict[str, Any] = {}
+    for part, _info in results:
+        values.update(part or {})
+    portrait: Dict[str, Any] = {}
+    for group in sections["groups"]:
+        for key in group["keys"]:
+            # EN: Skipped (locally filled) keys hold their place; the local value replaces None.
+            # 中文：跳过的（本地填充）字段先占位，随后由本地统计值替换 None。
+            portrait[key] = values.get(key)
+    generation = {
+        "mode": "sectioned",
+        "sections": infos,
+        "skipped_sections": [g["name"] for g in sections["groups"] if g not in groups],
+        "sections_wall_ms": wall_ms,
+        "sections_sum_ms": round(sum(info["elapsed_ms"] for info in infos), 1),
+    }
+    return json.dumps(portrait, ensure_ascii=False), generation
+
+
+def _store_portrait(
+    *,
+    db_file: Path,
+    run_id: int,
+    video_id: str,
+    provider: str,
+    model: str,
+    prompt_name: str,
+    prompt_version: int,
+    input_json: str,
+    raw_content: str,
+    parsed: Optional[Any],
+    error: Optional[str],
+    generation: Dict[str, Any],
+    prefilled: Optional[Dict[str, Any]] = None,
+    base_run_id: Optional[int] = None,
+    route: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Upsert the parsed reply on the writer thread and build the result dict."""
+
+    portrait_json: Optional[str] = None
+    portrait_obj: Optional[Dict[str, Any]] = None
+    parse_ok = error is None
+    if parse_ok:
+        if prefilled and isinstance(parsed, dict):
+            parsed.update(prefilled)
+        portrait_json = json.dumps(parsed, ensure_ascii=False)
+        portrait_obj = parsed if isinstance(parsed, dict) else None
+
+    input_hash = run_write(
+        db_file,
+        lambda wconn: upsert_ai_portrait(
+            wconn,
+            run_id=run_id,
+            provider=provider,
+            model=model,
+            prompt_name=prompt_name,
+            prompt_version=prompt_version,
+            input_json=input_json,
+            portrait_json=portrait_json,
+            portrait_raw=raw_content,
+            parse_ok=parse_ok,
+            error=error,
+            generation=generation,
+            base_run_id=base_run_id,
+            route=route,
+        ),
+    )
+
+    return {
+        "run_id": run_id,
+        "video_id": video_id,
+        "parse_ok": parse_ok,
+        "portrait": portrait_obj,
+        "portrait_raw": raw_content,
+        "error": error,
+        "prompt_name": prompt_name,
+        "prompt_version": prompt_version,
+        "provider": provider,
+        "model": model,
+        "input_hash": input_hash,
+        "generation": generation,
+        "base_run_id": base_run_id,
+        "route": route,
+        "cached": False,
+    }
 
 
 def generate_portrait_for_run(
@@ -83,16 +672,48 @@ def generate_portrait_for_run(
     run_id: int,
     settings: Optional[Dict[str, Any]] = None,
     overwrite: bool = False,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    provider: Optional[str] = None,
+    incremental: bool = False,
+    base_run_id: Optional[int] = None,
+    sectioned: Optional[bool] = None,
 ) -> Dict[str, Any]:
-    """Generate portrait for a run_id, store into SQLite, and return result."""
+    """Generate portrait for a run_id, store into SQLite, and return result.
+
+    EN: `provider` overrides env AI_PROVIDER; `local` builds a statistics-only portrait
+        without calling the LLM (see src/data_analyse/local_portrait.py).
+    中文：`provider` 覆盖环境变量 AI_PROVIDER；`local` 表示不调用 LLM，只生成本地统计画像。
+
+    EN: `incremental` (implied by `base_run_id`) updates an earlier portrait of the same
+        video (`base_run_id`, or the latest one) instead of starting over: the model gets the previous portrait plus only
+        the comments it has not seen, statistical fields are merged locally, and the new row
+        links to its base (ai_portraits.base_run_id). Without a usable base it falls back to
+        a full generation; with no new comments the base portrait is copied without a call.
+    中文：`incremental`（指定 `base_run_id` 时自动开启）基于同一视频此前的画像（`base_run_id`，默认最近一次）增量更新：模型只收到旧画像
+          与其未见过的新评论，统计字段在本地加权合并，新记录通过 ai_portraits.base_run_id 指向基准。
+          没有可用基准时退回完整生成；没有新评论时直接复制基准画像，不调用模型。
 
-    load_dotenv()
+    EN: With `on_event` the final LLM call is streamed and progress is reported as it
+        happens: `start`, `chunk` (map-reduce only) and one `field` event per top-level
+        portrait field as soon as it is complete.
+    中文：传入 `on_event` 时最终的 LLM 调用改为流式，并实时回调进度：`start`、`chunk`（仅分块模式）
+          以及每个顶层画像字段生成完毕时的 `field` 事件。
+
+    EN: `sectioned` (default: settings ai.sections.enabled) generates a single-call run as
+        concurrent per-section calls (see `_generate_sectioned`); chunked runs ignore it.
+    中文：`sectioned`（默认取 settings 的 ai.sections.enabled）把单次请求的 run 拆成按字段分组的并发请求
+          （见 `_generate_sectioned`）；分块模式不受影响。
+    """
+
+    ensure_env_loaded()
     settings = settings or load_settings()
 
-    conn = connect(db_path(settings))
+    # EN: Reads use a read-only connection; the single upsert goes through the writer thread,
+    #     so the (slow) LLM call never holds a write lock.
+    # 中文：读取使用只读连接，唯一的写入（upsert）交给写线程，耗时的 LLM 调用期间不持有写锁。
+    db_file = db_path(settings)
+    conn = read_connection(db_file)
     try:
-        init_schema(conn)
-
         existing = get_ai_portrait(conn, int(run_id))
         if existing is not None and not overwrite:
             portrait_json = existing["portrait_json"]
@@ -122,6 +743,10 @@ def generate_portrait_for_run(
                 "prompt_version": prompt_version,
                 "provider": provider,
                 "model": model,
+                "input_hash": existing["input_hash"],
+                "generation": json.loads(existing["generation_json"]) if existing["generation_json"] else None,
+                "base_run_id": existing["base_run_id"],
+                "route": json.loads(existing["route_json"]) if existing["route_json"] else None,
                 "cached": True,
             }
 
@@ -131,80 +756,336 @@ def generate_portrait_for_run(
 
         video_id = str(rows[0]["video_id"] or "")
 
-        input_obj = {
-            "video_id": video_id,
-            "comments": [
-                {
-                    "comment_id": r["comment_id"],
-                    "author": r["author"],
-                    "published_at": r["published_at"],
-                    "like_count": r["like_count"],
-                    "reply_count": r["reply_count"],
-                    "text": r["text"],
+        comments = [
+            {
+                "comment_id": r["comment_id"],
+                "author": r["author"],
+                "published_at": r["published_at"],
+                "like_count": r["like_count"],
+                "reply_count": r["reply_count"],
+                "text": r["text"],
+            }
+            for r in rows
+        ]
+
+        provider = (provider or os.getenv("AI_PROVIDER", "deepseek")).strip() or "deepseek"
+
+        base: Optional[Dict[str, Any]] = None
+        incremental_info: Optional[Dict[str, Any]] = None
+        if (incremental or base_run_id is not None) and provider != LOCAL_PROVIDER:
+            base, fallback = _incremental_base(conn, int(run_id), video_id, comments, base_run_id)
+            if base is None:
+                incremental_info = {"fallback": fallback}
+            else:
+                incremental_info = {
+                    "base_run_id": base["run_id"],
+                    "previous_comments": base["covered"],
+                    "new_comments": len(base["comments"]),
                 }
-                for r in rows
-            ],
-        }
-        input_json = json.dumps(input_obj, ensure_ascii=False)
-
-        prompt_path = resolve_prompt_path(settings=settings)
-        prompt_obj = _load_prompt_file(prompt_path)
-
-        ai_cfg = load_ai_config_from_env()
-        provider = os.getenv("AI_PROVIDER", "deepseek").strip() or "deepseek"
-
-        resp_json = chat_completions(
-            api_url=ai_cfg["api_url"],
-            api_key=ai_cfg["api_key"],
-            model=ai_cfg["model"],
-            system_prompt=prompt_obj["system_prompt"],
-            user_content=input_json,
-            temperature=float(ai_cfg["temperature"]),
-            max_tokens=int(ai_cfg["max_tokens"]),
+
+        # EN: Local statistics use every comment (not the sample) and take well under a second.
+        #     Incremental updates count only the new comments and merge them into the base shares.
+        # 中文：本地统计基于全部评论（而非抽样），耗时远低于一秒；增量更新只统计新评论并与基准占比合并。
+        local_cfg = ai_local(settings)
+        stats: Optional[Dict[str, Any]] = None
+        if provider == LOCAL_PROVIDER or local_cfg["prefill_stats"] or base is not None:
+            t0 = time.perf_counter()
+            if base is None:
+                stats = local_stats(str(c["text"] or "") for c in comments)
+            else:
+                stats = merge_stats(
+                    base["portrait"],
+                    base["covered"],
+                    local_stats(str(c["text"] or "") for c in base["comments"]),
+                )
+            stats_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+        # EN: Topic clusters fill `topics` for the local provider, or go to the LLM as hints.
+        # 中文：主题聚类结果用于本地引擎的 `topics`，或作为提示附加到 LLM 输入。
+        topics_cfg = ai_topics(settings)
+        extracted: Optional[Dict[str, Any]] = None
+        topics_info: Optional[Dict[str, Any]] = None
+        if topics_cfg["enabled"] and (provider == LOCAL_PROVIDER or topics_cfg["prompt_hints"]):
+            t0 = time.perf_counter()
+            try:
+                extracted = topics_from_settings(comments, topics_cfg)
+                topics_info = {
+                    "topics": len(extracted["topics"]),
+                    "clustered": extracted["clustered"],
+                    "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+                }
+            except RuntimeError as e:
+                topics_info = {"error": str(e)}
+
+        if provider == LOCAL_PROVIDER:
+            portrait = build_local_portrait(comments, language=ai_language(settings), stats=stats)
+            if extracted is not None:
+                portrait["topics"] = portrait_topics(extracted)
+            if on_event is not None:
+                on_event({"event": "start", "run_id": int(run_id), "mode": "local", "comments": len(rows)})
+                for name, value in portrait.items():
+                    on_event({"event": "field", "name": name, "value": value})
+            return _store_portrait(
+                db_file=db_file,
+                run_id=int(run_id),
+                video_id=video_id,
+                provider=LOCAL_PROVIDER,
+                model=LOCAL_MODEL,
+                prompt_name=LOCAL_PROVIDER,
+                prompt_version=1,
+                input_json=encode_input(video_id, comments, {"name": "verbose"}),
+                raw_content=json.dumps(portrait, ensure_ascii=False),
+                parsed=portrait,
+                error=None,
+                generation={
+                    "mode": "local",
+                    "elapsed_ms": stats_ms,
+                    "topics": topics_info,
+                    "covered_comments": len(rows),
+                },
+            )
+
+        if base is not None and not base["comments"]:
+            # EN: Nothing new since the base: reuse its portrait, no LLM call.
+            # 中文：基准之后没有新评论：直接沿用其画像，不调用 LLM。
+            base_row = base["row"]
+            if on_event is not None:
+                on_event({"event": "start", "run_id": int(run_id), "mode": "incremental", "comments": len(rows)})
+                for name, value in base["portrait"].items():
+                    on_event({"event": "field", "name": name, "value": value})
+            return _store_portrait(
+                db_file=db_file,
+                run_id=int(run_id),
+                video_id=video_id,
+                provider=str(base_row["provider"]),
+                model=str(base_row["model"]),
+                prompt_name=base_row["prompt_name"],
+                prompt_version=base_row["prompt_version"],
+                input_json=_incremental_input(video_id, base, ""),
+                raw_content=json.dumps(base["portrait"], ensure_ascii=False),
+                parsed=base["portrait"],
+                error=None,
+                generation={
+                    "mode": "incremental",
+                    "incremental": incremental_info,
+                    "covered_comments": base["covered"],
+                    "llm_calls": 0,
+                },
+                base_run_id=base["run_id"],
+            )
+
+        if base is not None:
+            comments = base["comments"]
+
+        # EN: Deterministic comment order (oldest first) keeps request prefixes stable across
+        #     repeated and re-collected runs; newly collected comments land near the end.
+        # 中文：评论按确定顺序（最早的在前）发送，使重复生成与重新采集的 run 请求前缀保持稳定；
+        #       新采集的评论落在末尾附近。
+        stable_prefix = ai_prefix_cache(settings)["enabled"]
+        if stable_prefix:
+            comments = sorted(
+                comments, key=lambda c: (str(c["published_at"] or ""), str(c["comment_id"] or ""))
+            )
+
+        # EN: Parsed prompts are cached by the registry; no file is read here.
+        # 中文：提示词由注册表缓存，此处不读文件。
+        registry = get_prompt_registry()
+        prompt_path, prompt_obj = registry.resolve(settings)
+
+        # EN: Bound cost/latency: big runs are reduced to a representative, token-budgeted sample,
+        #     measured in the prompt's input encoding.
+        # 中文：控制成本与延迟：大 run 先按 token 预算抽取代表性样本，按提示词选择的输入编码估算。
+        sampling = ai_sampling(settings)
+        sampling_stats: Optional[Dict[str, Any]] = None
+        if sampling["enabled"] and sampling["budget_tokens"] > 0:
+            sample_encoding = input_encoding_options(prompt_obj)
+            comments, sampling_stats = sample_comments(
+                comments,
+                budget_tokens=sampling["budget_tokens"],
+                top_engagement=sampling["top_engagement"],
+                seed=sampling["seed"],
+                cost=lambda c: comment_tokens(c, sample_encoding),
+            )
+            sampling_stats["input_encoding"] = sample_encoding["name"]
+
+        prepared = _prepare_input(video_id, comments, prompt_obj, base, stable_prefix=stable_prefix)
+
+        # EN: Routing picks model / max_tokens / template from the run size; a routed template
+        #     with another input encoding is re-encoded.
+        # 中文：按 run 规模路由模型 / max_tokens / 模板；路由到的模板输入编码不同时重新编码。
+        route = select_route(
+            ai_routing(settings), comments=len(rows), input_tokens=prepared["estimated_tokens"]
         )
+        if route is not None and route.get("prompt_template"):
+            routed_path, routed_prompt = registry.resolve_template(settings, route["prompt_template"])
+            if routed_path != prompt_path:
+                prompt_path, prompt_obj = routed_path, routed_prompt
+                prepared = _prepare_input(video_id, comments, prompt_obj, base, stable_prefix=stable_prefix)
+        encoding = prepared["encoding"]
+        input_json = prepared["input_json"]
+        encoding_stats = prepared["encoding_stats"]
+        estimated_tokens = prepared["estimated_tokens"]
+        system_prompt = prepared["system_prompt"]
+        hint = topics_hint(extracted) if extracted is not None else ""
 
-        raw_content = extract_message_content(resp_json)
+        ai_cfg = apply_route(
+            {
+                **load_ai_config(settings),
+                "rate_limiter": get_rate_limiter(ai_batch(settings)["requests_per_minute"]),
+                "account": {
+                    "db_file": db_file,
+                    "accounting": ai_accounting(settings),
+                    "run_id": int(run_id),
+                    "provider": provider,
+                    "prompt_name": str(prompt_obj.get("name") or "AI_PROMPT"),
+                    "prompt_version": int(prompt_obj.get("version") or 1),
+                },
+            },
+            route,
+        )
+        if route is not None:
+            route.update(prompt_file=prompt_path.name, model_used=str(ai_cfg["model"]))
 
-        portrait_json: Optional[str] = None
-        portrait_obj: Optional[Dict[str, Any]] = None
-        parse_ok = False
-        error: Optional[str] = None
+        cache_cfg = ai_cache(settings)
+        # EN: `overwrite` regenerates: cached replies are skipped and replaced.
+        # 中文：`overwrite` 表示重新生成：跳过并覆盖已缓存的回复。
+        cache = {**cache_cfg, "db_file": db_file, "refresh": overwrite} if cache_cfg["enabled"] else None
+        calls: List[Dict[str, Any]] = []
 
-        try:
-            parsed = json.loads(_extract_json_text(raw_content))
-            portrait_json = json.dumps(parsed, ensure_ascii=False)
-            portrait_obj = parsed if isinstance(parsed, dict) else None
-            parse_ok = True
-        except Exception as e:  # noqa: BLE001
-            error = f"Portrait JSON parse failed: {e}"
+        # EN: Large runs go through map-reduce so a single request never overflows the context.
+        # 中文：大 run 走 map-reduce，避免单次请求超出模型上下文。
+        chunking = ai_chunking(settings)
+        if route is not None and route.get("single_call_max_tokens"):
+            chunking = {**chunking, "single_call_max_tokens": route["single_call_max_tokens"]}
+        use_chunks = chunking["mode"] == "chunked" or (
+            chunking["mode"] == "auto" and estimated_tokens > chunking["single_call_max_tokens"]
+        )
+        sections = ai_sections(settings)
+        if sectioned is not None:
+            sections = {**sections, "enabled": bool(sectioned)}
+        use_sections = sections["enabled"] and not use_chunks
+        prefilled_names = set(STATS_FIELDS) if stats is not None else set()
+        on_delta: Optional[Callable[[str], None]] = None
+        relay: Optional[Callable[[], Callable[[str], None]]] = None
+        if on_event is not None:
+            on_event(
+                {
+                    "event": "start",
+                    "run_id": int(run_id),
+                    "mode": "chunked" if use_chunks else "sectioned" if use_sections else "single",
+                    "comments": len(rows),
+                    "sent_comments": len(comments),
+                    "estimated_input_tokens": estimated_tokens,
+                    "base_run_id": base["run_id"] if base is not None else None,
+                }
+            )
+            for name in sorted(prefilled_names):
+                on_event({"event": "field", "name": name, "value": stats[name], "source": LOCAL_PROVIDER})
+
+            def _field_relay() -> Callable[[str], None]:
+                parser = ProgressiveJsonParser()
+
+                def _relay_fields(delta: str) -> None:
+                    for name, value in parser.feed(delta):
+                        if name not in prefilled_names:
+                            on_event({"event": "field", "name": name, "value": value})
+
+                return _relay_fields
+
+            relay = _field_relay
+            on_delta = relay()
+
+        if use_chunks:
+            raw_content, generation = _generate_chunked(
+                ai_cfg=ai_cfg,
+                prompt_obj=prompt_obj,
+                video_id=video_id,
+                comments=comments,
+                chunking=chunking,
+                encoding=encoding,
+                cache=cache,
+                calls=calls,
+                on_event=on_event,
+                on_delta=on_delta,
+                hint=hint,
+                base=base,
+                stable_prefix=stable_prefix,
+            )
+        elif use_sections:
+            raw_content, generation = _generate_sectioned(
+                ai_cfg=ai_cfg,
+                system_prompt=system_prompt,
+                user_content=input_json + hint,
+                sections=sections,
+                fix_call=ai_json_repair(settings)["fix_call"],
+                skip_keys=prefilled_names,
+                cache=cache,
+                calls=calls,
+                relay=relay,
+            )
+        else:
+            single_meta: Dict[str, Any] = {}
+            raw_content = _call_llm(
+                ai_cfg,
+                system_prompt,
+                input_json + hint,
+                cache=cache,
+                calls=calls,
+                on_delta=on_delta,
+                meta=single_meta,
+            )
+            generation = {"mode": "single", "finish_reason": single_meta.get("finish_reason")}
+        generation["estimated_input_tokens"] = estimated_tokens
+        generation["input_encoding"] = encoding_stats
+        if topics_info is not None:
+            generation["topics"] = topics_info
+        generation.update(_calls_report(calls))
+        if sampling_stats is not None:
+            generation["sampling"] = sampling_stats
+        if incremental_info is not None:
+            generation["incremental"] = incremental_info
+        if route is not None:
+            generation["route"] = route
+        generation["covered_comments"] = len(rows) if base is None else base["covered"] + len(base["comments"])
 
-        upsert_ai_portrait(
-            conn,
+        # EN: The reply must hold every top-level key of the output schema (the section groups
+        #     list them) except those filled locally.
+        # 中文：回复必须包含输出结构的全部顶层字段（即各分组列出的字段），本地填充的字段除外。
+        schema_keys = [k for g in sections["groups"] for k in g["keys"] if k not in prefilled_names]
+        parsed, error, repair = _parse_or_fix(
+            ai_cfg,
+            raw_content,
+            fix_call=ai_json_repair(settings)["fix_call"],
+            keys=schema_keys,
+            finish_reason=generation.get("finish_reason"),
+            cache=cache,
+            calls=calls,
+        )
+        if repair is not None:
+            generation["json_repair"] = repair
+            generation.update(_calls_report(calls))
+
+        prefilled: Optional[Dict[str, Any]] = None
+        if stats is not None:
+            prefilled = {name: stats[name] for name in STATS_FIELDS}
+            generation["prefilled"] = {"fields": list(STATS_FIELDS), "elapsed_ms": stats_ms}
+
+        return _store_portrait(
+            db_file=db_file,
             run_id=int(run_id),
+            video_id=video_id,
             provider=provider,
             model=str(ai_cfg["model"]),
             prompt_name=str(prompt_obj.get("name") or "AI_PROMPT"),
             prompt_version=int(prompt_obj.get("version") or 1),
             input_json=input_json,
-            portrait_json=portrait_json,
-            portrait_raw=raw_content,
-            parse_ok=parse_ok,
+            raw_content=raw_content,
+            parsed=parsed,
             error=error,
+            generation=generation,
+            prefilled=prefilled,
+            base_run_id=base["run_id"] if base is not None else None,
+            route=route,
         )
-        conn.commit()
-
-        return {
-            "run_id": int(run_id),
-            "video_id": video_id,
-            "parse_ok": parse_ok,
-            "portrait": portrait_obj,
-            "portrait_raw": raw_content,
-            "error": error,
-            "prompt_name": str(prompt_obj.get("name") or "AI_PROMPT"),
-            "prompt_version": int(prompt_obj.get("version") or 1),
-            "provider": provider,
-            "model": str(ai_cfg["model"]),
-            "cached": False,
-        }
     finally:
         conn.close()
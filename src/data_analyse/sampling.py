@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import math
+import random
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.ai.tokens import estimate_json_tokens
+from src.data_analyse.language import detect_language
+
+_TIME_BUCKETS = 4
+
+
+def engagement_score(comment: Dict[str, Any]) -> int:
+    # EN: A reply signals more engagement than a like.
+    # 中文：回复比点赞代表更强的互动。
+    return int(comment.get("like_count") or 0) + 2 * int(comment.get("reply_count") or 0)
+
+
+def _engagement_bucket(score: int, high_cut: int) -> str:
+    if score <= 0:
+        return "none"
+    if score >= high_cut:
+        return "high"
+    return "mid" if score >= max(2, int(math.sqrt(high_cut))) else "low"
+
+
+def _time_bucket_fn(comments: List[Dict[str, Any]]) -> Callable[[Dict[str, Any]], str]:
+    # EN: Quartiles of published_at (ISO strings sort chronologically); missing dates share a bucket.
+    # 中文：按 published_at 的四分位分桶（ISO 字符串可直接比较），缺失时间的评论单独一桶。
+    stamps = sorted(str(c["published_at"]) for c in comments if c.get("published_at"))
+    cuts = [stamps[len(stamps) * q // _TIME_BUCKETS] for q in range(1, _TIME_BUCKETS)] if stamps else []
+
+    def _bucket(comment: Dict[str, Any]) -> str:
+        ts = comment.get("published_at")
+        if not ts:
+            return "unknown"
+        return f"q{sum(1 for cut in cuts if str(ts) >= cut) + 1}"
+
+    return _bucket
+
+
+def sample_comments(
+    comments: List[Dict[str, Any]],
+    *,
+    budget_tokens: int,
+    top_engagement: int = 30,
+    seed: int = 42,
+    cost: Callable[[Dict[str, Any]], int] = estimate_json_tokens,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Pick a representative subset of comments whose estimated input size fits `budget_tokens`.
+
+    EN: `cost` estimates one comment's tokens in the encoding actually sent (verbose JSON by
+        default). Each of the `top_engagement` most liked/replied comments that fits is kept
+        first; one too long to fit is skipped without dropping the ones after it. The rest
+        of the budget is split across strata (engagement bucket x language x publish-time
+        quartile) in proportion to each stratum's share of the run, sampling randomly
+        (seeded, so reruns are reproducible) inside each stratum. Output keeps input order.
+    中文：`cost` 按实际发送的编码估算单条评论的 token（默认为 verbose JSON）。先保留互动最高的 `top_engagement`
+          条评论中每一条放得下的（放不下的长评论被跳过，不影响其后的评论）；剩余预算按分层（互动档位 × 语言 × 发布时间
+          四分位）按各层在整个 run 中的占比分配，层内用固定种子随机抽样（结果可复现）。输出保持原顺序。
+
+    Returns (sampled comments, sampling stats).
+    """
+
+    costs = [cost(c) for c in comments]
+    total_tokens = sum(costs)
+    languages = [detect_language(str(c.get("text") or "")) for c in comments]
+    scores = [engagement_score(c) for c in comments]
+
+    stats: Dict[str, Any] = {
+        "budget_tokens": int(budget_tokens),
+        "total_comments": len(comments),
+        "total_tokens_est": total_tokens,
+        "population": {"language": dict(Counter(languages))},
+    }
+    if total_tokens <= budget_tokens:
+        stats.update(
+            {"sampled": False, "sampled_comments": len(comments), "sampled_tokens_est": total_tokens}
+        )
+        return comments, stats
+
+    ranked = sorted(range(len(comments)), key=lambda i: scores[i], reverse=True)
+    high_cut = max(1, scores[ranked[min(len(ranked) - 1, max(0, len(ranked) // 10))]])
+    time_bucket = _time_bucket_fn(comments)
+
+    chosen: set[int] = set()
+    used = 0
+    for i in ranked[: max(0, int(top_engagement))]:
+        if used + costs[i] > budget_tokens:
+            continue
+        chosen.add(i)
+        used += costs[i]
+    pinned = len(chosen)
+
+    strata: Dict[Tuple[str, str, str], List[int]] = {}
+    for i, comment in enumerate(comments):
+        if i in chosen:
+            continue
+        key = (_engagement_bucket(scores[i], high_cut), languages[i], time_bucket(comment))
+        strata.setdefault(key, []).append(i)
+
+    rng = random.Random(seed)
+    remaining_budget = budget_tokens - used
+    remaining_tokens = sum(costs[i] for members in strata.values() for i in members) or 1
+    leftovers: List[int] = []
+    for key in sorted(strata):
+        members = strata[key]
+        rng.shuffle(members)
+        share = remaining_budget * sum(costs[i] for i in members) / remaining_tokens
+        spent = 0.0
+        for pos, i in enumerate(members):
+            # EN: Every stratum gets at least one comment if it fits the global budget.
+            # 中文：只要总预算允许，每个分层至少保留一条。
+            if (spent + costs[i] > share and pos > 0) or used + costs[i] > budget_tokens:
+                leftovers.extend(members[pos:])
+                break
+            chosen.add(i)
+            spent += costs[i]
+            used += costs[i]
+
+    # EN: Rounding leaves some budget unused; top it up from the leftovers.
+    # 中文：按比例分配的取整误差会剩下少量预算，用剩余评论补满。
+    rng.shuffle(leftovers)
+    for i in leftovers:
+        if used + costs[i] <= budget_tokens:
+            chosen.add(i)
+            used += costs[i]
+
+    order = sorted(chosen)
+    sampled = [comments[i] for i in order]
+    stats.update(
+        {
+            "sampled": True,
+            "sampled_comments": len(sampled),
+            "sampled_tokens_est": used,
+            "top_engagement_pinned": pinned,
+            "strata": len(strata),
+            "seed": int(seed),
+            "sample": {"language": dict(Counter(languages[i] for i in order))},
+        }
+    )
+    stats["population"]["engagement"] = dict(Counter(_engagement_bucket(s, high_cut) for s in scores))
+    stats["sample"]["engagement"] = dict(Counter(_engagement_bucket(scores[i], high_cut) for i in order))
+    return sampled, stats
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+from src.data_analyse.local_portrait import round_shares
+
+# EN: Lowercased Latin words, or runs of CJK (han/kana/hangul) characters.
+# 中文：小写拉丁单词，或连续的中日韩（汉字/假名/谚文）字符。
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9']+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+_URL_RE = re.compile(r"https?://\S+")
+
+_LATIN_STOPWORDS = frozenset(
+    """
+    the a an and or but if then so to of in on at for with from by as is are was were be been being
+    it its it's this that these those i me my you your he she his her we our they them their
+    not no do does did don't have has had will would can could should just very really too also
+    what who how when where why all any some more most much many than there here about into out up
+    like get got one im i'm you're lol
+    """.split()
+)
+_CJK_STOPWORDS = frozenset(
+    """
+    这个 那个 一个 我们 你们 他们 她们 就是 不是 什么 没有 真的 因为 所以 还是 可以 自己 觉得 这样 那样
+    已经 还有 但是 如果 然后 现在 时候 一下 一样 这么 那么 怎么 的人 了吧 了啊 是不 不会 知道
+    """.split()
+)
+
+
+def _numpy() -> Any:
+    # EN: NumPy is only needed for topic extraction; the rest of the app works without it.
+    # 中文：NumPy 仅主题抽取需要，未安装时不影响其它功能。
+    try:
+        import numpy as np  # noqa: WPS433
+    except ImportError as e:
+        raise RuntimeError("Topic extraction requires numpy: pip install numpy") from e
+    return np
+
+
+def tokenize(text: str) -> List[str]:
+    """Terms of one comment: Latin words, and character bigrams of CJK runs.
+
+    EN: CJK has no spaces, so overlapping bigrams stand in for words ("好听的歌" ->
+        好听, 听的, 的歌). Stopwords and URLs are dropped.
+    中文：中日韩文本没有空格，用重叠的二元字组代替分词（“好听的歌” -> 好听、听的、的歌），
+          并去掉停用词与链接。
+    """
+
+    terms: List[str] = []
+    for token in _TOKEN_RE.findall(_URL_RE.sub(" ", (text or "").lower())):
+        if token[0].isascii():
+            if token not in _LATIN_STOPWORDS:
+                terms.append(token)
+            continue
+        for i in range(len(token) - 1):
+            bigram = token[i : i + 2]
+            if bigram not in _CJK_STOPWORDS:
+                terms.append(bigram)
+    return terms
+
+
+def tfidf_matrix(
+    texts: Sequence[str],
+    *,
+    max_features: int = 5000,
+    min_df: int = 2,
+    max_df: float = 0.5,
+) -> Tuple[Any, Any, Any, List[str], Any]:
+    """Sparse, L2-normalized TF-IDF matrix in CSR form (sublinear tf, smoothed idf).
+
+    Returns (indptr, indices, data, vocabulary, doc_ids). Documents without any kept
+    term are left out; `doc_ids` maps each matrix row back to its index in `texts`.
+    """
+
+    np = _numpy()
+    counts = [Counter(tokenize(t)) for t in texts]
+    df: Counter = Counter()
+    for c in counts:
+        df.update(c.keys())
+
+    n_docs = len(texts)
+    max_count = max(1, int(max_df * n_docs)) if n_docs >= 10 else n_docs
+    candidates = [(n, term) for term, n in df.items() if min_df <= n <= max_count]
+    candidates.sort(key=lambda x: (-x[0], x[1]))
+    vocabulary = [term for _n, term in candidates[:max_features]]
+    column = {term: j for j, term in enumerate(vocabulary)}
+
+    indptr = [0]
+    indices: List[int] = []
+    tf: List[int] = []
+    doc_ids: List[int] = []
+    for doc_id, c in enumerate(counts):
+        row = [(column[term], n) for term, n in c.items() if term in column]
+        if not row:
+            continue
+        doc_ids.append(doc_id)
+        for j, n in row:
+            indices.append(j)
+            tf.append(n)
+        indptr.append(len(indices))
+
+    indptr_a = np.asarray(indptr, dtype=np.int64)
+    indices_a = np.asarray(indices, dtype=np.int64)
+    df_a = np.asarray([df[term] for term in vocabulary], dtype=np.float32)
+    idf = np.log((1 + n_docs) / (1 + df_a)) + 1
+    data = (1 + np.log(np.asarray(tf, dtype=np.float32))) * idf[indices_a]
+
+    if len(doc_ids):
+        row_norms = np.sqrt(np.add.reduceat(data * data, indptr_a[:-1]))
+        data /= np.repeat(row_norms, np.diff(indptr_a))
+    return indptr_a, indices_a, data.astype(np.float32), vocabulary, np.asarray(doc_ids, dtype=np.int64)
+
+
+def _row_dot(indptr: Any, indices: Any, data: Any, dense: Any, block_rows: int = 20000) -> Any:
+    """CSR rows times a dense (n_features, k) matrix, in row blocks to bound memory."""
+
+    np = _numpy()
+    n_rows = len(indptr) - 1
+    out = np.empty((n_rows, dense.shape[1]), dtype=np.float32)
+    for a in range(0, n_rows, block_rows):
+        b = min(n_rows, a + block_rows)
+        s, e = indptr[a], indptr[b]
+        products = data[s:e, None] * dense[indices[s:e]]
+        out[a:b] = np.add.reduceat(products, indptr[a:b] - s, axis=0)
+    return out
+
+
+def _spherical_kmeans(
+    indptr: Any, indices: Any, data: Any, n_features: int, k: int, *, max_iter: int, seed: int
+) -> Tuple[Any, Any, Any]:
+    """Cosine k-means on L2-normalized sparse rows (k-means++ seeding).
+
+    Returns (labels, centroids (k, n_features), similarity of each row to its centroid).
+    """
+
+    np = _numpy()
+    rng = np.random.default_rng(seed)
+    n_rows = len(indptr) - 1
+    row_of_nnz = np.repeat(np.arange(n_rows), np.diff(indptr))
+
+    def _dense_row(i: int) -> Any:
+        v = np.zeros(n_features, dtype=np.float32)
+        v[indices[indptr[i] : indptr[i + 1]]] = data[indptr[i] : indptr[i + 1]]
+        return v
+
+    centroids = np.zeros((k, n_features), dtype=np.float32)
+    centroids[0] = _dense_row(int(rng.integers(n_rows)))
+    best = _row_dot(indptr, indices, data, centroids[:1].T)[:, 0]
+    for c in range(1, k):
+        weights = np.clip(1 - best, 0, None) ** 2
+        total = float(weights.sum())
+        pick = int(rng.choice(n_rows, p=weights / total)) if total > 0 else int(rng.integers(n_rows))
+        centroids[c] = _dense_row(pick)
+        best = np.maximum(best, _row_dot(indptr, indices, data, centroids[c : c + 1].T)[:, 0])
+
+    labels = np.full(n_rows, -1, dtype=np.int64)
+    for _ in range(max_iter):
+        sims = _row_dot(indptr, indices, data, centroids.T)
+        new_labels = sims.argmax(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = np.bincount(
+            labels[row_of_nnz] * n_features + indices, weights=data, minlength=k * n_features
+        ).reshape(k, n_features)
+        norms = np.linalg.norm(sums, axis=1)
+        for c in np.flatnonzero(norms == 0):
+            # EN: Re-seed an empty cluster with the row that fits its own cluster worst.
+            # 中文：空簇用与自身簇最不相似的行重新初始化。
+            worst = int(sims[np.arange(n_rows), labels].argmin())
+            sums[c] = _dense_row(worst)
+            norms[c] = 1.0
+        centroids = (sums / norms[:, None]).astype(np.float32)
+
+    sims = _row_dot(indptr, indices, data, centroids.T)
+    labels = sims.argmax(axis=1)
+    return labels, centroids, sims[np.arange(n_rows), labels]
+
+
+def extract_topics(
+    comments: List[Dict[str, Any]],
+    *,
+    k: int = 6,
+    max_features: int = 5000,
+    min_df: int = 2,
+    max_iter: int = 20,
+    seed: int = 42,
+    representatives: int = 3,
+) -> Dict[str, Any]:
+    """Cluster comments into weighted topics with TF-IDF + spherical k-means.
+
+    EN: A topic's weight is its share of engagement-weighted comments
+        (1 + ln(1 + likes + replies) per comment), matching the portrait rule that
+        weight reflects both frequency and interaction. Each topic carries its top
+        terms and the comments closest to its centroid.
+    中文：主题权重为按互动加权（每条评论 1 + ln(1 + 点赞 + 回复)）后的评论占比，
+          与画像中“频次 + 互动量加权”的规则一致；每个主题附带高权重词与最贴近中心的代表评论。
+    """
+
+    np = _numpy()
+    texts = [str(c.get("text") or "") for c in comments]
+    indptr, indices, data, vocabulary, doc_ids = tfidf_matrix(
+        texts, max_features=max_features, min_df=min_df
+    )
+    n_rows = len(doc_ids)
+    result: Dict[str, Any] = {"comments": len(comments), "clustered": n_rows, "topics": []}
+    k = min(int(k), n_rows)
+    if k <= 0:
+        return result
+
+    labels, centroids, fit = _spherical_kmeans(
+        indptr, indices, data, len(vocabulary), k, max_iter=max_iter, seed=seed
+    )
+    engagement = np.asarray(
+        [
+            1 + math.log1p(int(comments[i].get("like_count") or 0) + int(comments[i].get("reply_count") or 0))
+            for i in doc_ids
+        ],
+        dtype=np.float64,
+    )
+    mass = np.bincount(labels, weights=engagement, minlength=k)
+    sizes = np.bincount(labels, minlength=k)
+    weights = round_shares({str(c): float(mass[c]) for c in range(k)}, [str(c) for c in range(k)])
+
+    topics: List[Dict[str, Any]] = []
+    for c in range(k):
+        if sizes[c] == 0:
+            continue
+        # EN: Stable sort: ties go to the term with the higher corpus frequency (lower column).
+        # 中文：稳定排序：权重相同时优先语料中出现更多的词（列号更小）。
+        order = np.argsort(-centroids[c], kind="stable")[:5]
+        terms = [vocabulary[j] for j in order if centroids[c, j] > 0]
+        members = np.flatnonzero(labels == c)
+        closest = members[np.argsort(-fit[members])[:representatives]]
+        topics.append(
+            {
+                "name": " / ".join(terms[:3]),
+                "weight": weights[str(c)],
+                "size": int(sizes[c]),
+                "terms": terms,
+                "representatives": [
+                    {
+                        "comment_id": comments[int(doc_ids[i])].get("comment_id"),
+                        "text": texts[int(doc_ids[i])][:200],
+                        "like_count": comments[int(doc_ids[i])].get("like_count"),
+                    }
+                    for i in closest
+                ],
+            }
+        )
+    topics.sort(key=lambda t: (-t["weight"], -t["size"]))
+    result["topics"] = topics
+    return result
+
+
+def portrait_topics(extracted: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The portrait's `topics` field: [{"name", "weight"}]."""
+
+    return [{"name": t["name"], "weight": t["weight"]} for t in extracted["topics"]]
+
+
+def topics_hint(extracted: Dict[str, Any]) -> str:
+    """Hint block appended to the LLM input: local clusters with their key terms and shares."""
+
+    if not extracted["topics"]:
+        return ""
+    lines = [
+        "Locally computed topic clusters (TF-IDF + k-means; key terms, share of engagement-weighted "
+        "comments). Use them as evidence when naming and weighting `topics`, not as final names:"
+    ]
+    for t in extracted["topics"]:
+        lines.append(f"- {', '.join(t['terms'])}: {t['weight']:.2f}")
+    return "\n\n" + "\n".join(lines)
+
+
+def topics_from_settings(comments: List[Dict[str, Any]], topics_cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """`extract_topics` with the options of `ai_topics(settings)`."""
+
+    return extract_topics(
+        comments,
+        k=topics_cfg["k"],
+        max_features=topics_cfg["max_features"],
+        min_df=topics_cfg["min_df"],
+        max_iter=topics_cfg["max_iter"],
+        seed=topics_cfg["seed"],
+    )
+
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+
+def _ensure_project_root_on_syspath() -> None:
+    """Ensure imports like `from src...` work when run as a script.
+
+    EN: When using `python -m ...`, this is unnecessary.
+    中文：若用 `python -m ...` 运行则不需要；直接运行脚本时需要把项目根目录加入 sys.path。
+    """
+
+    root = Path(__file__).resolve().parents[2]
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+
+
+_ensure_project_root_on_syspath()
+
+from src.config import db_path, db_retention, load_settings  # noqa: E402
+from src.database.sqlite import (  # noqa: E402
+    connect,
+    gc_input_blobs,
+    get_run_archive_path,
+    init_schema,
+    utc_now_iso,
+)
+from src.database.writer import read_connection, run_write  # noqa: E402
+
+_RAW_COLUMNS = (
+    "id",
+    "run_id",
+    "video_id",
+    "thread_id",
+    "fetched_at",
+    "published_at",
+    "author",
+    "like_count",
+    "reply_count",
+    "text_original",
+    "item_json",
+)
+
+
+def _archive_file(archive_dir: Path, run_id: int) -> Path:
+    return archive_dir / f"run_{int(run_id)}.jsonl.gz"
+
+
+def archive_run(db_file: Path, run_id: int, archive_dir: Path) -> Optional[Path]:
+    """Move the raw_comment_threads rows of one run into a gzip JSONL file.
+
+    EN: Clean rows and portraits stay in the hot DB. Raw rows are deleted (not just blanked)
+        so whole pages land on the freelist for `incremental_vacuum`. The run's clean_comments
+        get raw_thread_id = NULL first, so the delete does not cascade and
+        `PRAGMA foreign_key_check` stays clean; each archived record keeps the ids of its
+        clean rows ("clean_ids") so `restore_run` can link them again. The file is written
+        from a read-only connection; the update and delete are one writer job.
+    中文：clean 数据与画像留在热库；原始行被整体删除（而非置空），使整页进入空闲列表供
+          incremental_vacuum 回收。删除前先把该 run 的 clean_comments.raw_thread_id 置为 NULL，
+          因此不会级联删除，`PRAGMA foreign_key_check` 也保持干净；每条归档记录保存其 clean 行的 id
+          （"clean_ids"），供 `restore_run` 重新关联。归档文件通过只读连接写出；置空与删除在同一个写任务中完成。
+
+    Returns the archive path, or None when the run is missing or already archived.
+    """
+
+    conn = read_connection(db_file)
+    try:
+        run = conn.execute(
+            "SELECT id, archived_at FROM collection_runs WHERE id = ? LIMIT 1", (int(run_id),)
+        ).fetchone()
+        if run is None or run["archived_at"]:
+            return None
+
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        target = _archive_file(archive_dir, run_id)
+        tmp = target.with_name(target.name + ".tmp")
+
+        clean_ids: Dict[int, List[int]] = {}
+        for row in conn.execute(
+            "SELECT id, raw_thread_id FROM clean_comments WHERE run_id = ? AND raw_thread_id IS NOT NULL",
+            (int(run_id),),
+        ):
+            clean_ids.setdefault(int(row["raw_thread_id"]), []).append(int(row["id"]))
+
+        rows = conn.execute(
+            f"SELECT {', '.join(_RAW_COLUMNS)} FROM raw_comment_threads WHERE run_id = ? ORDER BY id ASC",
+            (int(run_id),),
+        )
+        written = 0
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for row in rows:
+                rec = {k: row[k] for k in _RAW_COLUMNS}
+                rec["clean_ids"] = clean_ids.get(int(row["id"]), [])
+                f.write(json.dumps(rec, ensure_ascii=False))
+                f.write("\n")
+                written += 1
+    finally:
+        conn.close()
+
+    def _delete(wconn: sqlite3.Connection) -> bool:
+        current = wconn.execute(
+            "SELECT COUNT(*) FROM raw_comment_threads WHERE run_id = ?", (int(run_id),)
+        ).fetchone()[0]
+        if int(current) != written:
+            # EN: Rows changed since the file was written; keep them hot.
+            # 中文：写出归档后原始行有变化，保留在热库中。
+            return False
+        wconn.execute("UPDATE clean_comments SET raw_thread_id = NULL WHERE run_id = ?", (int(run_id),))
+        wconn.execute("DELETE FROM raw_comment_threads WHERE run_id = ?", (int(run_id),))
+        wconn.execute(
+            "UPDATE collection_runs SET archived_at = ?, archive_path = ? WHERE id = ? AND archived_at IS NULL",
+            (utc_now_iso(), str(target), int(run_id)),
+        )
+        return True
+
+    # EN: Rename only after the file is complete, so a crash never leaves a half archive;
+    #     the rows are deleted only once the file is in place.
+    # 中文：写完后再改名，崩溃时不会留下半截归档文件；归档文件就位后才删除原始行。
+    tmp.replace(target)
+    try:
+        deleted = run_write(db_file, _delete)
+    except Exception:
+        target.unlink(missing_ok=True)
+        raise
+    if not deleted:
+        target.unlink(missing_ok=True)
+        return None
+    return target
+
+
+def restore_run(db_file: Path, run_id: int) -> int:
+    """Load archived raw rows back into the hot DB (same ids as before archival).
+
+    EN: The archive is read before the writer job starts, so the job only runs the inserts
+        and points the run's clean_comments back at their raw rows ("clean_ids"). Archives
+        written before clean_ids existed are matched on the top-level comment id instead.
+    中文：先读完归档文件再提交写任务，写任务只执行插入，并按 "clean_ids" 把该 run 的 clean_comments
+          重新指向原始行。早于 clean_ids 的归档文件改为按顶层评论 id 匹配。
+
+    Returns: number of raw rows restored.
+    """
+
+    conn = read_connection(db_file)
+    try:
+        archive_path = get_run_archive_path(conn, run_id)
+    finally:
+        conn.close()
+    if archive_path is None:
+        return 0
+
+    path = Path(archive_path)
+    if not path.exists():
+        raise FileNotFoundError(f"Archive file missing for run_id={run_id}: {path}")
+
+    records: List[tuple] = []
+    links: List[tuple] = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            records.append(tuple(rec.get(k) for k in _RAW_COLUMNS))
+            links.extend((rec["id"], int(clean_id)) for clean_id in rec.get("clean_ids") or [])
+
+    placeholders = ", ".join("?" for _ in _RAW_COLUMNS)
+
+    def _restore(wconn: sqlite3.Connection) -> None:
+        wconn.executemany(
+            f"INSERT OR IGNORE INTO raw_comment_threads ({', '.join(_RAW_COLUMNS)}) "
+            f"VALUES ({placeholders})",
+            records,
+        )
+        wconn.executemany(
+            "UPDATE clean_comments SET raw_thread_id = ? WHERE id = ? AND raw_thread_id IS NULL",
+            links,
+        )
+        wconn.execute(
+            """
+            UPDATE clean_comments SET raw_thread_id = (
+                SELECT r.id FROM raw_comment_threads r
+                WHERE r.run_id = clean_comments.run_id
+                  AND json_extract(r.item_json, '$.snippet.topLevelComment.id') = clean_comments.comment_id
+            )
+            WHERE run_id = ? AND raw_thread_id IS NULL
+            """,
+            (int(run_id),),
+        )
+        wconn.execute(
+            "UPDATE collection_runs SET archived_at = NULL, archive_path = NULL WHERE id = ?",
+            (int(run_id),),
+        )
+
+    run_write(db_file, _restore)
+    path.unlink(missing_ok=True)
+    return len(records)
+
+
+def runs_due_for_archive(conn: sqlite3.Connection, older_than_days: int) -> List[int]:
+    if older_than_days <= 0:
+        return []
+    cutoff = (
+        datetime.now(timezone.utc) - timedelta(days=int(older_than_days))
+    ).replace(microsecond=0).isoformat()
+    # EN: collected_at is stored as UTC ISO-8601, so string comparison is chronological.
+    # 中文：collected_at 为 UTC ISO-8601 字符串，可直接按字符串比较时间先后。
+    rows = conn.execute(
+        """
+        SELECT id FROM collection_runs
+        WHERE archived_at IS NULL AND collected_at < ?
+        ORDER BY id ASC
+        """,
+        (cutoff,),
+    ).fetchall()
+    return [int(r["id"]) for r in rows]
+
+
+def incremental_vacuum(conn: sqlite3.Connection, pages: int) -> Dict[str, int]:
+    """Release up to `pages` free pages back to the filesystem.
+
+    EN: No-op unless the DB uses auto_vacuum=INCREMENTAL (see `--convert`).
+    中文：仅当 DB 为 auto_vacuum=INCREMENTAL 时生效（旧库可用 `--convert` 转换）。
+    """
+
+    mode = int(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+    before = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+    if mode == 2 and before > 0 and pages > 0:
+        # EN: execute() frees a single page per call, and executescript would commit the
+        #     writer's open transaction, so the pages are released one step at a time.
+        # 中文：execute() 每次只回收一页，而 executescript 会提交写线程的事务，因此逐页回收。
+        for _ in range(min(int(pages), before)):
+            conn.execute("PRAGMA incremental_vacuum(1)")
+    after = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+    return {"auto_vacuum": mode, "free_pages_before": before, "free_pages_after": after}
+
+
+def apply_retention(settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Archive every run past the retention window, drop orphaned input blobs, then vacuum a bit."""
+
+    settings = settings or load_settings()
+    policy = db_retention(settings)
+    db_file = db_path(settings)
+
+    conn = read_connection(db_file)
+    try:
+        due = runs_due_for_archive(conn, policy["archive_after_days"])
+    finally:
+        conn.close()
+
+    # EN: One writer job per run, so other writes interleave between runs.
+    # 中文：每个 run 一个写任务，其它写操作可在 run 之间穿插执行。
+    archived: List[int] = []
+    for run_id in due:
+        if archive_run(db_file, run_id, policy["archive_dir"]) is not None:
+            archived.append(run_id)
+    blobs_removed = run_write(db_file, gc_input_blobs)
+    vacuum = run_write(db_file, lambda wconn: incremental_vacuum(wconn, policy["vacuum_pages"]))
+
+    return {"archived_run_ids": archived, "input_blobs_removed": blobs_removed, "vacuum": vacuum}
+
+
+def start_retention_worker(settings: Optional[Dict[str, Any]] = None) -> Optional[threading.Thread]:
+    """Run `apply_retention` periodically on a daemon thread.
+
+    Returns None when archival is disabled in settings.json.
+    """
+
+    settings = settings or load_settings()
+    policy = db_retention(settings)
+    if policy["archive_after_days"] <= 0 or policy["interval_minutes"] <= 0:
+        return None
+
+    interval = policy["interval_minutes"] * 60
+    stop = threading.Event()
+
+    def _loop() -> None:
+        while not stop.wait(interval):
+            try:
+                apply_retention(settings)
+            except Exception as e:  # noqa: BLE001
+                print(f"Retention pass failed: {e}", file=sys.stderr)
+
+    thread = threading.Thread(target=_loop, name="db-retention", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    load_dotenv()
+    settings = load_settings()
+
+    parser = argparse.ArgumentParser(
+        description="Archive raw JSON of old runs to compressed files, restore them, and vacuum the DB."
+    )
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--apply", action="store_true", help="Apply the retention policy from settings.json")
+    group.add_argument("--archive", type=int, metavar="RUN_ID", help="Archive one run now")
+    group.add_argument("--restore", type=int, metavar="RUN_ID", help="Restore an archived run")
+    group.add_argument(
+        "--convert",
+        action="store_true",
+        help="One-off full VACUUM switching a legacy DB to auto_vacuum=INCREMENTAL",
+    )
+    args = parser.parse_args(argv)
+
+    if args.apply:
+        print(json.dumps(apply_retention(settings), ensure_ascii=False))
+        return 0
+
+    policy = db_retention(settings)
+    db_file = db_path(settings)
+    if args.archive:
+        path = archive_run(db_file, args.archive, policy["archive_dir"])
+        print(f"Archived run_id={args.archive} -> {path}" if path else "Nothing to archive.")
+    elif args.restore:
+        restored = restore_run(db_file, args.restore)
+        print(f"Restored run_id={args.restore} rows={restored}")
+    elif args.convert:
+        # EN: VACUUM cannot run inside a transaction, so this one-off uses its own connection.
+        # 中文：VACUUM 不能在事务中执行，因此这个一次性操作使用独立连接。
+        conn = connect(db_file)
+        try:
+            init_schema(conn)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+            conn.execute("VACUUM")
+            mode = int(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+            print(f"VACUUM done. auto_vacuum={mode}")
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
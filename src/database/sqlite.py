@@ -1,25 +1,103 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import re
 import sqlite3
-from datetime import datetime, timezone
+import zlib
+from datetime import date, datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
-def connect(db_file: Path) -> sqlite3.Connection:
+def utc_bound(value: str) -> str:
+    """Normalize an ISO date/datetime filter bound to UTC for comparison with stored timestamps.
+
+    EN: Stored timestamps are UTC ISO-8601 but end in `+00:00` (isoformat) or `Z` (YouTube API).
+        A datetime bound is converted to UTC (naive = UTC) and written as
+        `YYYY-MM-DDTHH:MM:SS[.ffffff]` without suffix, a prefix of every stored form of the
+        same instant, so `>=` / `<` on strings stay chronological. A date stays a date.
+        Raises ValueError on anything else.
+    中文：库中时间为 UTC ISO-8601，但后缀可能是 `+00:00`（isoformat）或 `Z`（YouTube API）。日期时间边界先换算为
+          UTC（无时区视为 UTC），再写成不带后缀的 `YYYY-MM-DDTHH:MM:SS[.ffffff]`，它是同一时刻各种存储形式的前缀，
+          因此字符串的 `>=` / `<` 比较仍按时间先后。纯日期保持不变。其它格式抛出 ValueError。
+    """
+
+    raw = str(value).strip()
+    if len(raw) == 10:
+        return date.fromisoformat(raw).isoformat()
+    dt = datetime.fromisoformat(raw.replace("Z", "+00:00").replace("z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.isoformat()
+
+
+_settings_pragmas: Optional[Dict[str, Any]] = None
+
+
+def _resolve_pragmas(pragmas: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Validated pragmas: explicit ones go through `db_pragmas`; settings.json is read once per process."""
+
+    global _settings_pragmas
+    from src.config import db_pragmas, load_settings  # noqa: WPS433
+
+    if pragmas is not None:
+        return db_pragmas({"database": {"pragmas": pragmas}}, defaults=False)
+    if _settings_pragmas is None:
+        _settings_pragmas = db_pragmas(load_settings())
+    return _settings_pragmas
+
+
+def connect(db_file: Path, *, pragmas: Optional[Dict[str, Any]] = None) -> sqlite3.Connection:
+    """Open a read-write connection.
+
+    EN: `pragmas` defaults to settings.json -> database.pragmas (see `db_pragmas`), read
+        once per process (restart to apply changes); pass `{}` to keep SQLite defaults.
+    中文：`pragmas` 默认读取 settings.json 的 database.pragmas，每个进程只读取一次（修改后需重启）；
+          传 `{}` 则保持 SQLite 默认值。
+    """
+
+    pragmas = _resolve_pragmas(pragmas)
+
     db_file.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(str(db_file))
     conn.row_factory = sqlite3.Row
+    # EN: Must precede journal_mode (which writes the DB header); only effective on a new
+    #     file or after a full VACUUM. Lets `PRAGMA incremental_vacuum` release free pages.
+    # 中文：必须在 journal_mode 之前执行；仅对新库或完整 VACUUM 后生效，使 incremental_vacuum 能归还空闲页。
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
     conn.execute("PRAGMA journal_mode=WAL;")
+    # EN: Values are validated by `db_pragmas` (ints or fixed keywords), so formatting is safe.
+    # 中文：取值已由 `db_pragmas` 校验（整数或固定关键字），可直接拼接。
+    for key, value in pragmas.items():
+        conn.execute(f"PRAGMA {key}={value};")
     conn.execute("PRAGMA foreign_keys=ON;")
     return conn
 
 
+def connect_readonly(
+    db_file: Path, *, pragmas: Optional[Dict[str, Any]] = None
+) -> sqlite3.Connection:
+    """Open a `mode=ro` URI connection (the DB must already exist).
+
+    EN: Used by read endpoints so they never take write locks.
+    中文：供只读接口使用，永不持有写锁。
+    """
+
+    pragmas = _resolve_pragmas(pragmas)
+
+    conn = sqlite3.connect(f"{db_file.resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    for key in ("cache_size", "mmap_size", "temp_store", "busy_timeout"):
+        if key in pragmas:
+            conn.execute(f"PRAGMA {key}={pragmas[key]};")
+    return conn
+
+
 def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
     row = conn.execute(
         "SELECT 1 FROM sqlite_master WHERE type='table' AND name=? LIMIT 1", (name,)
@@ -74,7 +152,7 @@ def _migrate_v1_to_v2(conn: sqlite3.Connection) -> None:
             CREATE TABLE IF NOT EXISTS clean_comments (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 run_id INTEGER NOT NULL,
-                raw_thread_id INTEGER NOT NULL,
+                raw_thread_id INTEGER,
                 video_id TEXT NOT NULL,
                 comment_id TEXT NOT NULL,
                 cleaned_at TEXT NOT NULL,
@@ -166,7 +244,7 @@ def init_schema(conn: sqlite3.Connection) -> None:
         CREATE TABLE IF NOT EXISTS clean_comments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             run_id INTEGER NOT NULL,
-            raw_thread_id INTEGER NOT NULL,
+            raw_thread_id INTEGER,
             video_id TEXT NOT NULL,
             comment_id TEXT NOT NULL,
             cleaned_at TEXT NOT NULL,
@@ -176,6 +254,7 @@ def init_schema(conn: sqlite3.Connection) -> None:
             reply_count INTEGER,
             text TEXT NOT NULL,
             text_original TEXT,
+            text_bigrams TEXT,
             FOREIGN KEY(run_id) REFERENCES collection_runs(id) ON DELETE CASCADE,
             FOREIGN KEY(raw_thread_id) REFERENCES raw_comment_threads(id) ON DELETE CASCADE,
             UNIQUE(run_id, comment_id)
@@ -197,9 +276,61 @@ def init_schema(conn: sqlite3.Connection) -> None:
             FOREIGN KEY(run_id) REFERENCES collection_runs(id) ON DELETE CASCADE,
             UNIQUE(run_id)
         );
+
+        CREATE TABLE IF NOT EXISTS ai_input_blobs (
+            hash TEXT PRIMARY KEY,
+            created_at TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            raw_size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS llm_response_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            last_used_at TEXT NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0,
+            size_bytes INTEGER NOT NULL,
+            response BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_used
+            ON llm_response_cache(last_used_at);
+
+        -- EN: One row per LLM request actually sent (cache hits are not logged).
+        -- 中文：每个实际发出的 LLM 请求一行（命中响应缓存的不记录）。
+        CREATE TABLE IF NOT EXISTS ai_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            run_id INTEGER,
+            purpose TEXT,
+            provider TEXT,
+            model TEXT,
+            prompt_name TEXT,
+            prompt_version INTEGER,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            cache_hit_tokens INTEGER,
+            latency_ms REAL,
+            ttfb_ms REAL,
+            http_status INTEGER,
+            retries INTEGER NOT NULL DEFAULT 0,
+            cost_est REAL,
+            ok INTEGER NOT NULL,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_ai_calls_created_at ON ai_calls(created_at);
+        CREATE INDEX IF NOT EXISTS idx_ai_calls_run ON ai_calls(run_id);
         """
     )
     _ensure_collection_run_columns(conn)
+    _ensure_ai_portrait_columns(conn)
+    _ensure_clean_comment_columns(conn)
+    _migrate_nullable_raw_thread_id(conn)
+    _ensure_indexes(conn)
+    _ensure_comment_fts(conn)
+    _ensure_comment_bigram_fts(conn)
+    _migrate_portrait_inputs_to_blobs(conn)
     conn.commit()
 
 
@@ -212,10 +343,302 @@ def _ensure_collection_run_columns(conn: sqlite3.Connection) -> None:
         alter_stmts.append("ALTER TABLE collection_runs ADD COLUMN channel_title TEXT")
     if "channel_id" not in cols:
         alter_stmts.append("ALTER TABLE collection_runs ADD COLUMN channel_id TEXT")
+    if "archived_at" not in cols:
+        alter_stmts.append("ALTER TABLE collection_runs ADD COLUMN archived_at TEXT")
+    if "archive_path" not in cols:
+        alter_stmts.append("ALTER TABLE collection_runs ADD COLUMN archive_path TEXT")
     for stmt in alter_stmts:
         conn.execute(stmt)
 
 
+def _ensure_clean_comment_columns(conn: sqlite3.Connection) -> None:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(clean_comments)").fetchall()}
+    if "text_bigrams" not in cols:
+        # EN: CJK bigrams of `text` for clean_comments_bigram_fts (see `cjk_bigrams`).
+        # 中文：`text` 的中日韩二元字组，供 clean_comments_bigram_fts 使用（见 `cjk_bigrams`）。
+        conn.execute("ALTER TABLE clean_comments ADD COLUMN text_bigrams TEXT")
+
+
+def _migrate_nullable_raw_thread_id(conn: sqlite3.Connection) -> None:
+    """Drop NOT NULL from clean_comments.raw_thread_id (one-off table rebuild).
+
+    EN: Archival deletes a run's raw rows and sets raw_thread_id to NULL on its clean rows,
+        so `PRAGMA foreign_key_check` stays clean. SQLite cannot alter a column constraint,
+        so older DBs get the documented rebuild: copy into a new table (same ids, so both
+        FTS indexes stay valid), drop, rename, then recreate the indexes and triggers.
+        Clean rows of runs archived earlier are detached too; `restore_run` relinks them.
+    中文：归档会删除 run 的原始行，并把对应 clean 行的 raw_thread_id 置为 NULL，使
+          `PRAGMA foreign_key_check` 保持干净。SQLite 无法修改列约束，旧库按官方步骤重建表：
+          复制到新表（id 不变，两个 FTS 索引仍然有效）、删除旧表、改名，再重建索引与触发器。
+          此前已归档 run 的 clean 行同样断开关联，由 `restore_run` 重新关联。
+    """
+
+    notnull = {
+        r[1]: int(r[3]) for r in conn.execute("PRAGMA table_info(clean_comments)").fetchall()
+    }
+    if not notnull.get("raw_thread_id"):
+        return
+
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='clean_comments'"
+    ).fetchone()
+    table_sql = re.sub(r"raw_thread_id\s+INTEGER\s+NOT\s+NULL", "raw_thread_id INTEGER", str(row[0]))
+    table_sql = re.sub(r"^CREATE TABLE\s+\"?clean_comments\"?", "CREATE TABLE clean_comments_new", table_sql)
+    extras = [
+        str(r[0])
+        for r in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name='clean_comments' "
+            "AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+        ).fetchall()
+    ]
+    cols = ", ".join(notnull)
+
+    # EN: The pragma is a no-op inside a transaction, so it is switched around it.
+    # 中文：该 pragma 在事务内无效，因此在事务外切换。
+    conn.commit()
+    conn.execute("PRAGMA foreign_keys=OFF;")
+    conn.execute("BEGIN")
+    try:
+        conn.execute(table_sql)
+        conn.execute(f"INSERT INTO clean_comments_new ({cols}) SELECT {cols} FROM clean_comments")
+        conn.execute("DROP TABLE clean_comments")
+        conn.execute("ALTER TABLE clean_comments_new RENAME TO clean_comments")
+        # EN: Runs archived before this migration still point at deleted raw rows.
+        # 中文：迁移前已归档的 run 仍指向已删除的原始行。
+        conn.execute(
+            "UPDATE clean_comments SET raw_thread_id = NULL "
+            "WHERE raw_thread_id NOT IN (SELECT id FROM raw_comment_threads)"
+        )
+        for sql in extras:
+            conn.execute(sql)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON;")
+
+
+def _ensure_ai_portrait_columns(conn: sqlite3.Connection) -> None:
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(ai_portraits)").fetchall()}
+    if "input_hash" not in cols:
+        conn.execute("ALTER TABLE ai_portraits ADD COLUMN input_hash TEXT")
+    if "generation_json" not in cols:
+        # EN: How the portrait was produced (mode, chunks, ...), as a JSON object.
+        # 中文：画像的生成方式（模式、分块数等），JSON 对象。
+        conn.execute("ALTER TABLE ai_portraits ADD COLUMN generation_json TEXT")
+    if "base_run_id" not in cols:
+        # EN: Lineage: the run whose portrait this one was incrementally updated from.
+        # 中文：血缘：本画像由哪个 run 的画像增量更新而来。
+        conn.execute("ALTER TABLE ai_portraits ADD COLUMN base_run_id INTEGER")
+    if "route_json" not in cols:
+        # EN: Routing decision (rule, measured size, model/template used), as a JSON object.
+        # 中文：路由决策（命中规则、测得的规模、实际使用的模型/模板），JSON 对象。
+        conn.execute("ALTER TABLE ai_portraits ADD COLUMN route_json TEXT")
+
+
+def _migrate_portrait_inputs_to_blobs(conn: sqlite3.Connection) -> None:
+    """Move legacy inline ai_portraits.input_json into the blob store (one-off, idempotent)."""
+
+    rows = conn.execute(
+        "SELECT id, input_json FROM ai_portraits WHERE input_hash IS NULL AND input_json <> ''"
+    ).fetchall()
+    for row in rows:
+        input_hash = put_input_blob(conn, str(row["input_json"]))
+        conn.execute(
+            "UPDATE ai_portraits SET input_hash = ?, input_json = '' WHERE id = ?",
+            (input_hash, int(row["id"])),
+        )
+
+
+def _ensure_indexes(conn: sqlite3.Connection) -> None:
+    # EN: Back the list endpoints' filters; keyset pagination walks the id in each index.
+    # 中文：为列表接口的过滤条件建索引；分页按 id 做 keyset 扫描。
+    conn.executescript(
+        """
+        CREATE INDEX IF NOT EXISTS idx_collection_runs_channel
+            ON collection_runs(channel_id, id);
+        CREATE INDEX IF NOT EXISTS idx_collection_runs_collected_at
+            ON collection_runs(collected_at);
+        CREATE INDEX IF NOT EXISTS idx_ai_portraits_parse_ok
+            ON ai_portraits(parse_ok, run_id);
+        CREATE INDEX IF NOT EXISTS idx_ai_portraits_created_at
+            ON ai_portraits(created_at);
+        -- EN: FK child index; without it every cascaded raw-row delete scans clean_comments.
+        -- 中文：外键子表索引；缺少时每删除一条原始行都要全表扫描 clean_comments。
+        CREATE INDEX IF NOT EXISTS idx_clean_comments_raw_thread
+            ON clean_comments(raw_thread_id);
+        CREATE INDEX IF NOT EXISTS idx_ai_portraits_input_hash
+            ON ai_portraits(input_hash);
+        CREATE INDEX IF NOT EXISTS idx_collection_runs_video
+            ON collection_runs(video_id, id);
+        CREATE INDEX IF NOT EXISTS idx_ai_portraits_base_run
+            ON ai_portraits(base_run_id);
+        """
+    )
+
+
+def _ensure_comment_fts(conn: sqlite3.Connection) -> None:
+    """Create the FTS5 index over clean_comments.text (external content table).
+
+    EN: Prefers the trigram tokenizer (SQLite >= 3.34) because CJK text has no spaces;
+        falls back to unicode61 on older builds. Triggers keep the index in sync with
+        inserts, updates and deletes, including ON DELETE CASCADE from collection_runs.
+    中文：优先使用 trigram 分词（SQLite >= 3.34），中日韩文本无空格分词；旧版本回退到 unicode61。
+          触发器保证插入/更新/删除（含级联删除）时索引同步。
+    """
+
+    if _table_exists(conn, "clean_comments_fts"):
+        return
+
+    try:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE clean_comments_fts USING fts5(
+                text, content='clean_comments', content_rowid='id', tokenize='trigram'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        conn.execute(
+            """
+            CREATE VIRTUAL TABLE clean_comments_fts USING fts5(
+                text, content='clean_comments', content_rowid='id', tokenize='unicode61'
+            )
+            """
+        )
+
+    conn.executescript(
+        """
+        CREATE TRIGGER IF NOT EXISTS clean_comments_fts_ai AFTER INSERT ON clean_comments BEGIN
+            INSERT INTO clean_comments_fts(rowid, text) VALUES (new.id, new.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS clean_comments_fts_ad AFTER DELETE ON clean_comments BEGIN
+            INSERT INTO clean_comments_fts(clean_comments_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS clean_comments_fts_au AFTER UPDATE OF text ON clean_comments BEGIN
+            INSERT INTO clean_comments_fts(clean_comments_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO clean_comments_fts(rowid, text) VALUES (new.id, new.text);
+        END;
+        """
+    )
+    # EN: Index rows that existed before the FTS table was created.
+    # 中文：为建表前已存在的评论补建索引。
+    conn.execute("INSERT INTO clean_comments_fts(clean_comments_fts) VALUES ('rebuild')")
+
+
+def _is_cjk_letter(ch: str) -> bool:
+    code = ord(ch)
+    return ch.isalnum() and (
+        0x3040 <= code <= 0x30FF  # Hiragana / Katakana
+        or 0x3400 <= code <= 0x4DBF  # CJK Ext A
+        or 0x4E00 <= code <= 0x9FFF  # CJK Unified
+        or 0xAC00 <= code <= 0xD7AF  # Hangul syllables
+        or 0xF900 <= code <= 0xFAFF  # CJK compatibility
+    )
+
+
+def _cjk_runs(text: str) -> List[str]:
+    runs: List[str] = []
+    current: List[str] = []
+    for ch in text:
+        if _is_cjk_letter(ch):
+            current.append(ch)
+        elif current:
+            runs.append("".join(current))
+            current = []
+    if current:
+        runs.append("".join(current))
+    return runs
+
+
+def cjk_bigrams(text: str) -> str:
+    """Space-separated tokens for the bigram index: each CJK run's bigrams plus its last character.
+
+    EN: "好看的歌" gives "好看 看的 的歌 歌". Every CJK character starts a bigram or ends its run,
+        so a 1-character term is the prefix query `"好"*`, a 2-character term is one token and
+        a longer term is the phrase of its bigrams; all three match exactly. Other scripts
+        are left to clean_comments_fts.
+    中文："好看的歌" 生成 "好看 看的 的歌 歌"。每个中日韩字符要么是某个二元字组的首字，要么是所在片段的末字，
+          因此单字词用前缀查询 `"好"*`，双字词即一个词元，更长的词是其二元字组组成的短语，三者都精确匹配。
+          其它文字仍由 clean_comments_fts 处理。
+    """
+
+    tokens: List[str] = []
+    for run in _cjk_runs(text or ""):
+        tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+        tokens.append(run[-1])
+    return " ".join(tokens)
+
+
+def _bigram_query(term: str) -> str:
+    if len(term) == 1:
+        return f'"{term}"*'
+    return '"' + " ".join(term[i : i + 2] for i in range(len(term) - 1)) + '"'
+
+
+def _ensure_comment_bigram_fts(conn: sqlite3.Connection) -> None:
+    """Create the FTS5 index over clean_comments.text_bigrams (unicode61, external content).
+
+    EN: The trigram index cannot serve terms shorter than 3 characters, which are most CJK
+        words (好看, 喜欢). This second index holds `cjk_bigrams(text)`, written by
+        `insert_clean_comment`; its triggers mirror clean_comments_fts. Existing rows are
+        filled in once, before the index is built. Rows written by other tools without
+        the column are simply not in this index.
+    中文：trigram 索引无法处理少于 3 个字符的词，而大多数中日韩词语（好看、喜欢）正是如此。第二个索引保存
+          `cjk_bigrams(text)`（由 `insert_clean_comment` 写入），触发器与 clean_comments_fts 相同。
+          已有评论在建索引前一次性补齐；其它工具写入且未填该列的行不进入此索引。
+    """
+
+    if _table_exists(conn, "clean_comments_bigram_fts"):
+        return
+
+    while True:
+        rows = conn.execute(
+            "SELECT id, text FROM clean_comments WHERE text_bigrams IS NULL LIMIT 5000"
+        ).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            "UPDATE clean_comments SET text_bigrams = ? WHERE id = ?",
+            [(cjk_bigrams(str(r[1] or "")), int(r[0])) for r in rows],
+        )
+
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE clean_comments_bigram_fts USING fts5(
+            text_bigrams, content='clean_comments', content_rowid='id', tokenize='unicode61'
+        )
+        """
+    )
+    conn.executescript(
+        """
+        CREATE TRIGGER IF NOT EXISTS clean_comments_bigram_fts_ai AFTER INSERT ON clean_comments BEGIN
+            INSERT INTO clean_comments_bigram_fts(rowid, text_bigrams) VALUES (new.id, new.text_bigrams);
+        END;
+        CREATE TRIGGER IF NOT EXISTS clean_comments_bigram_fts_ad AFTER DELETE ON clean_comments BEGIN
+            INSERT INTO clean_comments_bigram_fts(clean_comments_bigram_fts, rowid, text_bigrams)
+            VALUES ('delete', old.id, old.text_bigrams);
+        END;
+        CREATE TRIGGER IF NOT EXISTS clean_comments_bigram_fts_au AFTER UPDATE OF text_bigrams ON clean_comments BEGIN
+            INSERT INTO clean_comments_bigram_fts(clean_comments_bigram_fts, rowid, text_bigrams)
+            VALUES ('delete', old.id, old.text_bigrams);
+            INSERT INTO clean_comments_bigram_fts(rowid, text_bigrams) VALUES (new.id, new.text_bigrams);
+        END;
+        """
+    )
+    conn.execute("INSERT INTO clean_comments_bigram_fts(clean_comments_bigram_fts) VALUES ('rebuild')")
+
+
+def _fts_uses_trigram(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='clean_comments_fts' LIMIT 1"
+    ).fetchone()
+    return row is not None and "trigram" in str(row[0] or "")
+
+
 def insert_collection_run(
     conn: sqlite3.Connection,
     *,
@@ -245,7 +668,6 @@ def insert_collection_run(
             channel_id,
         ),
     )
-    conn.commit()
     return int(cur.lastrowid)
 
 
@@ -299,6 +721,18 @@ def latest_run_id(conn: sqlite3.Connection) -> Optional[int]:
     return int(row[0])
 
 
+def get_run_archive_path(conn: sqlite3.Connection, run_id: int) -> Optional[str]:
+    """Return the archive file of a run, or None when its raw JSON is still hot."""
+
+    row = conn.execute(
+        "SELECT archived_at, archive_path FROM collection_runs WHERE id = ? LIMIT 1",
+        (int(run_id),),
+    ).fetchone()
+    if row is None or not row["archived_at"]:
+        return None
+    return str(row["archive_path"] or "")
+
+
 def iter_raw_threads(conn: sqlite3.Connection, run_id: int) -> Iterable[sqlite3.Row]:
     return conn.execute(
         """
@@ -330,8 +764,8 @@ def insert_clean_comment(
         INSERT OR IGNORE INTO clean_comments (
             run_id, raw_thread_id, video_id, comment_id, cleaned_at,
             published_at, author, like_count, reply_count,
-            text, text_original
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            text, text_original, text_bigrams
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
             int(run_id),
@@ -345,6 +779,7 @@ def insert_clean_comment(
             reply_count,
             text,
             text_original,
+            cjk_bigrams(text),
         ),
     )
 
@@ -371,6 +806,242 @@ def iter_clean_comments(conn: sqlite3.Connection, run_id: int) -> Iterable[sqlit
     )
 
 
+def iter_export_comments(
+    conn: sqlite3.Connection,
+    run_ids: List[int],
+    *,
+    after: Optional[int] = None,
+    limit: int = 5000,
+) -> List[sqlite3.Row]:
+    """One keyset page (by clean_comments.id) of comments joined with run metadata.
+
+    EN: Callers loop with `after = last row's comment_row_id` until an empty page,
+        so memory stays bounded regardless of run size.
+    中文：按 clean_comments.id 做 keyset 分页；调用方以上一页最后一行的 comment_row_id 作为
+          `after` 循环读取，内存占用与 run 大小无关。
+    """
+
+    if not run_ids:
+        return []
+    placeholders = ", ".join("?" for _ in run_ids)
+    params: List[Any] = [int(x) for x in run_ids]
+    where = f"c.run_id IN ({placeholders})"
+    if after is not None:
+        where += " AND c.id > ?"
+        params.append(int(after))
+    params.append(int(limit))
+    return conn.execute(
+        f"""
+        SELECT
+            c.id AS comment_row_id,
+            c.run_id, c.video_id, c.comment_id,
+            c.published_at, c.author,
+            c.like_count, c.reply_count,
+            c.text,
+            r.collected_at, r.video_url, r.video_title,
+            r.channel_id, r.channel_title
+        FROM clean_comments c
+        JOIN collection_runs r ON r.id = c.run_id
+        WHERE {where}
+        ORDER BY c.id ASC
+        LIMIT ?
+        """,
+        params,
+    ).fetchall()
+
+
+def input_hash_of(input_json: str) -> str:
+    return hashlib.sha256(input_json.encode("utf-8")).hexdigest()
+
+
+def put_input_blob(conn: sqlite3.Connection, input_json: str) -> str:
+    """Store a portrait input once (zlib-compressed), keyed by its SHA-256; returns the hash.
+
+    EN: Identical inputs share one row, and the hash doubles as a cache key.
+    中文：相同输入只存一份（zlib 压缩），以 SHA-256 为键；该哈希也可作为缓存键。
+    """
+
+    input_hash = input_hash_of(input_json)
+    raw = input_json.encode("utf-8")
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO ai_input_blobs (hash, created_at, codec, raw_size, data)
+        VALUES (?, ?, 'zlib', ?, ?)
+        """,
+        (input_hash, utc_now_iso(), len(raw), zlib.compress(raw, 6)),
+    )
+    return input_hash
+
+
+def get_input_blob(conn: sqlite3.Connection, input_hash: str) -> Optional[str]:
+    row = conn.execute(
+        "SELECT codec, data FROM ai_input_blobs WHERE hash = ? LIMIT 1", (input_hash,)
+    ).fetchone()
+    if row is None:
+        return None
+    data = bytes(row["data"])
+    if row["codec"] == "zlib":
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
+
+
+def get_portrait_input(conn: sqlite3.Connection, run_id: int) -> Optional[str]:
+    """Rebuild the exact input JSON a run's portrait was generated from."""
+
+    row = conn.execute(
+        "SELECT input_hash, input_json FROM ai_portraits WHERE run_id = ? LIMIT 1", (int(run_id),)
+    ).fetchone()
+    if row is None:
+        return None
+    if row["input_hash"]:
+        return get_input_blob(conn, str(row["input_hash"]))
+    return str(row["input_json"] or "") or None
+
+
+def gc_input_blobs(conn: sqlite3.Connection) -> int:
+    """Delete blobs no portrait references any more; returns rows removed."""
+
+    cur = conn.execute(
+        """
+        DELETE FROM ai_input_blobs
+        WHERE NOT EXISTS (
+            SELECT 1 FROM ai_portraits p WHERE p.input_hash = ai_input_blobs.hash
+        )
+        """
+    )
+    return int(cur.rowcount or 0)
+
+
+def get_cached_response(
+    conn: sqlite3.Connection, key: str, *, not_before: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Cached LLM response JSON for `key`, ignoring entries created before `not_before`."""
+
+    sql = "SELECT response FROM llm_response_cache WHERE key = ?"
+    params: List[Any] = [key]
+    if not_before:
+        sql += " AND created_at >= ?"
+        params.append(not_before)
+    row = conn.execute(sql + " LIMIT 1", params).fetchone()
+    if row is None:
+        return None
+    return json.loads(zlib.decompress(bytes(row["response"])).decode("utf-8"))
+
+
+def _utc_now_precise() -> str:
+    # EN: Microsecond resolution so LRU order is exact within the same second.
+    # 中文：精确到微秒，保证同一秒内的 LRU 顺序正确。
+    return datetime.now(timezone.utc).isoformat()
+
+
+def touch_cached_response(conn: sqlite3.Connection, key: str) -> None:
+    conn.execute(
+        "UPDATE llm_response_cache SET hits = hits + 1, last_used_at = ? WHERE key = ?",
+        (_utc_now_precise(), key),
+    )
+
+
+def put_cached_response(
+    conn: sqlite3.Connection,
+    key: str,
+    *,
+    model: str,
+    response: Dict[str, Any],
+    expire_before: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+) -> None:
+    """Store a response, then drop expired entries and the least recently used beyond `max_bytes`."""
+
+    now = _utc_now_precise()
+    data = zlib.compress(json.dumps(response, ensure_ascii=False).encode("utf-8"), 6)
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO llm_response_cache (
+            key, model, created_at, last_used_at, hits, size_bytes, response
+        ) VALUES (?, ?, ?, ?, 0, ?, ?)
+        """,
+        (key, model, now, now, len(data), data),
+    )
+    if expire_before:
+        conn.execute("DELETE FROM llm_response_cache WHERE created_at < ?", (expire_before,))
+    if max_bytes is not None:
+        # EN: Keep the most recently used entries whose running size fits the cap.
+        # 中文：按最近使用时间倒序累计大小，超出上限的部分删除（LRU）。
+        conn.execute(
+            """
+            DELETE FROM llm_response_cache WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size_bytes) OVER (
+                        ORDER BY last_used_at DESC, key
+                    ) AS running
+                    FROM llm_response_cache
+                ) WHERE running > ?
+            )
+            """,
+            (int(max_bytes),),
+        )
+
+
+_AI_CALL_COLUMNS = (
+    "run_id",
+    "purpose",
+    "provider",
+    "model",
+    "prompt_name",
+    "prompt_version",
+    "prompt_tokens",
+    "completion_tokens",
+    "cache_hit_tokens",
+    "latency_ms",
+    "ttfb_ms",
+    "http_status",
+    "retries",
+    "cost_est",
+    "ok",
+    "error",
+)
+
+
+def insert_ai_call(conn: sqlite3.Connection, call: Dict[str, Any]) -> int:
+    """Append one ai_calls row; keys of `call` not in the table are ignored."""
+
+    values = [call.get(c) for c in _AI_CALL_COLUMNS]
+    values[_AI_CALL_COLUMNS.index("retries")] = int(call.get("retries") or 0)
+    values[_AI_CALL_COLUMNS.index("ok")] = 1 if call.get("ok") else 0
+    cur = conn.execute(
+        f"""
+        INSERT INTO ai_calls (created_at, {", ".join(_AI_CALL_COLUMNS)})
+        VALUES (?, {", ".join("?" for _ in _AI_CALL_COLUMNS)})
+        """,
+        [call.get("created_at") or _utc_now_precise(), *values],
+    )
+    return int(cur.lastrowid)
+
+
+def list_ai_calls(
+    conn: sqlite3.Connection,
+    *,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    run_id: Optional[int] = None,
+) -> List[sqlite3.Row]:
+    """ai_calls rows in [date_from, date_to) (created_at, UTC ISO), optionally of one run."""
+
+    clauses: List[str] = []
+    params: List[Any] = []
+    if date_from:
+        clauses.append("created_at >= ?")
+        params.append(utc_bound(date_from))
+    if date_to:
+        clauses.append("created_at < ?")
+        params.append(utc_bound(date_to))
+    if run_id is not None:
+        clauses.append("run_id = ?")
+        params.append(int(run_id))
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return conn.execute(f"SELECT * FROM ai_calls {where} ORDER BY id", params).fetchall()
+
+
 def upsert_ai_portrait(
     conn: sqlite3.Connection,
     *,
@@ -384,21 +1055,28 @@ def upsert_ai_portrait(
     portrait_raw: str | None,
     parse_ok: bool,
     error: str | None,
-) -> None:
-    """Insert or replace portrait result for a run.
+    generation: Optional[Dict[str, Any]] = None,
+    base_run_id: Optional[int] = None,
+    route: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Insert or replace portrait result for a run; returns the input hash.
 
-    EN: One portrait per run_id.
-    中文：每个 run_id 只保留一条画像记录（重复生成会覆盖）。
+    EN: One portrait per run_id. `input_json` goes to the blob store; the row keeps
+        only its hash (see `get_portrait_input`). `base_run_id` records the portrait an
+        incremental update started from; `route` is the routing decision (src/ai/routing.py).
+    中文：每个 run_id 只保留一条画像记录（重复生成会覆盖）。输入 JSON 存入 blob 表，画像行只保存哈希。
+          `base_run_id` 记录增量更新所基于的画像。`route` 为路由决策（见 src/ai/routing.py）。
     """
 
+    input_hash = put_input_blob(conn, input_json)
     conn.execute(
         """
         INSERT INTO ai_portraits (
             run_id, created_at, provider, model,
             prompt_name, prompt_version,
-            input_json, portrait_json, portrait_raw,
-            parse_ok, error
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            input_json, input_hash, portrait_json, portrait_raw,
+            parse_ok, error, generation_json, base_run_id, route_json
+        ) VALUES (?, ?, ?, ?, ?, ?, '', ?, ?, ?, ?, ?, ?, ?, ?)
         ON CONFLICT(run_id) DO UPDATE SET
             created_at=excluded.created_at,
             provider=excluded.provider,
@@ -406,10 +1084,14 @@ def upsert_ai_portrait(
             prompt_name=excluded.prompt_name,
             prompt_version=excluded.prompt_version,
             input_json=excluded.input_json,
+            input_hash=excluded.input_hash,
+            generation_json=excluded.generation_json,
             portrait_json=excluded.portrait_json,
             portrait_raw=excluded.portrait_raw,
             parse_ok=excluded.parse_ok,
-            error=excluded.error
+            error=excluded.error,
+            base_run_id=excluded.base_run_id,
+            route_json=excluded.route_json
         """,
         (
             int(run_id),
@@ -418,13 +1100,17 @@ def upsert_ai_portrait(
             model,
             prompt_name,
             prompt_version,
-            input_json,
+            input_hash,
             portrait_json,
             portrait_raw,
             1 if parse_ok else 0,
             error,
+            json.dumps(generation, ensure_ascii=False) if generation else None,
+            int(base_run_id) if base_run_id is not None else None,
+            json.dumps(route, ensure_ascii=False) if route else None,
         ),
     )
+    return input_hash
 
 
 def get_ai_portrait(conn: sqlite3.Connection, run_id: int) -> Optional[sqlite3.Row]:
@@ -433,34 +1119,174 @@ def get_ai_portrait(conn: sqlite3.Connection, run_id: int) -> Optional[sqlite3.R
     ).fetchone()
 
 
-def list_collection_runs(conn: sqlite3.Connection) -> Iterable[sqlite3.Row]:
-    return conn.execute(
+def find_base_portrait_run(conn: sqlite3.Connection, run_id: int) -> Optional[int]:
+    """Latest earlier run of the same video with a successfully parsed portrait."""
+
+    row = conn.execute(
         """
-        SELECT id AS run_id,
-               video_id,
-               video_url,
-               video_title,
-               channel_title,
-               channel_id,
-               collected_at,
-               order_mode,
-               max_comments,
+        SELECT r.id FROM collection_runs r
+        JOIN ai_portraits p ON p.run_id = r.id
+        WHERE r.video_id = (SELECT video_id FROM collection_runs WHERE id = ?)
+          AND r.id < ? AND p.parse_ok = 1
+        ORDER BY r.id DESC
+        LIMIT 1
+        """,
+        (int(run_id), int(run_id)),
+    ).fetchone()
+    return int(row["id"]) if row else None
+
+
+def clean_comment_ids(conn: sqlite3.Connection, run_id: int) -> Set[str]:
+    """comment_id of every clean comment of a run (uses the UNIQUE(run_id, comment_id) index)."""
+
+    rows = conn.execute("SELECT comment_id FROM clean_comments WHERE run_id = ?", (int(run_id),))
+    return {str(r[0]) for r in rows}
+
+
+def get_portrait_lineage(conn: sqlite3.Connection, run_id: int, *, limit: int = 50) -> List[Dict[str, Any]]:
+    """Chain of portraits this run's portrait was updated from, newest first.
+
+    EN: Follows ai_portraits.base_run_id with a recursive CTE; the first item is the
+        portrait of `run_id` itself, the last one a full (non-incremental) generation.
+    中文：通过递归 CTE 沿 ai_portraits.base_run_id 回溯；第一项是 `run_id` 自身的画像，
+          最后一项是一次完整（非增量）生成。
+    """
+
+    rows = conn.execute(
+        """
+        WITH RECURSIVE chain(run_id, depth) AS (
+            SELECT ?, 0
+            UNION ALL
+            SELECT p.base_run_id, chain.depth + 1
+            FROM chain JOIN ai_portraits p ON p.run_id = chain.run_id
+            WHERE p.base_run_id IS NOT NULL AND chain.depth < ?
+        )
+        SELECT p.run_id, p.base_run_id, p.created_at, p.provider, p.model, r.collected_at
+        FROM chain
+        JOIN ai_portraits p ON p.run_id = chain.run_id
+        LEFT JOIN collection_runs r ON r.id = p.run_id
+        ORDER BY chain.depth ASC
+        """,
+        (int(run_id), int(limit)),
+    ).fetchall()
+    return [
+        {
+            "run_id": int(r["run_id"]),
+            "base_run_id": int(r["base_run_id"]) if r["base_run_id"] is not None else None,
+            "created_at": r["created_at"],
+            "collected_at": r["collected_at"],
+            "provider": r["provider"],
+            "model": r["model"],
+        }
+        for r in rows
+    ]
+
+
+def _run_filters(
+    *,
+    id_column: str,
+    date_column: str,
+    after: Optional[int],
+    channel_id: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+) -> Tuple[str, List[Any]]:
+    """Build the shared WHERE clause of the list queries.
+
+    EN: `after` is the last id of the previous page (ids are listed descending);
+        the date range is half-open: [date_from, date_to).
+    中文：`after` 为上一页最后一个 id（按 id 倒序）；日期区间为左闭右开 [date_from, date_to)。
+    """
+
+    clauses: List[str] = []
+    params: List[Any] = []
+    if after is not None:
+        clauses.append(f"{id_column} < ?")
+        params.append(int(after))
+    if channel_id:
+        clauses.append("r.channel_id = ?")
+        params.append(channel_id)
+    if date_from:
+        clauses.append(f"{date_column} >= ?")
+        params.append(utc_bound(date_from))
+    if date_to:
+        clauses.append(f"{date_column} < ?")
+        params.append(utc_bound(date_to))
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+
+def list_collection_runs(
+    conn: sqlite3.Connection,
+    *,
+    limit: Optional[int] = None,
+    after: Optional[int] = None,
+    channel_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Iterable[sqlite3.Row]:
+    where, params = _run_filters(
+        id_column="r.id",
+        date_column="r.collected_at",
+        after=after,
+        channel_id=channel_id,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = "LIMIT ?"
+        params.append(int(limit))
+    return conn.execute(
+        f"""
+        SELECT r.id AS run_id,
+               r.video_id,
+               r.video_url,
+               r.video_title,
+               r.channel_title,
+               r.channel_id,
+               r.collected_at,
+               r.order_mode,
+               r.max_comments,
+               r.archived_at,
                (
                    SELECT COUNT(1)
                    FROM raw_comment_threads t
-                   WHERE t.run_id = collection_runs.id
+                   WHERE t.run_id = r.id
                ) AS raw_count,
                (
                    SELECT COUNT(1)
                    FROM clean_comments c
-                   WHERE c.run_id = collection_runs.id
+                   WHERE c.run_id = r.id
                ) AS clean_count
-        FROM collection_runs
-        ORDER BY id DESC
-        """
+        FROM collection_runs r
+        {where}
+        ORDER BY r.id DESC
+        {limit_sql}
+        """,
+        params,
     )
 
 
+def count_collection_runs(
+    conn: sqlite3.Connection,
+    *,
+    channel_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> int:
+    where, params = _run_filters(
+        id_column="r.id",
+        date_column="r.collected_at",
+        after=None,
+        channel_id=channel_id,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    row = conn.execute(f"SELECT COUNT(1) FROM collection_runs r {where}", params).fetchone()
+    return int(row[0])
+
+
 def get_collection_run_detail(conn: sqlite3.Connection, run_id: int) -> Optional[sqlite3.Row]:
     return conn.execute(
         """
@@ -473,6 +1299,7 @@ def get_collection_run_detail(conn: sqlite3.Connection, run_id: int) -> Optional
                collected_at,
                order_mode,
                max_comments,
+               archived_at,
                (
                    SELECT COUNT(1)
                    FROM raw_comment_threads t
@@ -491,9 +1318,57 @@ def get_collection_run_detail(conn: sqlite3.Connection, run_id: int) -> Optional
     ).fetchone()
 
 
-def list_ai_portraits(conn: sqlite3.Connection) -> Iterable[sqlite3.Row]:
+def _portrait_filters(
+    *,
+    after: Optional[int],
+    channel_id: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    parse_ok: Optional[bool],
+) -> Tuple[str, List[Any]]:
+    where, params = _run_filters(
+        id_column="p.run_id",
+        date_column="p.created_at",
+        after=after,
+        channel_id=channel_id,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    if parse_ok is not None:
+        where = (where + " AND " if where else "WHERE ") + "p.parse_ok = ?"
+        params.append(1 if parse_ok else 0)
+    return where, params
+
+
+def list_ai_portraits(
+    conn: sqlite3.Connection,
+    *,
+    limit: Optional[int] = None,
+    after: Optional[int] = None,
+    channel_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    parse_ok: Optional[bool] = None,
+) -> Iterable[sqlite3.Row]:
+    """List portraits, newest run first.
+
+    EN: The date range filters on the portrait's created_at.
+    中文：日期区间按画像生成时间 created_at 过滤。
+    """
+
+    where, params = _portrait_filters(
+        after=after,
+        channel_id=channel_id,
+        date_from=date_from,
+        date_to=date_to,
+        parse_ok=parse_ok,
+    )
+    limit_sql = ""
+    if limit is not None:
+        limit_sql = "LIMIT ?"
+        params.append(int(limit))
     return conn.execute(
-        """
+        f"""
         SELECT p.run_id,
                p.created_at AS portrait_created_at,
                p.parse_ok,
@@ -509,16 +1384,301 @@ def list_ai_portraits(conn: sqlite3.Connection) -> Iterable[sqlite3.Row]:
                r.collected_at
         FROM ai_portraits p
         JOIN collection_runs r ON r.id = p.run_id
+        {where}
         ORDER BY p.run_id DESC
-        """
+        {limit_sql}
+        """,
+        params,
     )
 
 
+def count_ai_portraits(
+    conn: sqlite3.Connection,
+    *,
+    channel_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    parse_ok: Optional[bool] = None,
+) -> int:
+    where, params = _portrait_filters(
+        after=None,
+        channel_id=channel_id,
+        date_from=date_from,
+        date_to=date_to,
+        parse_ok=parse_ok,
+    )
+    row = conn.execute(
+        f"""
+        SELECT COUNT(1)
+        FROM ai_portraits p
+        JOIN collection_runs r ON r.id = p.run_id
+        {where}
+        """,
+        params,
+    ).fetchone()
+    return int(row[0])
+
+
+def _channel_portrait_filters(
+    channel_id: str, date_from: Optional[str], date_to: Optional[str]
+) -> Tuple[str, List[Any]]:
+    where, params = _run_filters(
+        id_column="p.run_id",
+        date_column="r.collected_at",
+        after=None,
+        channel_id=channel_id,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    return where + " AND p.parse_ok = 1", params
+
+
+def list_channel_portraits(
+    conn: sqlite3.Connection,
+    channel_id: str,
+    *,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> List[sqlite3.Row]:
+    """Parsed portraits of a channel's videos, the latest run per video, with clean_count.
+
+    EN: The window filters on the run's collected_at ([date_from, date_to)). Only the newest
+        run of each video is kept so re-collected videos are not counted twice.
+    中文：时间窗口按 run 的采集时间 collected_at 过滤（左闭右开）；每个视频只取最新的 run，
+          避免重复采集的视频被重复计入。
+    """
+
+    where, params = _channel_portrait_filters(channel_id, date_from, date_to)
+    return conn.execute(
+        f"""
+        SELECT run_id, video_id, video_title, channel_title, collected_at, portrait_json,
+               (SELECT COUNT(1) FROM clean_comments c WHERE c.run_id = latest.run_id) AS clean_count
+        FROM (
+            SELECT p.run_id, r.video_id, r.video_title, r.channel_title, r.collected_at,
+                   p.portrait_json,
+                   ROW_NUMBER() OVER (PARTITION BY r.video_id ORDER BY p.run_id DESC) AS rn
+            FROM ai_portraits p
+            JOIN collection_runs r ON r.id = p.run_id
+            {where}
+        ) AS latest
+        WHERE rn = 1
+        ORDER BY run_id DESC
+        """,
+        params,
+    ).fetchall()
+
+
+def channel_portraits_fingerprint(
+    conn: sqlite3.Connection,
+    channel_id: str,
+    *,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Tuple[Any, ...]:
+    """Cheap change marker of `list_channel_portraits` input: (count, sum of ids, newest created_at)."""
+
+    where, params = _channel_portrait_filters(channel_id, date_from, date_to)
+    row = conn.execute(
+        f"""
+        SELECT COUNT(1), COALESCE(SUM(p.id), 0), MAX(p.created_at)
+        FROM ai_portraits p
+        JOIN collection_runs r ON r.id = p.run_id
+        {where}
+        """,
+        params,
+    ).fetchone()
+    return tuple(row)
+
+
+def list_run_ids_without_portrait(conn: sqlite3.Connection) -> List[int]:
+    """Runs that have clean comments but no portrait yet (backfill candidates)."""
+
+    rows = conn.execute(
+        """
+        SELECT r.id FROM collection_runs r
+        WHERE NOT EXISTS (SELECT 1 FROM ai_portraits p WHERE p.run_id = r.id)
+          AND EXISTS (SELECT 1 FROM clean_comments c WHERE c.run_id = r.id)
+        ORDER BY r.id ASC
+        """
+    ).fetchall()
+    return [int(r["id"]) for r in rows]
+
+
 def delete_ai_portrait(conn: sqlite3.Connection, run_id: int) -> int:
     cur = conn.execute("DELETE FROM ai_portraits WHERE run_id = ?", (int(run_id),))
     return int(cur.rowcount or 0)
 
 
 def delete_collection_run(conn: sqlite3.Connection, run_id: int) -> int:
-    cur = conn.execute("DELETE FROM collection_runs WHERE id = ?", (int(run_id),))
-    return int(cur.rowcount or 0)
+    return delete_collection_runs(conn, [run_id])
+
+
+def delete_collection_runs(conn: sqlite3.Connection, run_ids: Iterable[int]) -> int:
+    """Delete many runs and all their rows; returns the number of runs deleted.
+
+    EN: Children are deleted table by table with `run_id IN (...)` (index range scans)
+        before the parent rows, so ON DELETE CASCADE finds nothing left to chase
+        row by row. The caller owns the transaction.
+    中文：先按 `run_id IN (...)` 逐表删除子表（走索引），再删除父表，使级联删除无需逐行追踪。
+          事务由调用方负责。
+    """
+
+    ids = sorted({int(r) for r in run_ids})
+    deleted = 0
+    # EN: Stay below SQLITE_MAX_VARIABLE_NUMBER on old builds (999).
+    # 中文：兼容旧版 SQLite 的绑定参数上限（999）。
+    for start in range(0, len(ids), 500):
+        chunk = ids[start : start + 500]
+        marks = ", ".join("?" for _ in chunk)
+        conn.execute(f"DELETE FROM ai_portraits WHERE run_id IN ({marks})", chunk)
+        conn.execute(f"DELETE FROM clean_comments WHERE run_id IN ({marks})", chunk)
+        conn.execute(f"DELETE FROM raw_comment_threads WHERE run_id IN ({marks})", chunk)
+        cur = conn.execute(f"DELETE FROM collection_runs WHERE id IN ({marks})", chunk)
+        deleted += int(cur.rowcount or 0)
+    return deleted
+
+
+def _like_snippet(text: str, term: str, context: int = 16) -> str:
+    """Mimic FTS5 snippet() for the LIKE fallback: `…before [term] after…`."""
+
+    pos = text.lower().find(term.lower())
+    if pos < 0:
+        return text[: context * 2] + ("…" if len(text) > context * 2 else "")
+    start = max(0, pos - context)
+    end = pos + len(term)
+    return (
+        ("…" if start > 0 else "")
+        + text[start:pos]
+        + "["
+        + text[pos:end]
+        + "]"
+        + text[end : end + context]
+        + ("…" if end + context < len(text) else "")
+    )
+
+
+def search_clean_comments(
+    conn: sqlite3.Connection,
+    *,
+    query: str,
+    run_id: Optional[int] = None,
+    channel_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """Full-text search over cleaned comments, best match first.
+
+    EN: Every whitespace-separated term must match (AND). The date range
+        [date_from, date_to) applies to the comment's published_at.
+        Terms of 3+ characters use clean_comments_fts (trigram). CJK terms the trigram
+        index cannot serve (1–2 characters, e.g. 好看, or any CJK term on builds without
+        trigram) use clean_comments_bigram_fts. Remaining short terms (e.g. "ok") are LIKE
+        filters on the indexed matches; a query made only of such terms falls back to a LIKE
+        scan ordered by like_count over the run (`run_id`), the channel's runs (`channel_id`)
+        or, when neither is given, the whole table.
+    中文：空格分隔的每个词都必须命中（AND）；日期区间 [date_from, date_to) 按评论发布时间过滤。
+          3 个字符以上的词走 clean_comments_fts（trigram）；trigram 无法处理的中日韩词（1–2 个字符，如"好看"，
+          或不支持 trigram 时的所有中日韩词）走 clean_comments_bigram_fts。其余短词（如 "ok"）在索引命中的行上
+          做 LIKE 过滤；只由这类词组成的查询回退为按点赞数排序的 LIKE 扫描，范围为该 run（`run_id`）、
+          该频道各 run（`channel_id`），两者都未指定时为整张表。
+    """
+
+    terms = [t for t in (query or "").split() if t]
+    if not terms:
+        return []
+
+    clauses: List[str] = []
+    params: List[Any] = []
+    if run_id is not None:
+        clauses.append("c.run_id = ?")
+        params.append(int(run_id))
+    if channel_id:
+        clauses.append("r.channel_id = ?")
+        params.append(channel_id)
+    if date_from:
+        clauses.append("c.published_at >= ?")
+        params.append(utc_bound(date_from))
+    if date_to:
+        clauses.append("c.published_at < ?")
+        params.append(utc_bound(date_to))
+
+    columns = """
+        c.id, c.run_id, c.video_id, c.comment_id, c.published_at, c.author,
+        c.like_count, c.reply_count, r.channel_id, r.video_title
+    """
+
+    def _like(term: str) -> str:
+        return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+    trigram = _fts_uses_trigram(conn)
+    bigram = _table_exists(conn, "clean_comments_bigram_fts")
+    cjk = [t for t in terms if bigram and all(_is_cjk_letter(ch) for ch in t) and (not trigram or len(t) < 3)]
+    indexed = [t for t in terms if t not in cjk and (not trigram or len(t) >= 3)]
+    short = [t for t in terms if t not in indexed and t not in cjk]
+    like_filters = ["c.text LIKE ? ESCAPE '\\'"] * len(short)
+    bigram_match = " ".join(_bigram_query(t) for t in cjk)
+    if indexed:
+        match = " ".join('"' + t.replace('"', '""') + '"' for t in indexed)
+        bigram_filter = "c.id IN (SELECT rowid FROM clean_comments_bigram_fts WHERE clean_comments_bigram_fts MATCH ?)"
+        where = " AND ".join(["clean_comments_fts MATCH ?"] + [bigram_filter] * bool(cjk) + like_filters + clauses)
+        rows = conn.execute(
+            f"""
+            SELECT {columns},
+                   snippet(clean_comments_fts, 0, '[', ']', '…', 16) AS snippet,
+                   bm25(clean_comments_fts) AS score
+            FROM clean_comments_fts f
+            JOIN clean_comments c ON c.id = f.rowid
+            JOIN collection_runs r ON r.id = c.run_id
+            WHERE {where}
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+            """,
+            [match, *[bigram_match] * bool(cjk), *[_like(t) for t in short], *params, int(limit), int(offset)],
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    if cjk:
+        # EN: The bigram column is not readable text, so the snippet is built from c.text.
+        # 中文：二元字组列不可读，摘要取自 c.text。
+        where = " AND ".join(["clean_comments_bigram_fts MATCH ?"] + like_filters + clauses)
+        rows = conn.execute(
+            f"""
+            SELECT {columns}, c.text, bm25(clean_comments_bigram_fts) AS score
+            FROM clean_comments_bigram_fts b
+            JOIN clean_comments c ON c.id = b.rowid
+            JOIN collection_runs r ON r.id = c.run_id
+            WHERE {where}
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+            """,
+            [bigram_match, *[_like(t) for t in short], *params, int(limit), int(offset)],
+        ).fetchall()
+        found: List[Dict[str, Any]] = []
+        for r in rows:
+            item = dict(r)
+            item["snippet"] = _like_snippet(str(item.pop("text") or ""), cjk[0])
+            found.append(item)
+        return found
+
+    where = " AND ".join(["c.text LIKE ? ESCAPE '\\'"] * len(terms) + clauses)
+    rows = conn.execute(
+        f"""
+        SELECT {columns}, c.text
+        FROM clean_comments c
+        JOIN collection_runs r ON r.id = c.run_id
+        WHERE {where}
+        ORDER BY c.like_count DESC, c.id DESC
+        LIMIT ? OFFSET ?
+        """,
+        [*[_like(t) for t in terms], *params, int(limit), int(offset)],
+    ).fetchall()
+
+    results: List[Dict[str, Any]] = []
+    for r in rows:
+        item = dict(r)
+        item["snippet"] = _like_snippet(str(item.pop("text") or ""), terms[0])
+        item["score"] = None
+        results.append(item)
+    return results
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import queue
+import sqlite3
+import sys
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src.database.sqlite import connect, connect_readonly, init_schema
+
+T = TypeVar("T")
+
+# EN: Upper bound of jobs folded into one transaction / one fsync.
+# 中文：单个事务（一次落盘）最多合并的写任务数。
+MAX_BATCH = 64
+
+_Job = Tuple[Callable[[sqlite3.Connection], Any], Future]
+
+
+class DbWriter:
+    """Serialize every write to one SQLite file through a dedicated thread.
+
+    EN: Jobs are callables `fn(conn) -> result` queued from any thread. The writer
+        drains up to MAX_BATCH queued jobs, runs each inside its own SAVEPOINT (a
+        failing job rolls back alone) and commits the batch once. Jobs must not call
+        `conn.commit()` / `conn.rollback()` themselves.
+    中文：所有写操作通过专用线程串行执行。任务为 `fn(conn) -> result`，可从任意线程提交；
+          写线程一次取出最多 MAX_BATCH 个任务，每个任务在独立 SAVEPOINT 中执行（失败只回滚自身），
+          整批只提交一次。任务内部不要自行 commit/rollback。
+    """
+
+    def __init__(self, db_file: Path) -> None:
+        self.db_file = db_file
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._ready = threading.Event()
+        self._init_error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._init_error is not None:
+            raise self._init_error
+
+    def submit(self, fn: Callable[[sqlite3.Connection], T]) -> "Future[T]":
+        future: "Future[T]" = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Submit a job and block until its batch is committed."""
+
+        return self.submit(fn).result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self) -> None:
+        try:
+            conn = connect(self.db_file)
+            # EN: Manual transaction control: BEGIN/SAVEPOINT/COMMIT are issued explicitly.
+            # 中文：手动控制事务，显式执行 BEGIN/SAVEPOINT/COMMIT。
+            conn.isolation_level = None
+            init_schema(conn)
+        except BaseException as e:  # noqa: BLE001
+            self._init_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    return
+                batch: List[_Job] = [first]
+                stop = False
+                while len(batch) < MAX_BATCH:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is None:
+                        stop = True
+                        break
+                    batch.append(nxt)
+
+                self._run_batch(conn, batch)
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _run_batch(self, conn: sqlite3.Connection, batch: List[_Job]) -> None:
+        outcomes: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT writer_job")
+                try:
+                    result = fn(conn)
+                except BaseException as e:  # noqa: BLE001
+                    conn.execute("ROLLBACK TO writer_job")
+                    conn.execute("RELEASE writer_job")
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute("RELEASE writer_job")
+                    outcomes.append((future, result, None))
+            conn.execute("COMMIT")
+        except BaseException as e:  # noqa: BLE001
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"DB writer batch failed: {e}", file=sys.stderr)
+            for _fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # EN: Resolve futures only after COMMIT so callers observe durable state.
+        # 中文：提交成功后再返回结果，保证调用方看到的是已落盘的数据。
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_writers: Dict[str, DbWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(db_file: Path) -> DbWriter:
+    """Process-wide writer for a DB file (started lazily, schema initialized once)."""
+
+    key = str(Path(db_file).resolve())
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = DbWriter(Path(key))
+            _writers[key] = writer
+        return writer
+
+
+def run_write(db_file: Path, fn: Callable[[sqlite3.Connection], T]) -> T:
+    """Run `fn(conn)` on the writer thread of `db_file` and return its result."""
+
+    return get_writer(db_file).run(fn)
+
+
+def read_connection(db_file: Path) -> sqlite3.Connection:
+    """Open a `mode=ro` connection, making sure the schema exists first.
+
+    EN: Under WAL, read-only connections never wait for the writer.
+    中文：WAL 模式下只读连接不会被写线程阻塞。
+    """
+
+    get_writer(db_file)
+    return connect_readonly(db_file)